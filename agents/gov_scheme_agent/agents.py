@@ -9,6 +9,10 @@ from tools.rag_query import rag_query,confirm_scheme_apply_automation
 from tools.research_gov_schemes import research_gov_schemes
 from tools.browser_use import apply_scheme
 from prompts.gov_scheme_agent import gov_scheme_agent_prompt
+from utils.usage_budget import refuse_tools_near_limit
+from utils.turn_journal import journaled
+from utils.output_governor import governed
+from tools.tool_output import read_tool_output
 import logfire
 import os
 
@@ -28,23 +32,27 @@ gov_scheme_agent = Agent(
         get_time,
 
         # Web search
-        web_search,
+        journaled(governed(web_search)),
 
         # Fire crawl
-        web_scraper,
+        journaled(governed(web_scraper)),
 
         # Rag query
-        rag_query,
+        journaled(governed(rag_query)),
 
         # Confirm scheme apply automation
         confirm_scheme_apply_automation,
 
         # Research government schemes
-        research_gov_schemes,
+        journaled(research_gov_schemes),
 
         # Apply scheme
-        apply_scheme
+        journaled(apply_scheme),
+
+        # Pages of long tool outputs
+        read_tool_output
     ],
+    prepare_tools=refuse_tools_near_limit,
     retries=5,
     instrument=True
 )
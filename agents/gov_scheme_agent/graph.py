@@ -1,11 +1,14 @@
-from states.main import SystemState
+from states.main import SystemState, AgentOutputState
 from langgraph.graph import END, START, StateGraph
 from .agents import gov_scheme_agent
-from utils.agent_execution import execute_agent_safely
+from utils.agent_execution import execute_agent_safely, NON_RETRYABLE_ERRORS
+from utils.usage_budget import degraded_response
+from utils.single_flight import single_flight
 from .history import GovSchemeAgentHistory
 
 
 #----------- Gov Scheme Agent -----------------------
+@single_flight(GovSchemeAgentHistory.agent_type)
 async def GovSchemeAgent(state: SystemState):
     # Load or create agent history from Redis
     gov_scheme_agent_history = await GovSchemeAgentHistory.load_or_create(state["workflow_id"])
@@ -25,15 +28,35 @@ async def GovSchemeAgent(state: SystemState):
         {user_input}
         """
 
-        result = await execute_agent_safely(
-            gov_scheme_agent,
-            prompt
-        )
+        try:
+            result = await execute_agent_safely(
+                gov_scheme_agent,
+                prompt,
+                workflow_id=workflow_id,
+                agent_type=GovSchemeAgentHistory.agent_type
+            )
+        except NON_RETRYABLE_ERRORS:
+            # Out of budget - say so instead of running the agent
+            agent_output = degraded_response("response")
+            return {
+                'routing': {
+                    'next': END,
+                    'previous': 'gov_scheme_agent'
+                },
+                'agent_input_output': {
+                    'agent_output': agent_output
+                },
+                'agent_outputs': {
+                    'gov_scheme_agent': agent_output
+                }
+            }
+
+        agent_output = result.data.model_dump()
 
         # Saving the history
         gov_scheme_agent_history.messages.append({
             "user_input": prompt,
-            "agent_response": result.data.model_dump()
+            "agent_response": agent_output
         })
         await gov_scheme_agent_history.save(state["workflow_id"])
         
@@ -43,7 +66,10 @@ async def GovSchemeAgent(state: SystemState):
                 'previous': 'gov_scheme_agent'
             },
             'agent_input_output': {
-                'agent_output': result.data.model_dump()
+                'agent_output': agent_output
+            },
+            'agent_outputs': {
+                'gov_scheme_agent': agent_output
             }
         }
     
@@ -54,12 +80,16 @@ async def GovSchemeAgent(state: SystemState):
         },
         'agent_input_output': {
             'agent_output': "Sorry something went wrong!!!"
+        },
+        'agent_outputs': {
+            'gov_scheme_agent': "Sorry something went wrong!!!"
         }
     }
 
 
 #---------- Graph ------------
-graph = StateGraph(SystemState)
+# Only the agent's output channels are written back when embedded in the parent graph
+graph = StateGraph(SystemState, output_schema=AgentOutputState)
 
 graph.add_node("gov_scheme_agent",GovSchemeAgent)
 
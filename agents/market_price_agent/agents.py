@@ -7,6 +7,11 @@ from tools.market_price_search import get_market_price
 from tools.web_search import web_search
 from prompts.market_price_agent import market_price_agent_prompt
 from utils.mcp_client import calculator_mcp
+from utils.usage_budget import refuse_tools_near_limit
+from utils.turn_journal import journaled
+from utils.output_governor import governed
+from tools.tool_output import read_tool_output
+from .tool_selection import select_tools, request_more_tools
 import logfire
 import os
 
@@ -14,6 +19,10 @@ load_dotenv()
 
 logfire.configure(token=os.getenv("LOGFIRE_TOKEN"))
 
+async def prepare_market_price_tools(ctx, tool_defs):
+    """Prune tools to the ones the user input needs, then apply the usage guard."""
+    return await refuse_tools_near_limit(ctx, await select_tools(ctx, tool_defs))
+
 market_price_agent = Agent(
     name="Market Price Agent",
     model=market_price_llm,
@@ -26,11 +35,18 @@ market_price_agent = Agent(
         get_time,
 
         # Market Price Search
-        get_market_price,
+        journaled(governed(get_market_price)),
 
         # Web search
-        web_search   
+        journaled(governed(web_search)),
+
+        # Pages of long tool outputs
+        read_tool_output,
+
+        # Tool expansion
+        request_more_tools
     ],
+    prepare_tools=prepare_market_price_tools,
     retries=5,
     instrument=True
 )
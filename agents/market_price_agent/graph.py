@@ -1,10 +1,13 @@
-from states.main import SystemState
+from states.main import SystemState, AgentOutputState
 from langgraph.graph import END, START, StateGraph
 from .agents import market_price_agent
-from utils.agent_execution import execute_agent_safely
+from utils.agent_execution import execute_agent_safely, NON_RETRYABLE_ERRORS
+from utils.usage_budget import degraded_response
+from utils.single_flight import single_flight
 from .history import MarketPriceAgentHistory
 
 #----------- Market Price Agent -----------------------
+@single_flight(MarketPriceAgentHistory.agent_type)
 async def MarketPriceAgent(state: SystemState):
     """
     Market price agent to get the answer to a question like 'Finding the market price of crops in a specific region on a specific date' and etc....
@@ -29,15 +32,35 @@ async def MarketPriceAgent(state: SystemState):
         {user_input}
         """
 
-        result = await execute_agent_safely(
-            market_price_agent,
-            prompt
-        )
+        try:
+            result = await execute_agent_safely(
+                market_price_agent,
+                prompt,
+                workflow_id=state["workflow_id"],
+                agent_type=MarketPriceAgentHistory.agent_type
+            )
+        except NON_RETRYABLE_ERRORS:
+            # Out of budget - say so instead of running the agent
+            agent_output = degraded_response("full_response")
+            return {
+                'routing': {
+                    'next': END,
+                    'previous': 'market_price_agent'
+                },
+                'agent_input_output': {
+                    'agent_output': agent_output
+                },
+                'agent_outputs': {
+                    'market_price_agent': agent_output
+                }
+            }
+
+        agent_output = result.data.model_dump()
 
         # Saving the history
         market_price_agent_history.messages.append({
             "user_input": prompt,
-            "agent_response": result.data.model_dump()
+            "agent_response": agent_output
         })
         await market_price_agent_history.save(state["workflow_id"])
         
@@ -47,7 +70,10 @@ async def MarketPriceAgent(state: SystemState):
                 'previous': 'market_price_agent'
             },
             'agent_input_output': {
-                'agent_output': result.data.model_dump()
+                'agent_output': agent_output
+            },
+            'agent_outputs': {
+                'market_price_agent': agent_output
             }
         }
     
@@ -58,12 +84,16 @@ async def MarketPriceAgent(state: SystemState):
         },
         'agent_input_output': {
             'agent_output': "No data found!!!"
+        },
+        'agent_outputs': {
+            'market_price_agent': "No data found!!!"
         }
     }
     
 
 #---------- Graph ------------
-graph = StateGraph(SystemState)
+# Only the agent's output channels are written back when embedded in the parent graph
+graph = StateGraph(SystemState, output_schema=AgentOutputState)
 
 graph.add_node("market_price_agent",MarketPriceAgent)
 
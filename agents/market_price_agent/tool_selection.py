@@ -0,0 +1,127 @@
+import logging
+import re
+from typing import Any, Dict, List, Set
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import ModelRequest, ModelResponse, RetryPromptPart, ToolCallPart
+from pydantic_ai.tools import ToolDefinition
+
+logger = logging.getLogger(__name__)
+
+# Tools exposed on every run (price lookups need nothing else)
+CORE_TOOLS: Set[str] = {"get_date", "get_time", "get_market_price", "web_search", "request_more_tools"}
+
+# Calculator MCP tools grouped by capability
+TOOL_GROUPS: Dict[str, Set[str]] = {
+    "arithmetic": {
+        "add", "subtract", "multiply", "divide", "power", "round_to_precision", "absolute_value"
+    },
+    "statistics": {
+        "percentage", "percentage_change", "average_two", "average_three", "average_five",
+        "median_three", "median_five", "min_two", "min_three", "max_two", "max_three",
+        "price_range_analysis_three", "price_range_analysis_five"
+    },
+    "agri_calculations": {
+        "unit_conversion", "price_per_unit", "total_cost", "profit_loss_calculation", "breakeven_price",
+        "compound_interest", "storage_cost_calculation", "yield_per_acre_value", "currency_conversion_simple"
+    }
+}
+
+# Keyword classifier deciding which groups a user input needs
+GROUP_PATTERNS: Dict[str, re.Pattern] = {
+    "arithmetic": re.compile(
+        r"\b(calculat\w*|comput\w*|total|sum|add|plus|minus|subtract|multipl\w*|times|divid\w*|"
+        # "-" and "/" only count as operators after whitespace, so dates like 2024-05-01 don't match
+        r"difference|how much|round\w*)\b|[+*=]\s*\d|\s[\-/]\s*\d",
+        re.IGNORECASE
+    ),
+    "statistics": re.compile(
+        r"\b(average|avg|mean|median|compar\w*|highest|lowest|range|spread|"
+        r"percent\w*|change|increase|decrease|rise|fall|trend)\b|%",
+        re.IGNORECASE
+    ),
+    "agri_calculations": re.compile(
+        r"\b(convert\w*|conversion|unit|per (kg|quintal|ton|tonne|bag)|profit|loss|margin|break\s?even|"
+        r"storage|store|interest|yield|acre|hectare|revenue|earn\w*|total cost|cost per|usd|dollar|"
+        r"currency|exchange)\b|\d+(\.\d+)?\s*(kg|quintals?|tons?|tonnes?|bags?|acres?)\b",
+        re.IGNORECASE
+    )
+}
+
+
+async def request_more_tools(capability: str) -> str:
+    """
+    Request additional calculation tools when the available tools can't do what the user asked.
+
+    Args:
+        capability (str): Short description of the calculation that is needed.
+
+    Returns:
+        str: Confirmation that all calculation tools are available in the next step.
+    """
+    return f"All calculation tools are now available for: {capability}"
+
+
+def classify_tool_groups(user_input: str) -> Set[str]:
+    """
+    Classify which calculator tool groups a user input needs.
+
+    Args:
+        user_input: The user's question
+
+    Returns:
+        Set of tool group names from TOOL_GROUPS
+    """
+    return {group for group, pattern in GROUP_PATTERNS.items() if pattern.search(user_input)}
+
+
+def _get_user_input(prompt: Any) -> str:
+    """Extract the user input section from the agent prompt."""
+    if not isinstance(prompt, str):
+        return ""
+    # The graph node builds the prompt as history followed by "# User Input"
+    return prompt.rsplit("# User Input", 1)[-1]
+
+
+def _expansion_requested(messages: List[Any]) -> bool:
+    """Check whether the model asked for tools that are not exposed yet."""
+    for message in messages:
+        if isinstance(message, ModelResponse):
+            if any(isinstance(part, ToolCallPart) and part.tool_name == "request_more_tools" for part in message.parts):
+                return True
+        elif isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, RetryPromptPart) and isinstance(part.content, str) and "Unknown tool name" in part.content:
+                    return True
+    return False
+
+
+async def select_tools(ctx: RunContext[Any], tool_defs: List[ToolDefinition]) -> List[ToolDefinition]:
+    """
+    Expose only the tools relevant to the current user input.
+
+    Price-only questions get the core tools, calculation questions additionally get the
+    matching calculator groups. When the model calls `request_more_tools` or tries a tool
+    that is not exposed, every tool is exposed from the next step on.
+
+    Args:
+        ctx: The run context
+        tool_defs: All tool definitions of the agent
+
+    Returns:
+        The tool definitions to send with the next model request
+    """
+    if _expansion_requested(ctx.messages):
+        logger.debug("Tool expansion requested, exposing all tools")
+        return [tool_def for tool_def in tool_defs if tool_def.name != "request_more_tools"]
+
+    allowed = set(CORE_TOOLS)
+    for group in classify_tool_groups(_get_user_input(ctx.prompt)):
+        allowed |= TOOL_GROUPS[group]
+
+    # Tools that are neither core nor calculator tools are never pruned
+    known = CORE_TOOLS.union(*TOOL_GROUPS.values())
+    selected = [tool_def for tool_def in tool_defs if tool_def.name in allowed or tool_def.name not in known]
+
+    logger.debug(f"Exposing {len(selected)} of {len(tool_defs)} tools")
+    return selected
@@ -1,13 +1,29 @@
 from langgraph.graph import StateGraph, START, END
 from states.main import SystemState
+from states.reducers import RESET_KEY
 
 from agents.market_price_agent.graph import market_price_graph
 from agents.gov_scheme_agent.graph import gov_scheme_graph
 
-from langgraph.types import interrupt
-from langgraph.checkpoint.mongodb import MongoDBSaver
+from langgraph.types import interrupt, Send
+from utils.intent_router import get_router_metrics, route_intent
+from storage.mongodb.checkpointer import get_checkpointer, close_checkpointer
+from storage.mongodb.retention import start_compactor, stop_compactor
+from storage.mongodb.history_archive import install_history_rehydration, start_history_archiver, stop_history_archiver
+from storage.redis.agent_history.write_behind import close_history_writer
+from storage.redis.config import close_redis_client, AGENT_EXECUTION_MODE
+from storage.redis.work_queue.work_queue import run_queued_turn
+from storage.redis.workflow_lock.workflow_lock import TURN_LEASE_TYPE, WorkflowLockTimeout, workflow_lease
+from storage.redis.state_history.workflow_events import follow_workflow_events, get_current_turn_start_id
+from storage.redis.state_history.workflow_status_history import save_workflow_status
+from storage.redis.state_history.final_output import save_final_output
 
-import os
+import json
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -54,10 +70,19 @@ async def get_user_input(state: SystemState):
     return response
 
 
-#------------- Market Price Agent ----------------
-async def market_price_agent(state: SystemState):
+#-------------- Router ---------------------
+async def agent_router(state: SystemState):
     """
-    Market price agent to get the answer to a question like 'Finding the market price of crops in a specific region on a specific date' and etc....
+    Router to determine the next agent based on user input.
+    
+    The user input is classified locally (keyword rules + TF-IDF), an LLM is only asked
+    when the local classifier is not confident. An agent the caller requested for the turn
+    (`requested_agent`) is kept as-is and used to measure routing accuracy; the request is
+    cleared so the next turn is classified again. `agent_name` only holds the router's own
+    decision and is never read back. The agent outputs of the previous turn are cleared, so
+    the agents of this turn start from (and echo back) only their own outputs, and the
+    previous turn's answer can't be returned as this turn's. The turn's
+    "PROCESSING" status is published to the workflow's event stream.
     
     Args:
         state: Current system state containing user input and routing information
@@ -65,41 +90,130 @@ async def market_price_agent(state: SystemState):
     Returns:
         Updated state dictionary with routing information
     """
-    return market_price_graph
+    await save_workflow_status(state.get("workflow_id"), "PROCESSING")
+    user_input = (state.get("agent_input_output") or {}).get("user_input")
+    prediction = await route_intent(
+        str(user_input or ""),
+        workflow_id=state.get("workflow_id"),
+        label=state.get("requested_agent")
+    )
+    return {
+        "agent_name": prediction.agent_name,
+        "agent_names": prediction.agent_names,
+        "requested_agent": None,
+        "agent_input_output": {"agent_output": None},
+        "agent_outputs": {RESET_KEY: True}
+    }
 
-#---------------- Government Scheme Agent --------------------
-async def gov_scheme_agent(state: SystemState):
+def dispatch_agents(state: SystemState):
     """
-    ...
+    Select the agent node(s) to run after routing.
+    
+    Compound questions are fanned out to every selected agent in parallel, so the turn
+    takes as long as the slowest agent instead of the sum of all agents.
+    
+    Args:
+        state: Current system state containing the routing decision
+        
+    Returns:
+        A list of Send packets for compound questions, otherwise the agent name
     """
-    return gov_scheme_graph
+    agent_names = state.get("agent_names") or []
+    if len(agent_names) > 1:
+        return [Send(agent_name, state) for agent_name in agent_names]
+    return state.get("agent_name")
 
-#-------------- Router ---------------------
-async def agent_router(state: SystemState):
+#-------------- Merge Agent Outputs ---------------------
+def _response_text(agent_output) -> str:
+    """Get the user facing text of an agent output."""
+    if isinstance(agent_output, dict):
+        return agent_output.get("full_response") or agent_output.get("response") or str(agent_output)
+    return str(agent_output)
+
+async def merge_agent_outputs(state: SystemState):
     """
-    Router to determine the next agent based on user input.
+    Combine the outputs of agents that answered the same question in parallel.
+    
+    This is the last node of every turn, so it publishes the "COMPLETED" status and the
+    turn's final output to the workflow's event stream, which ends the stream of the turn.
     
     Args:
-        state: Current system state containing user input and routing information
+        state: Current system state containing the output of each agent
         
     Returns:
-        Updated state dictionary with routing information
+        Updated state dictionary with the combined agent output
+    """
+    agent_names = state.get("agent_names") or []
+    if len(agent_names) < 2:
+        # A single agent already wrote its output
+        response = {}
+        agent_output = (state.get("agent_input_output") or {}).get("agent_output")
+    else:
+        agent_outputs = state.get("agent_outputs") or {}
+        responses = {agent_name: agent_outputs.get(agent_name) for agent_name in agent_names}
+        agent_output = {
+            "response": "\n\n".join(_response_text(output) for output in responses.values()),
+            "agent_outputs": responses
+        }
+        response = {
+            "routing": {
+                "next": END,
+                "previous": "merge_agent_outputs"
+            },
+            "agent_input_output": {
+                "agent_output": agent_output
+            }
+        }
+    
+    await save_workflow_status(state.get("workflow_id"), "COMPLETED")
+    await save_final_output(state.get("workflow_id"), {"agent_output": agent_output, "agent_names": agent_names})
+    return response
+
+#-------------- Queued Agents ---------------------
+def queued_agent(agent_name: str):
     """
-    agent_name = state.get("agent_name")
-    return {"agent_name": agent_name}
+    Build a node that runs an agent turn on the worker pool (`python worker.py`).
+    
+    The node queues the turn and waits for its result, so the API process spends no
+    model or tool time on it. Only the agent's own entry of `agent_outputs` is written
+    back, so parallel agents of a compound turn can't overwrite each other's output.
+    
+    Args:
+        agent_name: The agent's node name
+        
+    Returns:
+        The graph node
+    """
+    async def run_agent(state: SystemState):
+        result = await run_queued_turn(state["workflow_id"], agent_name, dict(state))
+        agent_outputs = result.get("agent_outputs") or {}
+        if agent_name in agent_outputs:
+            result["agent_outputs"] = {agent_name: agent_outputs[agent_name]}
+        else:
+            result.pop("agent_outputs", None)
+        return result
+    
+    run_agent.__name__ = agent_name
+    return run_agent
 
 #-------------- Graph --------------------
 graph = StateGraph(SystemState)
 
 graph.add_node("agent_router",agent_router)
-graph.add_node("market_price_agent",market_price_agent)    
-graph.add_node("gov_scheme_agent",gov_scheme_agent) 
+if AGENT_EXECUTION_MODE == "queue":
+    graph.add_node("market_price_agent",queued_agent("market_price_agent"))
+    graph.add_node("gov_scheme_agent",queued_agent("gov_scheme_agent"))
+else:
+    # Agent sub-graphs run as native nodes and share the parent checkpointer
+    graph.add_node("market_price_agent",market_price_graph)    
+    graph.add_node("gov_scheme_agent",gov_scheme_graph) 
+graph.add_node("merge_agent_outputs",merge_agent_outputs)
 
 graph.add_edge(START,"agent_router")
 
 graph.add_conditional_edges(
     "agent_router",
-    lambda state: state.get("agent_name"),
+    dispatch_agents,
     {
         "market_price_agent": "market_price_agent",
         "gov_scheme_agent": "gov_scheme_agent",
@@ -107,8 +221,161 @@ graph.add_conditional_edges(
     }
 )
 
-DB_URI = os.environ.get("MONGO_CONNECTION_URL")
+graph.add_edge("market_price_agent","merge_agent_outputs")
+graph.add_edge("gov_scheme_agent","merge_agent_outputs")
+graph.add_edge("merge_agent_outputs",END)
+
+#-------------- Graph Factory --------------------
+compiled_graph = None
+# Compiled without a checkpointer, for the LangGraph API server to attach its own
+platform_graph = None
+
+async def make_graph(config=None):
+    """
+    Compile the workflow graph with the shared async MongoDB checkpointer.
+    
+    The graph is compiled once per process; every run reuses the same checkpointer
+    and its connection pool. The LangGraph API server (`langgraph.json`) calls graph
+    factories with a run configuration and persists threads with its own checkpointer,
+    so it gets the graph without one.
+    
+    Args:
+        config: Run configuration, only passed by the LangGraph API server
+        
+    Returns:
+        The compiled workflow graph
+    """
+    global compiled_graph, platform_graph
+    if config is not None:
+        if platform_graph is None:
+            platform_graph = graph.compile()
+        return platform_graph
+    if compiled_graph is None:
+        compiled_graph = graph.compile(checkpointer=await get_checkpointer())
+    return compiled_graph
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the checkpointer and start the checkpoint compactor and history archiver at server startup.
+    
+    At shutdown, pending agent history writes are flushed before the connections are closed.
+    """
+    global compiled_graph
+    await make_graph()
+    install_history_rehydration()
+    start_compactor()
+    start_history_archiver()
+    yield
+    await close_history_writer()
+    await stop_history_archiver()
+    await stop_compactor()
+    compiled_graph = None
+    await close_checkpointer()
+    await close_redis_client()
+
+app = FastAPI(lifespan=lifespan)
+
+
+#-------------- Workflow Turns ------------------
+class TurnRequest(BaseModel):
+    user_input: str
+    # Skips classification for this turn
+    requested_agent: Optional[Literal["market_price_agent", "gov_scheme_agent"]] = None
+
+@app.post("/workflows/{workflow_id}/turns")
+async def workflow_turn(workflow_id: str, turn: TurnRequest):
+    """
+    Run one turn of a workflow on the graph and its MongoDB checkpointer.
+    
+    The workflow id is the checkpoint thread, so consecutive turns continue the same conversation.
+    The turn runs under the workflow's turn lease, so turns of a workflow run one at a time and
+    the checkpointer can trust its cached checkpoint when no other turn ran in between.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        turn: The user input and optionally the agent to answer it
+        
+    Returns:
+        The agent output and the agents that answered
+    
+    Raises:
+        HTTPException: 409 if another turn of the workflow is still running
+        Exception: If the turn failed, after publishing the "FAILED" status and the error as
+            the turn's final output
+    """
+    try:
+        async with workflow_lease(workflow_id, TURN_LEASE_TYPE):
+            state = await (await make_graph()).ainvoke(
+                {
+                    "workflow_id": workflow_id,
+                    "requested_agent": turn.requested_agent,
+                    "agent_input_output": {"user_input": turn.user_input}
+                },
+                {"configurable": {"thread_id": workflow_id}}
+            )
+    except WorkflowLockTimeout as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        # Followers of the event stream wait for a final output
+        await save_workflow_status(workflow_id, "FAILED")
+        await save_final_output(workflow_id, {"error": str(e)})
+        raise
+    return {
+        "agent_output": (state.get("agent_input_output") or {}).get("agent_output"),
+        "agent_names": state.get("agent_names") or []
+    }
+
+
+#-------------- Metrics ------------------
+@app.get("/metrics/router")
+async def router_metrics():
+    """
+    Routing metrics of this process: decisions per method, accuracy against caller-chosen agents and local latency.
+    
+    Returns:
+        The metrics snapshot
+    """
+    return get_router_metrics()
+
 
-#Compile and return the workflow graph
-with MongoDBSaver.from_conn_string(DB_URI) as checkpointer:
-    graph.compile(checkpointer=checkpointer)
\ No newline at end of file
+#-------------- Workflow Events ------------------
+@app.get("/workflows/{workflow_id}/events")
+async def workflow_events(workflow_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-sent events of a workflow's status changes and final output.
+    
+    The events of the current turn (those after the last final output, or after the
+    `Last-Event-ID` a reconnecting client sends) are replayed first, then new events are
+    pushed as they are published. The stream ends after the turn's final output; comments
+    are sent as keep-alives while the workflow is idle.
+    
+    Every connected client holds one connection of the Redis pool in a blocking read, so
+    concurrent subscribers plus the agents' own Redis traffic must fit in REDIS_MAX_CONNECTIONS
+    (per process); further reads wait up to REDIS_POOL_TIMEOUT_SECONDS for a connection.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        request: The incoming request, used to notice disconnected clients
+        last_event_id: Id of the last event the client received
+        
+    Returns:
+        The `text/event-stream` response
+    """
+    start_id = last_event_id or await get_current_turn_start_id(workflow_id)
+    
+    async def event_stream():
+        async for event in follow_workflow_events(workflow_id, start_id):
+            if await request.is_disconnected():
+                return
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, payload = event
+            yield f"id: {event_id}\nevent: {payload['type']}\ndata: {json.dumps(payload['data'])}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
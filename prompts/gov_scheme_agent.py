@@ -25,7 +25,7 @@ You operate in an environment where farmers face various challenges including cr
 - **Step 1.5**: If no relevant data exists, proceed to Step 2
 
 ### 2. Scheme Research (When No Existing Data)
-- **Step 2.1**: Use `research_gov_schemes` to research and identify relevant schemes for the farmer's problem
+- **Step 2.1**: Use `research_gov_schemes` to research and identify relevant schemes for the farmer's problem, passing the farmer's state and crop when known
 - **Step 2.2**: Allow the research tool to process and add findings to the knowledge base
 - **Step 2.3**: Use `rag_query` to retrieve the newly researched scheme information
 - **Step 2.4**: Use `confirm_scheme_apply_automation` to check if the scheme can be applied through browser automation
@@ -1,18 +1,31 @@
-from typing_extensions import TypedDict
-from typing import Literal, Optional
+from typing_extensions import TypedDict, Annotated
+from typing import Any, Dict, List, Literal, Optional
 from dataclasses import dataclass
 from .agent_input_output import AgentInputOutput
 from .routing import Routing
+from .reducers import merge_dicts
 
 @dataclass(kw_only=True)
 class SystemState(TypedDict):
     workflow_id: str
     agent_name: Literal["market_price_agent","gov_scheme_agent"] = None
+    # Agent chosen by the caller for the current turn only, cleared by the router
+    requested_agent: Optional[Literal["market_price_agent","gov_scheme_agent"]] = None
+    # All agents selected for the current turn (more than one for compound questions)
+    agent_names: List[Literal["market_price_agent","gov_scheme_agent"]] = None
 
-    routing: Routing
+    routing: Annotated[Routing, merge_dicts]
     
-    agent_input_output: AgentInputOutput
+    agent_input_output: Annotated[AgentInputOutput, merge_dicts]
 
+    # Output of each agent, keyed by agent name
+    agent_outputs: Annotated[Dict[str, Any], merge_dicts] = None
 
+@dataclass(kw_only=True)
+class AgentOutputState(TypedDict):
+    """Channels an agent sub-graph writes back to the parent graph."""
+    routing: Annotated[Routing, merge_dicts]
 
+    agent_input_output: Annotated[AgentInputOutput, merge_dicts]
 
+    agent_outputs: Annotated[Dict[str, Any], merge_dicts]
\ No newline at end of file
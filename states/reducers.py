@@ -0,0 +1,25 @@
+from typing import Any, Dict, Optional
+
+# Key of an update that replaces the channel value instead of merging into it
+RESET_KEY = "__reset__"
+
+def merge_dicts(current: Optional[Dict[str, Any]], update: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Reducer merging a partial dictionary update into the current channel value.
+    
+    Lets parallel branches of the graph write different keys of the same channel
+    in one super-step instead of failing with a concurrent update error. An update
+    containing RESET_KEY replaces the channel value with its remaining keys.
+    
+    Args:
+        current: The current value of the channel
+        update: The partial update written by a node
+        
+    Returns:
+        Dict[str, Any]: The merged dictionary
+    """
+    if update is None:
+        return current or {}
+    if update.get(RESET_KEY):
+        return {key: value for key, value in update.items() if key != RESET_KEY}
+    return {**(current or {}), **update}
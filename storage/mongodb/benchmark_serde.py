@@ -0,0 +1,186 @@
+"""
+Benchmark checkpoint size and write latency of the default and the compressed serializer.
+
+Simulates a 20-turn market price conversation (4 super-steps per turn) and reports the
+bytes written per checkpoint and the time spent serializing. With `--mongo` the checkpoints
+are also written to temporary collections through AsyncMongoDBSaver to measure end-to-end
+write latency (uses MONGO_CONNECTION_URL / MONGO_DB_NAME).
+
+Usage:
+    python -m storage.mongodb.benchmark_serde [--turns 20] [--mongo]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from .serde import CompressedMsgpackSerializer
+
+CROPS = ["wheat", "soybean", "onion", "tomato", "cotton", "mustard", "chana", "maize"]
+MARKETS = ["Indore", "Ujjain", "Dewas", "Bhopal", "Sagar", "Mandsaur", "Neemuch", "Ratlam"]
+
+
+def _agent_output(turn: int) -> Dict[str, Any]:
+    """A MarketPriceAgentOutput dump of typical size."""
+    crop = CROPS[turn % len(CROPS)]
+    markets_data = [
+        {
+            "market_name": f"{market} APMC",
+            "min_price": 2100.0 + i * 15,
+            "max_price": 2450.0 + i * 20,
+            "avg_price": 2275.0 + i * 17,
+            "modal_price": 2300.0 + i * 18,
+            "unit": "per quintal",
+            "date": "2025-07-21"
+        }
+        for i, market in enumerate(MARKETS)
+    ]
+    return {
+        "crop": crop,
+        "state": "Madhya Pradesh",
+        "district": None,
+        "market": None,
+        "min_market_price": "2100",
+        "max_market_price": "2590",
+        "price_summary": {
+            "overall_min_price": 2100.0,
+            "overall_max_price": 2590.0,
+            "weighted_avg_price": 2334.5,
+            "price_range": 490.0,
+            "standard_unit": "per quintal"
+        },
+        "markets_data": markets_data,
+        "search_date": "2025-07-21",
+        "price_date": "2025-07-21",
+        "calculation_requested": True,
+        "calculation_results": [
+            {
+                "calculation_type": "total_cost",
+                "input_parameters": {"quantity": 20, "unit": "quintal", "price": 2300.0},
+                "result": {"total": 46000.0, "currency": "INR"},
+                "explanation": f"20 quintal of {crop} at the modal price of Rs 2300 per quintal gives Rs 46000."
+            }
+        ],
+        "search_successful": True,
+        "data_availability": "current",
+        "sources": [
+            "https://agmarknet.gov.in/SearchCmmMkt.aspx",
+            "https://enam.gov.in/web/dashboard/trade-data",
+            f"https://www.commodityonline.com/mandiprices/{crop}/madhya-pradesh"
+        ],
+        "full_response": (
+            f"The current price of {crop} in Madhya Pradesh ranges from Rs 2100 to Rs 2590 per quintal "
+            f"across {len(MARKETS)} markets, with a modal price of around Rs 2300 per quintal. "
+        ) * 4,
+        "structured_data_available": True,
+        "market_trends": "Prices have been stable over the past week with slight upward movement.",
+        "seasonal_context": "Arrivals are lower after the rabi harvest which supports prices."
+    }
+
+
+def build_checkpoints(turns: int) -> List[Dict[str, Any]]:
+    """Checkpoints a `turns` long conversation writes, one per super-step."""
+    workflow_id = str(uuid.uuid4())
+    checkpoints = []
+    checkpoint = empty_checkpoint()
+    for turn in range(turns):
+        user_input = f"What is the price of {CROPS[turn % len(CROPS)]} in Madhya Pradesh for 20 quintal?"
+        agent_output = _agent_output(turn)
+        steps = [
+            {"agent_input_output": {"user_input": user_input}},
+            {"agent_name": "market_price_agent", "agent_names": ["market_price_agent"],
+             "routing": {"next": "market_price_agent", "previous": "agent_router"}},
+            {"agent_input_output": {"user_input": user_input, "agent_output": agent_output},
+             "agent_outputs": {"market_price_agent": agent_output},
+             "routing": {"next": "merge_agent_outputs", "previous": "market_price_agent"}},
+            {"agent_input_output": {"user_input": user_input, "agent_output": agent_output},
+             "routing": {"next": "__end__", "previous": "merge_agent_outputs"}}
+        ]
+        for values in steps:
+            checkpoint = {
+                **checkpoint,
+                "id": str(uuid.uuid4()),
+                "channel_values": {**checkpoint["channel_values"], "workflow_id": workflow_id, **values}
+            }
+            checkpoints.append(checkpoint)
+    return checkpoints
+
+
+def measure_serializer(serde: JsonPlusSerializer, checkpoints: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Bytes and serialization time per checkpoint."""
+    sizes, latencies = [], []
+    for checkpoint in checkpoints:
+        start = time.perf_counter()
+        _, data = serde.dumps_typed(checkpoint)
+        latencies.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(data))
+
+        # Every checkpoint must read back unchanged
+        assert serde.loads_typed(serde.dumps_typed(checkpoint)) == checkpoint
+    return {
+        "total_bytes": sum(sizes),
+        "avg_bytes": statistics.mean(sizes),
+        "avg_ms": statistics.mean(latencies),
+        "p95_ms": statistics.quantiles(latencies, n=20)[-1]
+    }
+
+
+async def measure_mongo_writes(serde: JsonPlusSerializer, checkpoints: List[Dict[str, Any]]) -> Dict[str, float]:
+    """End-to-end `aput` latency against temporary MongoDB collections."""
+    from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
+    from .config import get_mongo_client, close_mongo_client, MONGO_DB_NAME
+
+    client = await get_mongo_client()
+    suffix = uuid.uuid4().hex[:8]
+    saver = AsyncMongoDBSaver(
+        client,
+        db_name=MONGO_DB_NAME,
+        checkpoint_collection_name=f"benchmark_checkpoints_{suffix}",
+        writes_collection_name=f"benchmark_checkpoint_writes_{suffix}"
+    )
+    saver.serde = serde
+
+    config = {"configurable": {"thread_id": checkpoints[0]["channel_values"]["workflow_id"], "checkpoint_ns": ""}}
+    latencies = []
+    try:
+        for step, checkpoint in enumerate(checkpoints):
+            start = time.perf_counter()
+            config = await saver.aput(config, checkpoint, {"source": "loop", "step": step}, {})
+            latencies.append((time.perf_counter() - start) * 1000)
+        stats = await client[MONGO_DB_NAME].command("collStats", f"benchmark_checkpoints_{suffix}")
+    finally:
+        await client[MONGO_DB_NAME].drop_collection(f"benchmark_checkpoints_{suffix}")
+        await client[MONGO_DB_NAME].drop_collection(f"benchmark_checkpoint_writes_{suffix}")
+        await close_mongo_client()
+
+    return {
+        "mongo_avg_ms": statistics.mean(latencies),
+        "mongo_p95_ms": statistics.quantiles(latencies, n=20)[-1],
+        "mongo_storage_bytes": stats.get("storageSize", 0)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20, help="Conversation turns to simulate")
+    parser.add_argument("--mongo", action="store_true", help="Also measure writes against MongoDB")
+    args = parser.parse_args()
+
+    checkpoints = build_checkpoints(args.turns)
+    serializers = {"msgpack": JsonPlusSerializer(), "msgpack+zstd": CompressedMsgpackSerializer()}
+
+    print(f"{len(checkpoints)} checkpoints for {args.turns} turns")
+    for name, serde in serializers.items():
+        result = measure_serializer(serde, checkpoints)
+        if args.mongo:
+            result.update(await measure_mongo_writes(serde, checkpoints))
+        print(f"{name:>14}: " + ", ".join(f"{key}={value:,.3f}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
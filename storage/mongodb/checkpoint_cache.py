@@ -0,0 +1,81 @@
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import logfire
+
+from .config import CHECKPOINT_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CachedCheckpoint:
+    """Latest root checkpoint of a thread as stored in MongoDB (serialized, so hits return fresh objects)."""
+    checkpoint_id: str
+    parent_checkpoint_id: Optional[str]
+    checkpoint: Tuple[str, bytes]
+    metadata: Dict[str, Any]
+    # (task_id, task_path, idx) -> (task_id, channel, (type, value)), in write order
+    writes: Dict[Tuple[str, str, int], Tuple[str, str, Tuple[str, bytes]]] = field(default_factory=dict)
+    # Fencing token of the turn lease the entry was last written or verified under, and when
+    fencing_token: Optional[int] = None
+    fenced_at: float = 0.0
+
+
+lookup_counter = logfire.metric_counter(
+    "checkpoint_cache.lookups", unit="1", description="Latest-checkpoint cache lookups by result"
+)
+
+
+class LatestCheckpointCache:
+    """Bounded LRU map of the latest root checkpoint per thread."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedCheckpoint]" = OrderedDict()
+        self.stats = {"hit": 0, "miss": 0, "stale": 0}
+
+    def get(self, key: str) -> Optional[CachedCheckpoint]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedCheckpoint) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def record(self, result: str) -> None:
+        self.stats[result] += 1
+        lookup_counter.add(1, {"result": result})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Shared by the checkpointer of this process
+latest_checkpoint_cache = LatestCheckpointCache(CHECKPOINT_CACHE_CONFIG["max_threads"])
+
+
+def get_checkpoint_cache_metrics() -> Dict[str, float]:
+    """
+    Snapshot of the latest-checkpoint cache of this process.
+
+    Returns:
+        Dict with hits, misses, stale entries detected by the version check, hit rate and size
+    """
+    stats = latest_checkpoint_cache.stats
+    lookups = stats["hit"] + stats["miss"] + stats["stale"]
+    return {
+        **stats,
+        "hit_rate": stats["hit"] / lookups if lookups else 0.0,
+        "entries": len(latest_checkpoint_cache)
+    }
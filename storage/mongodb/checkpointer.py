@@ -0,0 +1,321 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.mongodb.aio import AsyncMongoDBSaver
+from langgraph.checkpoint.mongodb.utils import dumps_metadata, loads_metadata
+from pymongo import UpdateOne
+from storage.redis.workflow_lock.workflow_lock import FENCE_EXPIRY_SECONDS, TURN_LEASE_TYPE, get_fencing_token
+from .serde import CompressedMsgpackSerializer
+from .checkpoint_cache import CachedCheckpoint, latest_checkpoint_cache
+from .config import get_mongo_client, close_mongo_client, MONGO_DB_NAME, RETENTION_CONFIG, CHECKPOINT_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Same collections as the previous sync MongoDBSaver so existing threads keep resuming
+CHECKPOINT_COLLECTION_NAME = "checkpoints"
+WRITES_COLLECTION_NAME = "checkpoint_writes"
+
+class RetentionMongoDBSaver(AsyncMongoDBSaver):
+    """
+    AsyncMongoDBSaver that stamps checkpoint and write documents for TTL expiry.
+
+    The upstream saver puts `created_at` of writes into the upsert filter, which inserts a
+    duplicate (and violates the unique index) when a write is replaced. Here it is set on the
+    document instead, as a UTC time like the TTL monitor expects. TTL indexes are (re)created by
+    `ensure_ttl_indexes` on setup, so they are also added to collections that already exist.
+    """
+
+    async def _setup(self) -> None:
+        if self._setup_future is not None:
+            return await self._setup_future
+        await super()._setup()
+        if self.ttl:
+            # Imported here as retention builds on this module
+            from .retention import ensure_ttl_indexes
+            await ensure_ttl_indexes(self)
+
+    def _checkpoint_doc(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata
+    ) -> tuple[Dict[str, Any], Dict[str, Any]]:
+        """Upsert filter and document of a checkpoint."""
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        upsert_query = {
+            "thread_id": config["configurable"]["thread_id"],
+            "checkpoint_ns": config["configurable"]["checkpoint_ns"],
+            "checkpoint_id": checkpoint["id"],
+        }
+        doc = {
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "type": type_,
+            "checkpoint": serialized_checkpoint,
+            "metadata": dumps_metadata(metadata),
+        }
+        if self.ttl:
+            doc["created_at"] = datetime.now(timezone.utc)
+        return upsert_query, doc
+
+    def _write_docs(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str
+    ) -> tuple[str, List[tuple[Dict[str, Any], Dict[str, Any]]]]:
+        """Update operator and (upsert filter, document) pairs of pending writes."""
+        configurable = config["configurable"]
+        # Allow replacement on existing writes only if there were errors
+        set_method = "$set" if all(w[0] in WRITES_IDX_MAP for w in writes) else "$setOnInsert"
+        docs = []
+        for idx, (channel, value) in enumerate(writes):
+            upsert_query = {
+                "thread_id": configurable["thread_id"],
+                "checkpoint_ns": configurable["checkpoint_ns"],
+                "checkpoint_id": configurable["checkpoint_id"],
+                "task_id": task_id,
+                "task_path": task_path,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+            }
+            type_, serialized_value = self.serde.dumps_typed(value)
+            doc = {"channel": channel, "type": type_, "value": serialized_value}
+            if self.ttl:
+                doc["created_at"] = datetime.now(timezone.utc)
+            docs.append((upsert_query, doc))
+        return set_method, docs
+
+    async def _store_checkpoint(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata
+    ) -> tuple[Dict[str, Any], Dict[str, Any]]:
+        """Upsert a checkpoint; returns its upsert filter and stored document."""
+        await self._setup()
+        upsert_query, doc = self._checkpoint_doc(config, checkpoint, metadata)
+        await self.checkpoint_collection.update_one(upsert_query, {"$set": doc}, upsert=True)
+        return upsert_query, doc
+
+    async def _store_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str
+    ) -> tuple[str, List[tuple[Dict[str, Any], Dict[str, Any]]]]:
+        """Upsert pending writes; returns the update operator and the stored (upsert filter, document) pairs."""
+        await self._setup()
+        set_method, docs = self._write_docs(config, writes, task_id, task_path)
+        await self.writes_collection.bulk_write(
+            [UpdateOne(upsert_query, {set_method: doc}, upsert=True) for upsert_query, doc in docs]
+        )
+        return set_method, docs
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        upsert_query, _ = await self._store_checkpoint(config, checkpoint, metadata)
+        return {"configurable": upsert_query}
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._store_writes(config, writes, task_id, task_path)
+
+class CachedMongoDBSaver(RetentionMongoDBSaver):
+    """
+    RetentionMongoDBSaver with an in-process LRU cache of the latest root checkpoint per thread.
+
+    Root checkpoints and their pending writes are written through to the cache, so resuming a
+    thread this worker ran last is served from memory. Agent sub-graphs checkpoint under a new
+    namespace every turn that is never resumed, so they are not cached.
+
+    Before serving the latest checkpoint, an index-only query checks that no other worker wrote a
+    newer one (disable with CHECKPOINT_CACHE_VERIFY when a thread always runs on the same worker).
+    The query is skipped when the turn runs under the thread's turn lease and its fencing token
+    directly follows the one the entry was cached under: no other turn of the thread ran since.
+    Pending writes added by another worker to the same checkpoint are not detected; LangGraph
+    runs a thread on one worker at a time.
+    """
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        await self._setup()
+        if config["configurable"].get("checkpoint_ns", ""):
+            return await super().aget_tuple(config)
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_id = get_checkpoint_id(config)
+        entry = latest_checkpoint_cache.get(thread_id)
+
+        if entry is not None and checkpoint_id in (None, entry.checkpoint_id):
+            if checkpoint_id is None and CHECKPOINT_CACHE_CONFIG["verify"] and not self._is_fenced(thread_id, entry):
+                latest = await self.checkpoint_collection.find_one(
+                    {"thread_id": thread_id, "checkpoint_ns": ""},
+                    {"checkpoint_id": 1, "_id": 0},
+                    sort=[("checkpoint_id", -1)]
+                )
+                if latest is None or latest["checkpoint_id"] != entry.checkpoint_id:
+                    latest_checkpoint_cache.pop(thread_id)
+                    latest_checkpoint_cache.record("stale")
+                    return await self._load_tuple(config, thread_id)
+                self._fence(thread_id, entry)
+            latest_checkpoint_cache.record("hit")
+            return self._to_tuple(thread_id, entry)
+
+        latest_checkpoint_cache.record("miss")
+        return await self._load_tuple(config, thread_id)
+
+    @staticmethod
+    def _fence(thread_id: str, entry: CachedCheckpoint) -> None:
+        """Stamp an entry with the turn lease it is known to be the latest checkpoint under."""
+        entry.fencing_token = get_fencing_token(thread_id, TURN_LEASE_TYPE)
+        entry.fenced_at = time.monotonic()
+
+    @staticmethod
+    def _is_fenced(thread_id: str, entry: CachedCheckpoint) -> bool:
+        """Whether no other turn of the thread can have run since the entry was stamped."""
+        token = get_fencing_token(thread_id, TURN_LEASE_TYPE)
+        if token is None or entry.fencing_token is None:
+            return False
+        # Fencing counters restart once they expire
+        if time.monotonic() - entry.fenced_at > FENCE_EXPIRY_SECONDS / 2:
+            return False
+        return token - entry.fencing_token in (0, 1)
+
+    async def _store_checkpoint(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata
+    ) -> tuple[Dict[str, Any], Dict[str, Any]]:
+        # The cache keeps the document as stored, so the checkpoint is serialized only once
+        upsert_query, doc = await super()._store_checkpoint(config, checkpoint, metadata)
+        if upsert_query["checkpoint_ns"]:
+            return upsert_query, doc
+        entry = CachedCheckpoint(
+            checkpoint_id=upsert_query["checkpoint_id"],
+            parent_checkpoint_id=doc["parent_checkpoint_id"],
+            checkpoint=(doc["type"], doc["checkpoint"]),
+            metadata=doc["metadata"]
+        )
+        self._fence(upsert_query["thread_id"], entry)
+        latest_checkpoint_cache.put(upsert_query["thread_id"], entry)
+        return upsert_query, doc
+
+    async def _store_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str
+    ) -> tuple[str, List[tuple[Dict[str, Any], Dict[str, Any]]]]:
+        set_method, docs = await super()._store_writes(config, writes, task_id, task_path)
+
+        configurable = config["configurable"]
+        entry = None if configurable["checkpoint_ns"] else latest_checkpoint_cache.get(configurable["thread_id"])
+        if entry is None or entry.checkpoint_id != configurable["checkpoint_id"]:
+            return set_method, docs
+        for upsert_query, doc in docs:
+            write_key = (task_id, task_path, upsert_query["idx"])
+            # Mirror the upsert: $setOnInsert keeps an existing write
+            if set_method == "$set" or write_key not in entry.writes:
+                entry.writes[write_key] = (task_id, doc["channel"], (doc["type"], doc["value"]))
+        return set_method, docs
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        latest_checkpoint_cache.pop(thread_id)
+        await super().adelete_thread(thread_id)
+
+    async def _load_tuple(self, config: RunnableConfig, thread_id: str) -> Optional[CheckpointTuple]:
+        """Read a root checkpoint from MongoDB, caching it when it is the latest of its thread."""
+        if get_checkpoint_id(config):
+            return await super().aget_tuple(config)
+
+        doc = await self.checkpoint_collection.find_one(
+            {"thread_id": thread_id, "checkpoint_ns": ""}, sort=[("checkpoint_id", -1)]
+        )
+        if doc is None:
+            return None
+        entry = CachedCheckpoint(
+            checkpoint_id=doc["checkpoint_id"],
+            parent_checkpoint_id=doc["parent_checkpoint_id"],
+            checkpoint=(doc["type"], doc["checkpoint"]),
+            metadata=doc["metadata"]
+        )
+        async for wrt in self.writes_collection.find(
+            {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": doc["checkpoint_id"]}
+        ):
+            entry.writes[(wrt["task_id"], wrt.get("task_path", ""), wrt["idx"])] = (
+                wrt["task_id"], wrt["channel"], (wrt["type"], wrt["value"])
+            )
+        self._fence(thread_id, entry)
+        latest_checkpoint_cache.put(thread_id, entry)
+        return self._to_tuple(thread_id, entry)
+
+    def _to_tuple(self, thread_id: str, entry: CachedCheckpoint) -> CheckpointTuple:
+        checkpoint_ns = ""
+        return CheckpointTuple(
+            {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": entry.checkpoint_id}},
+            self.serde.loads_typed(entry.checkpoint),
+            loads_metadata(entry.metadata),
+            (
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": entry.parent_checkpoint_id}}
+                if entry.parent_checkpoint_id
+                else None
+            ),
+            [(task_id, channel, self.serde.loads_typed(value)) for task_id, channel, value in entry.writes.values()]
+        )
+
+# Global checkpointer
+checkpointer = None
+
+async def get_checkpointer() -> CachedMongoDBSaver:
+    """
+    Get or create the async MongoDB checkpointer.
+
+    The checkpointer uses the shared MongoDB connection pool and is bound to the
+    event loop it is first created on, so create it from the server's loop at startup.
+
+    Returns:
+        CachedMongoDBSaver: The shared checkpointer
+    """
+    global checkpointer
+    if checkpointer is None:
+        client = await get_mongo_client()
+        checkpointer = CachedMongoDBSaver(
+            client,
+            db_name=MONGO_DB_NAME,
+            checkpoint_collection_name=CHECKPOINT_COLLECTION_NAME,
+            writes_collection_name=WRITES_COLLECTION_NAME,
+            ttl=RETENTION_CONFIG["ttl_seconds"] or None
+        )
+        # AsyncMongoDBSaver does not take a serde argument
+        checkpointer.serde = CompressedMsgpackSerializer()
+        logger.info("MongoDB checkpointer created successfully")
+    return checkpointer
+
+async def close_checkpointer():
+    """Drop the checkpointer and close its connection pool. Call this at application shutdown."""
+    global checkpointer
+    checkpointer = None
+    await close_mongo_client()
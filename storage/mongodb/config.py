@@ -0,0 +1,88 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+import logging
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+MONGO_CONNECTION_URL = os.environ.get("MONGO_CONNECTION_URL")
+MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME", "checkpointing_db")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "5"))
+
+# Checkpoint retention configuration (0 disables the respective mechanism)
+RETENTION_CONFIG = {
+    # Checkpoints and writes created this long ago are removed by TTL indexes on created_at
+    # (reading a checkpoint does not extend it; active threads keep writing new ones)
+    "ttl_seconds": int(os.environ.get("CHECKPOINT_TTL_SECONDS", str(30 * 24 * 60 * 60))),
+    # Root checkpoints kept per thread by the compactor, with the sub-graph checkpoints of their steps
+    "keep_last": int(os.environ.get("CHECKPOINT_KEEP_LAST", "20")),
+    "compaction_interval_seconds": int(os.environ.get("CHECKPOINT_COMPACTION_INTERVAL_SECONDS", "3600")),
+    "batch_size": 500
+}
+
+# Latest-checkpoint cache configuration
+CHECKPOINT_CACHE_CONFIG = {
+    # Threads whose latest checkpoint is kept in memory (0 disables the cache)
+    "max_threads": int(os.environ.get("CHECKPOINT_CACHE_MAX_THREADS", "1000")),
+    # Check with an index-only query that no other worker wrote a newer checkpoint before serving a hit,
+    # unless the turn lease shows no other turn of the thread ran since the entry was cached
+    "verify": os.environ.get("CHECKPOINT_CACHE_VERIFY", "true").lower() == "true"
+}
+
+# Cold tier of agent histories: histories about to expire in Redis are archived here, compressed
+HISTORY_ARCHIVE_CONFIG = {
+    "enabled": os.environ.get("HISTORY_ARCHIVE", "false").lower() == "true",
+    "collection": os.environ.get("HISTORY_ARCHIVE_COLLECTION", "agent_histories"),
+    # Archived histories not rehydrated or re-archived for this long are removed by a TTL index (0 keeps them)
+    "ttl_seconds": int(os.environ.get("HISTORY_ARCHIVE_TTL_SECONDS", str(30 * 24 * 60 * 60))),
+    # Histories whose Redis TTL is below this are archived; keep it above the interval
+    "archive_before_expiry_seconds": int(os.environ.get("HISTORY_ARCHIVE_BEFORE_EXPIRY_SECONDS", "600")),
+    "interval_seconds": int(os.environ.get("HISTORY_ARCHIVE_INTERVAL_SECONDS", "120")),
+    "batch_size": 200
+}
+
+# Scheme research shared between workflows with the same problem, region and crop
+RESEARCH_STORE_CONFIG = {
+    "enabled": os.environ.get("RESEARCH_STORE", "true").lower() == "true",
+    "collection": os.environ.get("RESEARCH_STORE_COLLECTION", "scheme_research"),
+    # Research older than this is not reused and removed by a TTL index
+    "ttl_seconds": int(os.environ.get("RESEARCH_STORE_TTL_SECONDS", str(14 * 24 * 60 * 60))),
+    # Min similarity (Jaccard of problem terms) for research of a differently worded problem to be
+    # reused; the terms the problems don't share must be filler words in any case
+    "similarity_threshold": float(os.environ.get("RESEARCH_STORE_SIMILARITY_THRESHOLD", "0.6")),
+    # Most recent research of the same region and crop compared for similarity
+    "max_candidates": 200
+}
+
+# Global mongo client (one connection pool shared by all checkpoint reads and writes)
+mongo_client = None
+
+async def get_mongo_client():
+    """Get or create the async MongoDB client."""
+    global mongo_client
+    if mongo_client is None:
+        try:
+            mongo_client = AsyncIOMotorClient(
+                MONGO_CONNECTION_URL,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=5000,
+                connectTimeoutMS=5000,
+                retryWrites=True
+            )
+            logger.info("MongoDB client created successfully")
+        except Exception as e:
+            logger.error(f"Failed to create MongoDB client: {str(e)}")
+            raise
+    return mongo_client
+
+async def close_mongo_client():
+    """Close the MongoDB client and its connection pool. Call this at application shutdown."""
+    global mongo_client
+    if mongo_client is not None:
+        mongo_client.close()
+        mongo_client = None
+        logger.info("MongoDB client closed")
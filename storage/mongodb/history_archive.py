@@ -0,0 +1,283 @@
+"""
+Cold tier of agent histories in MongoDB.
+
+Hot histories live in Redis and expire after MESSAGE_EXPIRY_SECONDS idle. The archiver scans
+Redis for histories whose TTL is about to run out and stores them zstd-compressed in MongoDB,
+so `BaseAgentHistory.load_or_create` can rehydrate a conversation that expired from Redis.
+Unchanged histories are detected by digest and not rewritten. The archiver runs in the
+background of every server process (scans are idempotent) or as a one-off command.
+
+Usage:
+    python -m storage.mongodb.history_archive indexes
+    python -m storage.mongodb.history_archive archive [--dry-run]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import logfire
+import zstandard
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from .config import get_mongo_client, close_mongo_client, MONGO_DB_NAME, HISTORY_ARCHIVE_CONFIG
+from .serde import SERDE_CONFIG
+from storage.redis.config import get_redis_client, close_redis_client
+from storage.redis.agent_history.base import set_cold_history_loader
+
+logger = logging.getLogger(__name__)
+
+TTL_INDEX_NAME = "archived_at_1"
+
+# Agent history keys, see storage.redis.agent_history.history_key_mapping
+MESSAGE_KEY_PATTERN = re.compile(r"^workflow:\{(?P<workflow_id>.+)\}:messages:(?P<agent_type>.+)$")
+
+archive_counter = logfire.metric_counter(
+    "history_archive.histories", unit="1", description="Agent histories by cold tier operation"
+)
+
+
+def _archive_id(workflow_id: str, agent_type: str) -> str:
+    return f"{workflow_id}:{agent_type}"
+
+
+async def get_archive_collection():
+    """Get the collection holding archived agent histories."""
+    client = await get_mongo_client()
+    return client[MONGO_DB_NAME][HISTORY_ARCHIVE_CONFIG["collection"]]
+
+
+async def ensure_archive_indexes() -> None:
+    """Create the `archived_at` TTL index of the archive collection, or update its expiry."""
+    ttl_seconds = HISTORY_ARCHIVE_CONFIG["ttl_seconds"]
+    if not ttl_seconds:
+        return
+
+    collection = await get_archive_collection()
+    existing = (await collection.index_information()).get(TTL_INDEX_NAME)
+    if existing is None:
+        await collection.create_index([("archived_at", 1)], name=TTL_INDEX_NAME, expireAfterSeconds=ttl_seconds)
+        logger.info(f"Created TTL index on {collection.name} ({ttl_seconds}s)")
+    elif existing.get("expireAfterSeconds") != ttl_seconds:
+        try:
+            await collection.database.command(
+                "collMod", collection.name, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": ttl_seconds}
+            )
+            logger.info(f"Updated TTL index on {collection.name} to {ttl_seconds}s")
+        except OperationFailure as e:
+            logger.error(f"Failed to update TTL index on {collection.name}: {str(e)}")
+
+
+async def archive_histories(histories: Dict[Tuple[str, str], bytes]) -> Dict[str, int]:
+    """
+    Store agent histories in the cold tier, skipping the ones archived unchanged before.
+
+    Args:
+        histories: Serialized (JSON) messages keyed by (workflow_id, agent_type)
+
+    Returns:
+        Dict with the number of histories archived and unchanged
+    """
+    result = {"archived": 0, "unchanged": 0}
+    if not histories:
+        return result
+
+    collection = await get_archive_collection()
+    digests = {
+        _archive_id(*history_key): hashlib.sha256(messages_json).hexdigest()
+        for history_key, messages_json in histories.items()
+    }
+    archived_digests = {
+        doc["_id"]: doc.get("digest")
+        async for doc in collection.find({"_id": {"$in": list(digests)}}, {"digest": 1})
+    }
+
+    compressor = zstandard.ZstdCompressor(level=SERDE_CONFIG["compression_level"])
+    now = datetime.now(timezone.utc)
+    operations = []
+    for (workflow_id, agent_type), messages_json in histories.items():
+        archive_id = _archive_id(workflow_id, agent_type)
+        if archived_digests.get(archive_id) == digests[archive_id]:
+            result["unchanged"] += 1
+            continue
+        operations.append(UpdateOne(
+            {"_id": archive_id},
+            {"$set": {
+                "workflow_id": workflow_id,
+                "agent_type": agent_type,
+                "digest": digests[archive_id],
+                "messages": compressor.compress(messages_json),
+                "size": len(messages_json),
+                "archived_at": now
+            }},
+            upsert=True
+        ))
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        result["archived"] = len(operations)
+
+    archive_counter.add(result["archived"], {"operation": "archived"})
+    archive_counter.add(result["unchanged"], {"operation": "unchanged"})
+    return result
+
+
+async def load_archived_history(workflow_id: str, agent_type: str) -> List[Dict[str, Any]]:
+    """
+    Load an agent history from the cold tier.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent
+
+    Returns:
+        List[Dict[str, Any]]: List of message dictionaries or empty list if not archived or on error
+    """
+    try:
+        collection = await get_archive_collection()
+        doc = await collection.find_one({"_id": _archive_id(workflow_id, agent_type)}, {"messages": 1})
+        if doc is None:
+            archive_counter.add(1, {"operation": "miss"})
+            return []
+
+        messages = json.loads(zstandard.ZstdDecompressor().decompress(doc["messages"]))
+
+        # Restart the cold tier expiry of a conversation that is active again
+        await collection.update_one({"_id": doc["_id"]}, {"$set": {"archived_at": datetime.now(timezone.utc)}})
+        archive_counter.add(1, {"operation": "rehydrated"})
+        return messages
+    except Exception as e:
+        logger.error(f"Failed to load archived history for workflow {workflow_id}, agent {agent_type}: {str(e)}")
+        return []
+
+
+async def archive_expiring_histories(dry_run: bool = False, scan_count: int = 1000) -> Dict[str, int]:
+    """
+    Archive the Redis agent histories that expire within HISTORY_ARCHIVE_BEFORE_EXPIRY_SECONDS.
+
+    Args:
+        dry_run: Only count the histories that would be archived
+        scan_count: SCAN batch size hint
+
+    Returns:
+        Dict with the number of histories scanned, expiring, archived and unchanged
+    """
+    result = {"scanned": 0, "expiring": 0, "archived": 0, "unchanged": 0}
+    threshold_ms = HISTORY_ARCHIVE_CONFIG["archive_before_expiry_seconds"] * 1000
+
+    # Get redis client
+    redis = await get_redis_client()
+
+    async def archive_batch(keys: List[str]) -> None:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.pttl(key)
+            ttls = await pipe.execute()
+        expiring = [key for key, ttl_ms in zip(keys, ttls) if 0 < ttl_ms <= threshold_ms]
+        result["expiring"] += len(expiring)
+        if dry_run or not expiring:
+            return
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in expiring:
+                pipe.get(key)
+            values = await pipe.execute()
+        histories = {}
+        for key, messages_json in zip(expiring, values):
+            # Expired between PTTL and GET
+            if messages_json is None:
+                continue
+            match = MESSAGE_KEY_PATTERN.match(key)
+            histories[(match["workflow_id"], match["agent_type"])] = (
+                messages_json.encode("utf-8") if isinstance(messages_json, str) else messages_json
+            )
+        for name, count in (await archive_histories(histories)).items():
+            result[name] += count
+
+    keys = []
+    async for raw_key in redis.scan_iter(match="workflow:{*}:messages:*", count=scan_count):
+        key = raw_key.decode("utf-8") if isinstance(raw_key, bytes) else raw_key
+        if not MESSAGE_KEY_PATTERN.match(key):
+            continue
+        result["scanned"] += 1
+        keys.append(key)
+        if len(keys) >= HISTORY_ARCHIVE_CONFIG["batch_size"]:
+            await archive_batch(keys)
+            keys = []
+    if keys:
+        await archive_batch(keys)
+
+    logger.info(f"History archive{' (dry run)' if dry_run else ''}: {result}")
+    return result
+
+
+async def run_archiver() -> None:
+    """Background task archiving expiring histories every archive interval."""
+    try:
+        await ensure_archive_indexes()
+    except Exception as e:
+        logger.error(f"Failed to ensure history archive indexes: {str(e)}")
+    while True:
+        await asyncio.sleep(HISTORY_ARCHIVE_CONFIG["interval_seconds"])
+        try:
+            await archive_expiring_histories()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"History archive failed: {str(e)}")
+
+
+def install_history_rehydration() -> None:
+    """Rehydrate agent histories that expired from Redis from the archive, if it is enabled. Call this at startup."""
+    if HISTORY_ARCHIVE_CONFIG["enabled"]:
+        set_cold_history_loader(load_archived_history)
+
+
+# Global archiver task
+archiver_task: Optional[asyncio.Task] = None
+
+def start_history_archiver() -> None:
+    """Start the background history archiver. Call this at application startup."""
+    global archiver_task
+    if archiver_task is None and HISTORY_ARCHIVE_CONFIG["enabled"]:
+        archiver_task = asyncio.create_task(run_archiver())
+        logger.info("History archiver started")
+
+async def stop_history_archiver() -> None:
+    """Cancel the background history archiver. Call this at application shutdown."""
+    global archiver_task
+    if archiver_task is not None:
+        archiver_task.cancel()
+        try:
+            await archiver_task
+        except asyncio.CancelledError:
+            pass
+        archiver_task = None
+        logger.info("History archiver stopped")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("indexes", help="Create or update the TTL index of the archive")
+    archive_parser = subparsers.add_parser("archive", help="Archive the histories about to expire in Redis")
+    archive_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.command == "indexes":
+            await ensure_archive_indexes()
+        elif args.command == "archive":
+            await archive_expiring_histories(dry_run=args.dry_run)
+    finally:
+        await close_redis_client()
+        await close_mongo_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,244 @@
+"""
+Scheme research shared between workflows.
+
+`research_gov_schemes` used to run a full `/scheme-research` for every farmer, even when
+another farmer had asked about the same problem the day before. Research results are stored
+here keyed by the normalised problem, region and crop; a later request with the same or a
+similarly worded problem for the same region and crop reuses the stored research while it is
+younger than RESEARCH_STORE_TTL_SECONDS. Research is only shared when the region is known,
+and a differently worded problem only matches when the crop is known too, the Jaccard
+similarity of the problem terms reaches the threshold and the terms the two problems don't
+share are all filler words ("hail damage" never matches "flood damage").
+
+Usage:
+    python -m storage.mongodb.research_store indexes
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from typing import Any, FrozenSet, Optional, Tuple
+
+import logfire
+import zstandard
+from pymongo.errors import OperationFailure
+
+from .config import get_mongo_client, close_mongo_client, MONGO_DB_NAME, RESEARCH_STORE_CONFIG
+from .serde import SERDE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+TTL_INDEX_NAME = "researched_at_1"
+
+# Words that don't tell two problems apart
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "by", "for", "from", "has", "have", "i", "in", "is", "it",
+    "my", "of", "on", "or", "the", "to", "we", "with", "our", "me", "any", "there", "what", "which"
+})
+
+# Words that may differ between two wordings of the same problem
+FILLER_WORDS = frozenset({
+    "help", "need", "want", "please", "get", "got", "can", "do", "does", "how", "should", "would",
+    "could", "about", "farmer", "farm", "farming", "crop", "field", "problem", "issue", "scheme",
+    "yojana", "support", "due", "because", "this", "that", "year", "season", "very", "lot", "some"
+})
+
+TERM_PATTERN = re.compile(r"\w+")
+
+research_counter = logfire.metric_counter(
+    "research_store.lookups", unit="1", description="Shared scheme research lookups by result (exact / similar / miss)"
+)
+
+indexes_ensured = False
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lower-case a problem, region or crop and collapse its whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+
+def problem_terms(problem: str) -> FrozenSet[str]:
+    """
+    Significant terms of a problem description, used for similarity matching.
+
+    Args:
+        problem: The farmer's problem description
+
+    Returns:
+        FrozenSet[str]: Terms without stop words, plural "s" stripped
+    """
+    terms = set()
+    for term in TERM_PATTERN.findall(normalize_text(problem)):
+        if term in STOP_WORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.add(term)
+    return frozenset(terms)
+
+
+def _research_id(problem: str, region: str, crop: str) -> str:
+    return hashlib.sha256(f"{region}\0{crop}\0{normalize_text(problem)}".encode("utf-8")).hexdigest()
+
+
+def _similarity(terms: FrozenSet[str], other: FrozenSet[str]) -> float:
+    """Jaccard similarity of two problems, 0 when they differ in a content word."""
+    if not terms or not other or (terms ^ other) - FILLER_WORDS:
+        return 0.0
+    return len(terms & other) / len(terms | other)
+
+
+async def get_research_collection():
+    """Get the collection holding shared scheme research."""
+    client = await get_mongo_client()
+    return client[MONGO_DB_NAME][RESEARCH_STORE_CONFIG["collection"]]
+
+
+async def ensure_research_indexes() -> None:
+    """Create the lookup index and the `researched_at` TTL index of the research collection."""
+    ttl_seconds = RESEARCH_STORE_CONFIG["ttl_seconds"]
+    collection = await get_research_collection()
+    await collection.create_index([("region", 1), ("crop", 1), ("researched_at", -1)])
+
+    existing = (await collection.index_information()).get(TTL_INDEX_NAME)
+    if existing is None:
+        await collection.create_index([("researched_at", 1)], name=TTL_INDEX_NAME, expireAfterSeconds=ttl_seconds)
+        logger.info(f"Created TTL index on {collection.name} ({ttl_seconds}s)")
+    elif existing.get("expireAfterSeconds") != ttl_seconds:
+        try:
+            await collection.database.command(
+                "collMod", collection.name, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": ttl_seconds}
+            )
+            logger.info(f"Updated TTL index on {collection.name} to {ttl_seconds}s")
+        except OperationFailure as e:
+            logger.error(f"Failed to update TTL index on {collection.name}: {str(e)}")
+
+
+async def find_research(problem: str, region: Optional[str] = None, crop: Optional[str] = None) -> Optional[Tuple[str, Any]]:
+    """
+    Find fresh research of the same or a similarly worded problem for the same region and crop.
+
+    Nothing is reused without a region, and only the exact problem without a crop.
+
+    Args:
+        problem: The farmer's problem description
+        region: The farmer's state or district, if known
+        crop: The affected crop, if known
+
+    Returns:
+        Optional[Tuple[str, Any]]: The workflow the research was done for and the research
+            result, or None if there is none or on error
+    """
+    if not RESEARCH_STORE_CONFIG["enabled"]:
+        return None
+
+    region, crop = normalize_text(region), normalize_text(crop)
+    if not region:
+        # Research of one state's farmers doesn't answer another's
+        return None
+    fresh_after = datetime.now(timezone.utc) - timedelta(seconds=RESEARCH_STORE_CONFIG["ttl_seconds"])
+    try:
+        collection = await get_research_collection()
+        doc = await collection.find_one({"_id": _research_id(problem, region, crop), "researched_at": {"$gte": fresh_after}})
+        result = "exact"
+        if doc is None and not crop:
+            research_counter.add(1, {"result": "miss"})
+            return None
+        if doc is None:
+            # Most similar recent research of the region and crop
+            terms, best_score, best_id = problem_terms(problem), 0.0, None
+            cursor = collection.find(
+                {"region": region, "crop": crop, "researched_at": {"$gte": fresh_after}},
+                {"terms": 1}
+            ).sort("researched_at", -1).limit(RESEARCH_STORE_CONFIG["max_candidates"])
+            async for candidate in cursor:
+                score = _similarity(terms, frozenset(candidate.get("terms", [])))
+                if score > best_score:
+                    best_score, best_id = score, candidate["_id"]
+            if best_id is None or best_score < RESEARCH_STORE_CONFIG["similarity_threshold"]:
+                research_counter.add(1, {"result": "miss"})
+                return None
+            doc = await collection.find_one({"_id": best_id})
+            result = "similar"
+            if doc is None:
+                return None
+
+        research = json.loads(zstandard.ZstdDecompressor().decompress(doc["research"]))
+        await collection.update_one({"_id": doc["_id"]}, {"$inc": {"reuses": 1}})
+        research_counter.add(1, {"result": result})
+        logger.info(f"Reusing research of workflow {doc.get('workflow_id')} ({result} match) for problem: {problem[:80]}")
+        return doc.get("workflow_id"), research
+    except Exception as e:
+        logger.error(f"Failed to look up shared research: {str(e)}")
+        return None
+
+
+async def save_research(workflow_id: str, problem: str, research: Any, region: Optional[str] = None, crop: Optional[str] = None) -> bool:
+    """
+    Share the research done for a workflow with later workflows that have the same problem.
+
+    Args:
+        workflow_id: The workflow the research was done for
+        problem: The farmer's problem description
+        research: The research result (JSON-serializable)
+        region: The farmer's state or district, if known
+        crop: The affected crop, if known
+
+    Returns:
+        bool: True if the research was saved successfully, False otherwise
+    """
+    global indexes_ensured
+    if not RESEARCH_STORE_CONFIG["enabled"]:
+        return False
+
+    region, crop = normalize_text(region), normalize_text(crop)
+    if not region:
+        # Never reused, see find_research
+        return False
+    try:
+        collection = await get_research_collection()
+        if not indexes_ensured:
+            await ensure_research_indexes()
+            indexes_ensured = True
+
+        research_json = json.dumps(research).encode("utf-8")
+        compressor = zstandard.ZstdCompressor(level=SERDE_CONFIG["compression_level"])
+        await collection.update_one(
+            {"_id": _research_id(problem, region, crop)},
+            {"$set": {
+                "workflow_id": workflow_id,
+                "problem": normalize_text(problem),
+                "region": region,
+                "crop": crop,
+                "terms": sorted(problem_terms(problem)),
+                "research": compressor.compress(research_json),
+                "size": len(research_json),
+                "researched_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save shared research of workflow {workflow_id}: {str(e)}")
+        return False
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("indexes", help="Create or update the indexes of the research collection")
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        await ensure_research_indexes()
+    finally:
+        await close_mongo_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
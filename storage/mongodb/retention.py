@@ -0,0 +1,234 @@
+"""
+Checkpoint retention: TTL indexes, keep-last-N compaction and backfill of old documents.
+
+Usage:
+    python -m storage.mongodb.retention indexes
+    python -m storage.mongodb.retention backfill [--dry-run]
+    python -m storage.mongodb.retention compact [--keep-last N] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from .config import RETENTION_CONFIG
+from .checkpointer import get_checkpointer, close_checkpointer, RetentionMongoDBSaver
+
+logger = logging.getLogger(__name__)
+
+TTL_INDEX_NAME = "created_at_1"
+
+# Offset between the UUID epoch (1582-10-15) and the Unix epoch in 100 ns intervals
+UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_id_to_datetime(checkpoint_id: str) -> Optional[datetime]:
+    """
+    Recover the creation time encoded in a LangGraph checkpoint id (UUIDv6).
+
+    Args:
+        checkpoint_id: The checkpoint id
+
+    Returns:
+        The creation time in UTC, or None when the id is not a UUIDv6
+    """
+    try:
+        value = uuid.UUID(checkpoint_id)
+    except (TypeError, ValueError):
+        return None
+    if value.version != 6:
+        return None
+    timestamp = ((value.int >> 80) << 12) | ((value.int >> 64) & 0xFFF)
+    return datetime.fromtimestamp((timestamp - UUID_EPOCH_OFFSET) / 1e7, tz=timezone.utc)
+
+
+async def ensure_ttl_indexes(saver: RetentionMongoDBSaver) -> None:
+    """
+    Create the `created_at` TTL index on the checkpoint and write collections, or update its expiry.
+
+    Args:
+        saver: The checkpointer whose collections are indexed
+    """
+    for collection in (saver.checkpoint_collection, saver.writes_collection):
+        indexes = await collection.index_information()
+        existing = indexes.get(TTL_INDEX_NAME)
+        if existing is None:
+            await collection.create_index([("created_at", 1)], name=TTL_INDEX_NAME, expireAfterSeconds=saver.ttl)
+            logger.info(f"Created TTL index on {collection.name} ({saver.ttl}s)")
+        elif existing.get("expireAfterSeconds") != saver.ttl:
+            try:
+                await saver.db.command(
+                    "collMod", collection.name, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": saver.ttl}
+                )
+                logger.info(f"Updated TTL index on {collection.name} to {saver.ttl}s")
+            except OperationFailure as e:
+                logger.error(f"Failed to update TTL index on {collection.name}: {str(e)}")
+
+
+async def compact_checkpoints(
+    saver: RetentionMongoDBSaver,
+    keep_last: Optional[int] = None,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Delete all but the newest `keep_last` root checkpoints of every thread, with their writes.
+
+    Checkpoint ids are time-ordered, so the newest checkpoints sort last. The latest checkpoint of a
+    thread is always kept, so resuming is unaffected; only time travel to old steps is lost.
+
+    Agent sub-graphs checkpoint under a new namespace on every turn, so sub-graph checkpoints are
+    not counted per namespace: those older than the oldest kept root checkpoint belong to steps
+    whose root checkpoint was dropped, and are deleted with it.
+
+    Args:
+        saver: The checkpointer to compact
+        keep_last: Root checkpoints to keep per thread (default from RETENTION_CONFIG)
+        dry_run: Only count what would be deleted
+
+    Returns:
+        Dict with the number of threads compacted and checkpoints / writes deleted
+    """
+    keep_last = RETENTION_CONFIG["keep_last"] if keep_last is None else keep_last
+    result = {"threads": 0, "checkpoints": 0, "writes": 0}
+    if keep_last <= 0:
+        return result
+
+    async def delete(query: Dict[str, Any]) -> None:
+        if dry_run:
+            result["checkpoints"] += await saver.checkpoint_collection.count_documents(query)
+            result["writes"] += await saver.writes_collection.count_documents(query)
+            return
+        result["checkpoints"] += (await saver.checkpoint_collection.delete_many(query)).deleted_count
+        result["writes"] += (await saver.writes_collection.delete_many(query)).deleted_count
+
+    groups = saver.checkpoint_collection.aggregate(
+        [
+            {"$match": {"checkpoint_ns": ""}},
+            {"$group": {"_id": "$thread_id", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": keep_last}}}
+        ],
+        allowDiskUse=True
+    )
+    async for group in groups:
+        thread = {"thread_id": group["_id"], "checkpoint_ns": ""}
+        cursor = saver.checkpoint_collection.find(
+            thread, {"checkpoint_id": 1, "_id": 0}
+        ).sort("checkpoint_id", -1).skip(keep_last - 1)
+        checkpoint_ids = [doc["checkpoint_id"] async for doc in cursor]
+        oldest_kept_id, expired_ids = checkpoint_ids[0], checkpoint_ids[1:]
+
+        result["threads"] += 1
+        for start in range(0, len(expired_ids), RETENTION_CONFIG["batch_size"]):
+            await delete({**thread, "checkpoint_id": {"$in": expired_ids[start:start + RETENTION_CONFIG["batch_size"]]}})
+        await delete({"thread_id": group["_id"], "checkpoint_ns": {"$ne": ""}, "checkpoint_id": {"$lt": oldest_kept_id}})
+
+    logger.info(f"Checkpoint compaction{' (dry run)' if dry_run else ''}: {result}")
+    return result
+
+
+async def backfill_created_at(saver: RetentionMongoDBSaver, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Stamp `created_at` on documents written before retention was enabled so TTL applies to them.
+
+    The time is recovered from the checkpoint id; documents with an unrecognised id get the
+    current time and expire one TTL from now.
+
+    Args:
+        saver: The checkpointer whose collections are backfilled
+        dry_run: Only count the documents missing `created_at`
+
+    Returns:
+        Dict with the number of documents stamped per collection
+    """
+    result = {}
+    for collection in (saver.checkpoint_collection, saver.writes_collection):
+        query = {"created_at": {"$exists": False}}
+        if dry_run:
+            result[collection.name] = await collection.count_documents(query)
+            continue
+
+        stamped = 0
+        operations: List[Any] = []
+        async for doc in collection.find(query, {"checkpoint_id": 1}):
+            created_at = checkpoint_id_to_datetime(doc.get("checkpoint_id")) or datetime.now(timezone.utc)
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"created_at": created_at}}))
+            if len(operations) >= RETENTION_CONFIG["batch_size"]:
+                stamped += (await collection.bulk_write(operations, ordered=False)).modified_count
+                operations = []
+        if operations:
+            stamped += (await collection.bulk_write(operations, ordered=False)).modified_count
+        result[collection.name] = stamped
+
+    logger.info(f"Checkpoint created_at backfill{' (dry run)' if dry_run else ''}: {result}")
+    return result
+
+
+async def run_compactor() -> None:
+    """Background task compacting the checkpoint collections every compaction interval."""
+    while True:
+        await asyncio.sleep(RETENTION_CONFIG["compaction_interval_seconds"])
+        try:
+            await compact_checkpoints(await get_checkpointer())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Checkpoint compaction failed: {str(e)}")
+
+
+# Global compactor task
+compactor_task = None
+
+def start_compactor() -> None:
+    """Start the background compactor. Call this at application startup."""
+    global compactor_task
+    if compactor_task is None and RETENTION_CONFIG["keep_last"] > 0:
+        compactor_task = asyncio.create_task(run_compactor())
+        logger.info("Checkpoint compactor started")
+
+async def stop_compactor() -> None:
+    """Cancel the background compactor. Call this at application shutdown."""
+    global compactor_task
+    if compactor_task is not None:
+        compactor_task.cancel()
+        try:
+            await compactor_task
+        except asyncio.CancelledError:
+            pass
+        compactor_task = None
+        logger.info("Checkpoint compactor stopped")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("indexes", help="Create or update the TTL indexes")
+    backfill_parser = subparsers.add_parser("backfill", help="Stamp created_at on documents written before retention")
+    backfill_parser.add_argument("--dry-run", action="store_true")
+    compact_parser = subparsers.add_parser("compact", help="Keep only the newest root checkpoints of every thread")
+    compact_parser.add_argument("--keep-last", type=int, default=None)
+    compact_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    saver = await get_checkpointer()
+    try:
+        if args.command == "indexes":
+            if not saver.ttl:
+                logger.warning("CHECKPOINT_TTL_SECONDS is 0, no TTL indexes to create")
+            else:
+                await ensure_ttl_indexes(saver)
+        elif args.command == "backfill":
+            await backfill_created_at(saver, dry_run=args.dry_run)
+        elif args.command == "compact":
+            await compact_checkpoints(saver, keep_last=args.keep_last, dry_run=args.dry_run)
+    finally:
+        await close_checkpointer()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import logging
+import os
+import threading
+from typing import Any
+
+import zstandard
+from dotenv import load_dotenv
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint serializer configuration
+SERDE_CONFIG = {
+    # Payloads smaller than this are stored uncompressed (zstd frame overhead outweighs the gain)
+    "compression_threshold_bytes": int(os.environ.get("CHECKPOINT_COMPRESSION_THRESHOLD_BYTES", "512")),
+    "compression_level": int(os.environ.get("CHECKPOINT_COMPRESSION_LEVEL", "3"))
+}
+
+# Bump when the compressed layout changes; older versions stay readable
+SERDE_VERSION = 1
+COMPRESSED_SUFFIX = "+zstd.v"
+
+# Types produced by JsonPlusSerializer that are worth compressing
+COMPRESSIBLE_TYPES = ("msgpack", "json", "pickle")
+
+
+class CompressedMsgpackSerializer(JsonPlusSerializer):
+    """
+    Checkpoint serializer that stores msgpack payloads zstd-compressed.
+
+    Payloads are encoded with ormsgpack by `JsonPlusSerializer` and compressed when they are
+    larger than the threshold. The stored type carries the codec and version tag, e.g.
+    `msgpack+zstd.v1`, so checkpoints written before compression was enabled (plain
+    `msgpack` / `json`) or by an older version are still read.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # zstd contexts are reused for speed but must not be shared between threads
+        self._local = threading.local()
+
+    @property
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=SERDE_CONFIG["compression_level"])
+        return self._local.compressor
+
+    @property
+    def _decompressor(self) -> zstandard.ZstdDecompressor:
+        if not hasattr(self._local, "decompressor"):
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.decompressor
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if type_ not in COMPRESSIBLE_TYPES or len(data) < SERDE_CONFIG["compression_threshold_bytes"]:
+            return type_, data
+        return f"{type_}{COMPRESSED_SUFFIX}{SERDE_VERSION}", self._compressor.compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, data_ = data
+        if COMPRESSED_SUFFIX in type_:
+            type_, version = type_.rsplit(COMPRESSED_SUFFIX, 1)
+            if int(version) > SERDE_VERSION:
+                raise NotImplementedError(f"Checkpoint written by a newer serializer version: v{version}")
+            data_ = self._decompressor.decompress(data_)
+        return super().loads_typed((type_, data_))
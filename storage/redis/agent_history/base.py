@@ -1,11 +1,29 @@
 import logging
-from typing import List, Dict, ClassVar, Type, TypeVar, Any
+from typing import List, Dict, ClassVar, Type, TypeVar, Any, Awaitable, Callable, Optional
 from pydantic import BaseModel, Field
 from .save_history import save_messages_to_redis
 from .load_history import load_history
+from .write_behind import get_history_writer, flush_history_writes
+from ..config import HISTORY_WRITE_BEHIND
+from ..workflow_lock.workflow_lock import get_fencing_token
 
 logger = logging.getLogger(__name__)
 
+# Loads a history that expired from Redis from a cold tier: (workflow_id, agent_type) -> messages
+ColdHistoryLoader = Callable[[str, str], Awaitable[List[Dict[str, Any]]]]
+
+cold_history_loader: Optional[ColdHistoryLoader] = None
+
+def set_cold_history_loader(loader: Optional[ColdHistoryLoader]) -> None:
+    """
+    Set the cold tier histories that expired from Redis are rehydrated from.
+
+    Args:
+        loader: The cold tier's loader, None disables rehydration
+    """
+    global cold_history_loader
+    cold_history_loader = loader
+
 # Type variable for the class
 T = TypeVar('T', bound='BaseAgentHistory')
 
@@ -34,6 +52,9 @@ class BaseAgentHistory(BaseModel):
         """
         Load messages from Redis or create a new instance if not found.
         
+        When a cold tier is set (see `set_cold_history_loader`), a history that expired from
+        Redis is loaded from it and written back to Redis.
+        
         Args:
             workflow_id: The unique identifier for the workflow
             
@@ -48,6 +69,10 @@ class BaseAgentHistory(BaseModel):
             raise ValueError("workflow_id must be provided")
             
         try:
+            # Write-behind saves of this workflow must land before reading it back
+            if HISTORY_WRITE_BEHIND:
+                await flush_history_writes(workflow_id)
+            
             # Load from Redis
             logger.debug(f"Attempting to load {cls.__name__} for workflow: {workflow_id}")
             messages = await load_history(workflow_id, cls.agent_type)
@@ -57,6 +82,16 @@ class BaseAgentHistory(BaseModel):
                 logger.debug(f"Loaded {len(messages)} messages for {cls.__name__}, workflow: {workflow_id}")
                 return cls(messages=messages)
             
+            # Rehydrate a conversation that expired from Redis from the cold tier
+            if cold_history_loader is not None:
+                messages = await cold_history_loader(workflow_id, cls.agent_type)
+                if messages:
+                    logger.debug(f"Rehydrated {len(messages)} archived messages for {cls.__name__}, workflow: {workflow_id}")
+                    await save_messages_to_redis(
+                        workflow_id, cls.agent_type, messages, get_fencing_token(workflow_id, cls.agent_type)
+                    )
+                    return cls(messages=messages)
+            
             # If not in Redis, create a new instance
             logger.debug(f"No existing {cls.__name__} found for workflow: {workflow_id}, creating new instance")
             return cls()
@@ -69,6 +104,9 @@ class BaseAgentHistory(BaseModel):
         """
         Save messages to Redis with automatic expiration.
         
+        With HISTORY_WRITE_BEHIND enabled the messages are queued and written in the
+        background; the next load_or_create of the workflow flushes them first.
+        
         Args:
             workflow_id: The unique identifier for the workflow
             
@@ -94,9 +132,20 @@ class BaseAgentHistory(BaseModel):
                         serialized_msg[key] = value
                 serializable_messages.append(serialized_msg)
             
+            # Saves under a workflow lease are fenced against newer turns
+            fencing_token = get_fencing_token(workflow_id, self.__class__.agent_type)
+            
+            # Queue the write when persisting off the response path
+            if HISTORY_WRITE_BEHIND:
+                logger.debug(f"Queueing {len(serializable_messages)} messages for {self.__class__.__name__}, workflow: {workflow_id}")
+                await get_history_writer().enqueue(workflow_id, self.__class__.agent_type, serializable_messages, fencing_token)
+                return True
+            
             # Save to Redis (with expiry automatically set)
             logger.debug(f"Saving {len(serializable_messages)} messages for {self.__class__.__name__}, workflow: {workflow_id}")
-            result = await save_messages_to_redis(workflow_id, self.__class__.agent_type, serializable_messages)
+            result = await save_messages_to_redis(
+                workflow_id, self.__class__.agent_type, serializable_messages, fencing_token
+            )
             
             if result:
                 logger.debug(f"Successfully saved {self.__class__.__name__} for workflow: {workflow_id}")
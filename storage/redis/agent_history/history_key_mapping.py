@@ -12,6 +12,7 @@ async def get_message_key(workflow_id: str, agent_type: str) -> str:
         agent_type: The type of agent (e.g., 'worker_agent', 'sub_agent')
         
     Returns:
-        str: Formatted Redis key in the pattern "workflow:{workflow_id}:messages:{agent_type}"
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:messages:{agent_type}"
+            (the braces around the workflow id are a Redis Cluster hash tag)
     """
-    return f"workflow:{workflow_id}:messages:{agent_type}"
\ No newline at end of file
+    return f"workflow:{{{workflow_id}}}:messages:{agent_type}"
\ No newline at end of file
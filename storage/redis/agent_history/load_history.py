@@ -3,6 +3,7 @@ import logging
 from typing import Any, Dict, List
 from .history_key_mapping import get_message_key
 from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS
+from ..read_routing import routed_get
 
 logger = logging.getLogger(__name__)
 
@@ -25,18 +26,17 @@ async def load_history(workflow_id: str, agent_type: str) -> List[Dict[str, Any]
     key = await get_message_key(workflow_id, agent_type)
     
     try:
-        # Get redis client
-        redis = await get_redis_client()
-        
-        # Retrieve from Redis (async)
-        messages_json = await redis.get(key)
+        # Retrieve from a read replica when possible (async)
+        messages_json = await routed_get(workflow_id, key)
         
         if not messages_json:
             logger.debug(f"No messages found for workflow: {workflow_id}, agent: {agent_type}")
             return []
             
-        # Reset expiration time on access
+        # Reset expiration time on access (on the primary)
         try:
+            # Get redis client
+            redis = await get_redis_client()
             await redis.expire(key, MESSAGE_EXPIRY_SECONDS)
         except Exception as e:
             logger.warning(f"Failed to reset expiration for key {key}: {str(e)}")
@@ -1,8 +1,12 @@
+import asyncio
 import json
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from .history_key_mapping import get_message_key
-from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS
+from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS, REDIS_CLUSTER
+from ..read_routing import execute_replicated, record_write
+from ..workflow_lock.lock_key_mapping import get_fence_key
+from ..workflow_lock.workflow_lock import FENCED_SETEX_SCRIPT
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +14,8 @@ logger = logging.getLogger(__name__)
 async def save_messages_to_redis(
     workflow_id: str, 
     agent_type: str, 
-    messages: Any
+    messages: Any,
+    fencing_token: Optional[int] = None
 ) -> bool:
     """
     Saves messages to Redis with expiration time.
@@ -19,6 +24,8 @@ async def save_messages_to_redis(
         workflow_id: The unique identifier for the workflow
         agent_type: The type of agent (e.g., 'worker_agent', 'sub_agent')
         messages: List of message dictionaries to store
+        fencing_token: Token of the workflow lease the save is made under; the save is
+            rejected when a newer lease has been issued since
         
     Returns:
         bool: True if messages were saved successfully, False otherwise
@@ -40,12 +47,32 @@ async def save_messages_to_redis(
         # Serialize messages to JSON string
         messages_json = json.dumps(messages)
         
+        if fencing_token is not None:
+            fenced_setex = redis.register_script(FENCED_SETEX_SCRIPT)
+            fence_args = {
+                "keys": [key, await get_fence_key(workflow_id, agent_type)],
+                "args": [fencing_token, MESSAGE_EXPIRY_SECONDS, messages_json]
+            }
+            if REDIS_CLUSTER:
+                # Cluster pipelines don't load scripts
+                result = await fenced_setex(**fence_args)
+                record_write(workflow_id)
+            else:
+                async with redis.pipeline(transaction=False) as pipe:
+                    await fenced_setex(**fence_args, client=pipe)
+                    result, = await execute_replicated(pipe, [workflow_id])
+            if not result:
+                logger.warning(f"Rejected stale history save for workflow {workflow_id}, agent {agent_type} (fencing token {fencing_token})")
+            return bool(result)
+        
         # Use async Redis client
-        result = await redis.setex(
-            key,
-            MESSAGE_EXPIRY_SECONDS,
-            messages_json
-        )
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.setex(
+                key,
+                MESSAGE_EXPIRY_SECONDS,
+                messages_json
+            )
+            result, = await execute_replicated(pipe, [workflow_id])
         return result  # Redis returns True if successful
     except json.JSONDecodeError as e:
         logger.error(f"JSON serialization error for workflow {workflow_id}: {str(e)}")
@@ -53,3 +80,60 @@ async def save_messages_to_redis(
     except Exception as e:
         logger.error(f"Failed to save messages to Redis for workflow {workflow_id}: {str(e)}")
         return False
+
+
+# Saving several histories in one round trip
+async def save_messages_batch_to_redis(batch: Dict[Tuple[str, str], Tuple[Any, Optional[int]]]) -> bool:
+    """
+    Saves the messages of several workflows / agents to Redis in one pipeline.
+    
+    Args:
+        batch: (messages, fencing_token) keyed by (workflow_id, agent_type); see save_messages_to_redis
+        
+    Returns:
+        bool: True if all messages were written or rejected as stale, False otherwise
+    """
+    if not batch:
+        return True
+    
+    try:
+        # Get redis client
+        redis = await get_redis_client()
+        
+        fenced_setex = redis.register_script(FENCED_SETEX_SCRIPT)
+        
+        async with redis.pipeline(transaction=False) as pipe:
+            # Cluster pipelines don't load scripts, fenced writes then run alongside the pipeline
+            pipelined_keys, fenced_keys, fenced_writes = [], [], []
+            for history_key, (messages, fencing_token) in batch.items():
+                key = await get_message_key(*history_key)
+                if fencing_token is None:
+                    pipe.setex(key, MESSAGE_EXPIRY_SECONDS, json.dumps(messages))
+                    pipelined_keys.append(history_key)
+                    continue
+                fence_args = {
+                    "keys": [key, await get_fence_key(*history_key)],
+                    "args": [fencing_token, MESSAGE_EXPIRY_SECONDS, json.dumps(messages)]
+                }
+                if REDIS_CLUSTER:
+                    fenced_writes.append(fenced_setex(**fence_args))
+                    fenced_keys.append(history_key)
+                else:
+                    await fenced_setex(**fence_args, client=pipe)
+                    pipelined_keys.append(history_key)
+            workflow_ids = {workflow_id for workflow_id, _ in batch}
+            pipeline_results, *fenced_results = await asyncio.gather(
+                execute_replicated(pipe, workflow_ids), *fenced_writes
+            )
+        
+        for (workflow_id, agent_type), result in zip(pipelined_keys + fenced_keys, pipeline_results + fenced_results):
+            if not result:
+                # A stale write must not be retried
+                logger.warning(f"Rejected stale history save for workflow {workflow_id}, agent {agent_type}")
+        return True
+    except (TypeError, ValueError) as e:
+        logger.error(f"JSON serialization error for history batch: {str(e)}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to save history batch of {len(batch)} entries to Redis: {str(e)}")
+        return False
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+import logfire
+from .save_history import save_messages_batch_to_redis
+from ..config import HISTORY_WRITE_BEHIND_MAX_PENDING, HISTORY_WRITE_BEHIND_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# (workflow_id, agent_type)
+HistoryKey = Tuple[str, str]
+
+dropped_counter = logfire.metric_counter(
+    "agent_history.dropped_writes", unit="1", description="Agent history saves lost after failed Redis writes"
+)
+
+class HistoryWriteBehind:
+    """
+    Queue that persists agent histories to Redis in the background.
+
+    Repeated saves of the same history are coalesced, only the latest messages are written.
+    Pending histories are written in batches through one Redis pipeline. Writes (by the worker
+    and by `flush`) are serialized by a lock so an older payload never overwrites a newer one.
+    The queue holds at most `max_pending` distinct histories; further saves wait for room.
+    A batch that still fails after `attempts` writes goes back to the queue and is retried,
+    unless a newer save replaced it; saves that can't be kept (queue full, or shutdown) are
+    counted in `stats["dropped"]` and the `agent_history.dropped_writes` metric.
+
+    The queue and lock are bound to the event loop the writer is used on, so there is one
+    writer per loop (see `get_history_writer`). Read-your-writes only holds within that loop:
+    call `flush` for a workflow before loading its histories, and `close` at shutdown.
+    """
+
+    def __init__(self, max_pending: int, batch_size: int, attempts: int = 3, retry_delay: float = 1.0):
+        self.batch_size = batch_size
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self._pending: Dict[HistoryKey, Any] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._lock = asyncio.Lock()
+        self._worker: Optional[asyncio.Task] = None
+        self.stats = {"saves": 0, "coalesced": 0, "writes": 0, "batches": 0, "failed": 0, "dropped": 0}
+
+    async def enqueue(
+        self,
+        workflow_id: str,
+        agent_type: str,
+        messages: Any,
+        fencing_token: Optional[int] = None
+    ) -> None:
+        """
+        Queue the latest messages of a history for writing.
+
+        Args:
+            workflow_id: The unique identifier for the workflow
+            agent_type: The type of agent
+            messages: JSON-serializable list of message dictionaries
+            fencing_token: Token of the workflow lease the save is made under
+        """
+        key = (workflow_id, agent_type)
+        self.stats["saves"] += 1
+        if key in self._pending:
+            self._pending[key] = (messages, fencing_token)
+            self.stats["coalesced"] += 1
+            return
+
+        self._pending[key] = (messages, fencing_token)
+        self._ensure_worker()
+        await self._queue.put(key)
+
+    async def flush(self, workflow_id: Optional[str] = None) -> bool:
+        """
+        Write the pending histories of a workflow (or all of them) now.
+
+        Args:
+            workflow_id: The workflow to flush, None flushes everything
+
+        Returns:
+            bool: True if nothing failed to be written
+        """
+        async with self._lock:
+            batch = {
+                key: self._pending.pop(key)
+                for key in list(self._pending)
+                if workflow_id is None or key[0] == workflow_id
+            }
+            return await self._write(batch)
+
+    async def close(self) -> None:
+        """Flush every pending history and stop the worker. Call this at application shutdown."""
+        await self.flush()
+        if self._pending:
+            self._drop(len(self._pending), "at shutdown")
+            self._pending.clear()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            keys = [await self._queue.get()]
+            while len(keys) < self.batch_size and not self._queue.empty():
+                keys.append(self._queue.get_nowait())
+
+            try:
+                async with self._lock:
+                    # Keys flushed in the meantime have nothing pending any more
+                    batch = {key: self._pending.pop(key) for key in keys if key in self._pending}
+                    written = await self._write(batch)
+                if not written:
+                    # Redis is failing, don't retry the requeued batch right away
+                    await asyncio.sleep(self.retry_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"History write-behind worker error: {str(e)}")
+            finally:
+                for _ in keys:
+                    self._queue.task_done()
+
+    async def _write(self, batch: Dict[HistoryKey, Any]) -> bool:
+        if not batch:
+            return True
+
+        for attempt in range(1, self.attempts + 1):
+            if await save_messages_batch_to_redis(batch):
+                self.stats["writes"] += len(batch)
+                self.stats["batches"] += 1
+                return True
+            if attempt < self.attempts:
+                await asyncio.sleep(0.5 * attempt)
+
+        self.stats["failed"] += len(batch)
+        requeued = dropped = 0
+        for key, payload in batch.items():
+            if key in self._pending:
+                # A newer save of the history is already queued
+                continue
+            if self._queue.full():
+                dropped += 1
+                continue
+            self._pending[key] = payload
+            self._queue.put_nowait(key)
+            requeued += 1
+        if requeued:
+            self._ensure_worker()
+            logger.warning(f"Requeued {requeued} agent histories after {self.attempts} failed write attempts")
+        if dropped:
+            self._drop(dropped, "with the write-behind queue full")
+        return False
+
+    def _drop(self, count: int, reason: str) -> None:
+        self.stats["dropped"] += count
+        dropped_counter.add(count)
+        logger.error(f"Dropped {count} agent history saves {reason} after failed writes")
+
+# One write-behind queue per event loop (its queue and lock are bound to the loop)
+history_writers: Dict[asyncio.AbstractEventLoop, HistoryWriteBehind] = {}
+
+def get_history_writer() -> HistoryWriteBehind:
+    """Get or create the write-behind queue of the running event loop."""
+    loop = asyncio.get_running_loop()
+    writer = history_writers.get(loop)
+    if writer is None:
+        for closed in [loop for loop in history_writers if loop.is_closed()]:
+            del history_writers[closed]
+        writer = history_writers[loop] = HistoryWriteBehind(
+            HISTORY_WRITE_BEHIND_MAX_PENDING,
+            HISTORY_WRITE_BEHIND_BATCH_SIZE
+        )
+    return writer
+
+async def flush_history_writes(workflow_id: Optional[str] = None) -> bool:
+    """
+    Write pending agent histories now.
+
+    Args:
+        workflow_id: The workflow to flush, None flushes everything
+
+    Returns:
+        bool: True if nothing failed to be written
+    """
+    return await get_history_writer().flush(workflow_id)
+
+async def close_history_writer() -> None:
+    """Flush pending agent histories and stop the writer. Call this at application shutdown."""
+    writer = history_writers.pop(asyncio.get_running_loop(), None)
+    if writer is not None:
+        await writer.close()
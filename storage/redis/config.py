@@ -1,39 +1,241 @@
 import redis.asyncio as redis
+from redis.asyncio.cluster import RedisCluster
+from redis.cluster import LoadBalancingStrategy
+import asyncio
+import itertools
 import os
+import time
+from typing import Dict, List
 from dotenv import load_dotenv
 import logging
+import logfire
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 REDIS_URL = os.environ.get("REDIS_URL")
+# Connect to a Redis Cluster (REDIS_URL points at any of its nodes)
+REDIS_CLUSTER = os.environ.get("REDIS_CLUSTER", "false").lower() == "true"
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "100"))
+REDIS_POOL_TIMEOUT_SECONDS = float(os.environ.get("REDIS_POOL_TIMEOUT_SECONDS", "5"))
+# Read replicas for history and state loads (standalone replica URLs; a cluster uses its own replicas)
+REDIS_READ_FROM_REPLICAS = os.environ.get("REDIS_READ_FROM_REPLICAS", "false").lower() == "true"
+REDIS_REPLICA_URLS = [url.strip() for url in os.environ.get("REDIS_REPLICA_URLS", "").split(",") if url.strip()]
+REDIS_READ_YOUR_WRITES_SECONDS = float(os.environ.get("REDIS_READ_YOUR_WRITES_SECONDS", "2"))
+REDIS_WRITE_WAIT_REPLICAS = int(os.environ.get("REDIS_WRITE_WAIT_REPLICAS", "0"))
+REDIS_WRITE_WAIT_TIMEOUT_MS = int(os.environ.get("REDIS_WRITE_WAIT_TIMEOUT_MS", "100"))
 MESSAGE_EXPIRY_SECONDS = int(os.environ.get("MESSAGE_EXPIRY_SECONDS", "3600"))
+USAGE_EXPIRY_SECONDS = int(os.environ.get("USAGE_EXPIRY_SECONDS", str(35 * 24 * 3600)))
 
-# Global redis client
-redis_client = None
+# Write-behind persistence of agent histories (saves are queued and written off the response path)
+HISTORY_WRITE_BEHIND = os.environ.get("HISTORY_WRITE_BEHIND", "false").lower() == "true"
+HISTORY_WRITE_BEHIND_MAX_PENDING = int(os.environ.get("HISTORY_WRITE_BEHIND_MAX_PENDING", "1000"))
+HISTORY_WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("HISTORY_WRITE_BEHIND_BATCH_SIZE", "50"))
+
+# Per-workflow leases around agent turns and coalescing of identical in-flight requests
+WORKFLOW_LOCK = os.environ.get("WORKFLOW_LOCK", "true").lower() == "true"
+WORKFLOW_LOCK_LEASE_SECONDS = int(os.environ.get("WORKFLOW_LOCK_LEASE_SECONDS", "30"))
+WORKFLOW_LOCK_WAIT_SECONDS = int(os.environ.get("WORKFLOW_LOCK_WAIT_SECONDS", "180"))
+SINGLE_FLIGHT_RESULT_TTL_SECONDS = int(os.environ.get("SINGLE_FLIGHT_RESULT_TTL_SECONDS", "30"))
+
+# Per-workflow stream of status / final output events (XREAD blocks must stay below the 5s socket timeout)
+WORKFLOW_EVENTS_MAXLEN = int(os.environ.get("WORKFLOW_EVENTS_MAXLEN", "100"))
+WORKFLOW_EVENTS_BLOCK_MS = min(int(os.environ.get("WORKFLOW_EVENTS_BLOCK_MS", "4000")), 4500)
+
+# Agent turns run in the API process ("inline") or on worker processes through a Redis Streams queue ("queue")
+AGENT_EXECUTION_MODE = os.environ.get("AGENT_EXECUTION_MODE", "inline").lower()
+AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get("AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS", "120"))
+AGENT_QUEUE_MAX_DELIVERIES = int(os.environ.get("AGENT_QUEUE_MAX_DELIVERIES", "3"))
+AGENT_QUEUE_RESULT_TIMEOUT_SECONDS = int(os.environ.get("AGENT_QUEUE_RESULT_TIMEOUT_SECONDS", "900"))
+AGENT_QUEUE_DEAD_LETTER_MAXLEN = int(os.environ.get("AGENT_QUEUE_DEAD_LETTER_MAXLEN", "10000"))
+
+# Per-workflow cache of RAG query answers, dropped whenever new data is added to the workflow's collection
+RAG_CACHE = os.environ.get("RAG_CACHE", "true").lower() == "true"
+RAG_CACHE_TTL_SECONDS = int(os.environ.get("RAG_CACHE_TTL_SECONDS", "3600"))
+
+# Chunks of the local RAG backend (RAG_BACKEND=local), kept after the last insert into a workflow's collection
+RAG_CHUNKS_EXPIRY_SECONDS = int(os.environ.get("RAG_CHUNKS_EXPIRY_SECONDS", str(30 * 24 * 3600)))
+
+# Pages of tool outputs cut down to their token budget, readable by the agent with read_tool_output
+TOOL_OUTPUT_EXPIRY_SECONDS = int(os.environ.get("TOOL_OUTPUT_EXPIRY_SECONDS", "3600"))
+
+# Scraped pages are kept this long after their last fetch or revalidation (freshness is per domain, see utils.scrape_cache)
+SCRAPE_CACHE_EXPIRY_SECONDS = int(os.environ.get("SCRAPE_CACHE_EXPIRY_SECONDS", str(7 * 24 * 3600)))
+
+class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """BlockingConnectionPool that counts how often and how long callers wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = {"acquired": 0, "waits": 0, "wait_timeouts": 0, "wait_ms_total": 0.0}
+
+    async def get_connection(self, *args, **kwargs):
+        if self.can_get_connection():
+            connection = await super().get_connection(*args, **kwargs)
+            self.stats["acquired"] += 1
+            return connection
+
+        self.stats["waits"] += 1
+        start = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+            self.stats["acquired"] += 1
+            return connection
+        except redis.ConnectionError:
+            self.stats["wait_timeouts"] += 1
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - start) * 1000
+            self.stats["wait_ms_total"] += wait_ms
+            pool_wait_histogram.record(wait_ms)
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+            **self.stats
+        }
+
+pool_wait_histogram = logfire.metric_histogram(
+    "redis.pool.wait", unit="ms", description="Time spent waiting for a free Redis connection"
+)
+
+# One client (and connection pool) per event loop
+redis_clients: Dict[asyncio.AbstractEventLoop, redis.Redis] = {}
+
+# Read replica clients per event loop, used in turn
+replica_clients: Dict[asyncio.AbstractEventLoop, List[redis.Redis]] = {}
+_replica_turn = itertools.count()
+
+def _drop_closed_loops() -> None:
+    """Forget the clients of event loops that have been closed (e.g. by a restarted worker thread)."""
+    for clients in (redis_clients, replica_clients):
+        for loop in [loop for loop in clients if loop.is_closed()]:
+            del clients[loop]
+
+def _create_pool(url: str) -> InstrumentedBlockingConnectionPool:
+    return InstrumentedBlockingConnectionPool.from_url(
+        url,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT_SECONDS,
+        socket_timeout=5.0,
+        socket_connect_timeout=5.0,
+        health_check_interval=30,
+        retry_on_timeout=True
+    )
 
 async def get_redis_client():
-    """Get or create the Redis client."""
-    global redis_client
-    if redis_client is None:
+    """
+    Get or create the Redis client of the running event loop.
+    
+    Connections are bound to the loop that opened them, so every loop (the server's and
+    those of worker threads) gets its own client with a blocking pool of
+    REDIS_MAX_CONNECTIONS; callers wait up to REDIS_POOL_TIMEOUT_SECONDS for a free connection.
+    
+    With REDIS_CLUSTER a RedisCluster client is created instead, with up to
+    REDIS_MAX_CONNECTIONS connections per node (cluster pools do not block when exhausted).
+    """
+    loop = asyncio.get_running_loop()
+    client = redis_clients.get(loop)
+    if client is None:
+        _drop_closed_loops()
         try:
+            if REDIS_CLUSTER:
+                client = RedisCluster.from_url(
+                    REDIS_URL,
+                    max_connections=REDIS_MAX_CONNECTIONS,
+                    socket_timeout=5.0,
+                    socket_connect_timeout=5.0,
+                    health_check_interval=30
+                )
+                redis_clients[loop] = client
+                logger.info(f"Redis Cluster client created successfully ({len(redis_clients)} event loops)")
+                return client
+            
             # Create async Redis client using redis.asyncio
-            redis_client = redis.from_url(
-                REDIS_URL,
-                max_connections=20,
-                socket_timeout=5.0,
-                socket_connect_timeout=5.0,
-                health_check_interval=30,
-                retry_on_timeout=True
-            )
-            logger.info("Redis client created successfully")
+            client = redis.Redis(connection_pool=_create_pool(REDIS_URL))
+            redis_clients[loop] = client
+            logger.info(f"Redis client created successfully ({len(redis_clients)} event loops)")
         except Exception as e:
             logger.error(f"Failed to create Redis client: {str(e)}")
             raise
-    return redis_client
+    return client
+
+async def get_redis_replica_client():
+    """
+    Get a read replica client of the running event loop, or the primary client without replicas.
+    
+    Replicas of REDIS_REPLICA_URLS are used in turn, each with its own blocking pool. With
+    REDIS_CLUSTER a second cluster client is created whose reads go to the replicas of each
+    shard. Replicas are read-only and may lag behind the primary; see storage.redis.read_routing.
+    """
+    if not REDIS_READ_FROM_REPLICAS or not (REDIS_CLUSTER or REDIS_REPLICA_URLS):
+        return await get_redis_client()
+    
+    loop = asyncio.get_running_loop()
+    clients = replica_clients.get(loop)
+    if clients is None:
+        _drop_closed_loops()
+        try:
+            if REDIS_CLUSTER:
+                clients = [RedisCluster.from_url(
+                    REDIS_URL,
+                    max_connections=REDIS_MAX_CONNECTIONS,
+                    load_balancing_strategy=LoadBalancingStrategy.ROUND_ROBIN_REPLICAS,
+                    socket_timeout=5.0,
+                    socket_connect_timeout=5.0,
+                    health_check_interval=30
+                )]
+            else:
+                clients = [redis.Redis(connection_pool=_create_pool(url)) for url in REDIS_REPLICA_URLS]
+            replica_clients[loop] = clients
+            logger.info(f"Redis replica clients created successfully ({len(clients)} replicas)")
+        except Exception as e:
+            logger.error(f"Failed to create Redis replica clients: {str(e)}")
+            raise
+    return clients[next(_replica_turn) % len(clients)]
+
+def _cluster_pool_metrics(client: RedisCluster) -> Dict[str, float]:
+    """Connection counts of a cluster client, summed over its nodes."""
+    metrics = {"max_connections": 0, "in_use": 0, "idle": 0}
+    for node in client.get_nodes():
+        metrics["max_connections"] += node.max_connections
+        metrics["in_use"] += len(node._connections) - len(node._free)
+        metrics["idle"] += len(node._free)
+    return metrics
+
+def get_redis_pool_metrics() -> Dict[str, float]:
+    """
+    Snapshot of the Redis connection pools of this process, summed over event loops.
+    
+    Returns:
+        Dict with clients, connection limits, in-use / idle connections and wait counters
+    """
+    _drop_closed_loops()
+    metrics = {"clients": len(redis_clients)}
+    replicas = [client for clients in list(replica_clients.values()) for client in clients]
+    for prefix, clients in (("", list(redis_clients.values())), ("replica_", replicas)):
+        for client in clients:
+            pool_metrics = _cluster_pool_metrics(client) if isinstance(client, RedisCluster) else client.connection_pool.metrics()
+            for name, value in pool_metrics.items():
+                metrics[prefix + name] = metrics.get(prefix + name, 0) + value
+    if replicas:
+        metrics["replica_clients"] = len(replicas)
+    metrics["wait_ms_avg"] = metrics.get("wait_ms_total", 0.0) / metrics["waits"] if metrics.get("waits") else 0.0
+    return metrics
 
 # Initialize the client at module load time
 async def init_redis():
     """Initialize Redis client. Call this at application startup."""
     await get_redis_client()
+
+async def close_redis_client():
+    """Close the Redis clients of the running event loop. Call this at application shutdown."""
+    for replica in replica_clients.pop(asyncio.get_running_loop(), []):
+        await replica.aclose()
+    client = redis_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+        logger.info("Redis client closed")
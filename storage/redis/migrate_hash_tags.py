@@ -0,0 +1,104 @@
+"""
+Rename workflow keys written before hash tags to the "workflow:{<workflow_id>}:..." layout.
+
+Old keys ("workflow:<workflow_id>:...") are copied with DUMP/RESTORE, keeping their TTL, and
+then deleted. Keys that already exist under the new name were written by the new code and are
+newer, so they are kept and only the old key is dropped. Works on a single node and on a
+cluster (set REDIS_CLUSTER=true), where SCAN runs on every primary.
+
+Usage:
+    python -m storage.redis.migrate_hash_tags [--dry-run] [--keep-old]
+"""
+import argparse
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from redis.exceptions import ResponseError
+
+from .config import get_redis_client, close_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "workflow:"
+
+
+def hash_tagged_key(key: str) -> Optional[str]:
+    """
+    Map an old workflow key to its hash-tagged name.
+
+    Args:
+        key: The Redis key
+
+    Returns:
+        Optional[str]: The new key name, or None if the key is already hash-tagged or not a workflow key
+    """
+    if not key.startswith(KEY_PREFIX) or key.startswith(KEY_PREFIX + "{"):
+        return None
+    workflow_id, separator, suffix = key[len(KEY_PREFIX):].partition(":")
+    if not workflow_id:
+        return None
+    return f"{KEY_PREFIX}{{{workflow_id}}}{separator}{suffix}"
+
+
+async def migrate_keys(dry_run: bool = False, keep_old: bool = False, scan_count: int = 1000) -> Dict[str, int]:
+    """
+    Copy every old workflow key to its hash-tagged name.
+
+    Args:
+        dry_run: Only count the keys that would be migrated
+        keep_old: Keep the old keys after copying them
+        scan_count: SCAN batch size hint
+
+    Returns:
+        Dict with the number of keys scanned, migrated, skipped because the new key exists, and expired
+    """
+    result = {"scanned": 0, "migrated": 0, "existing": 0, "expired": 0}
+
+    # Get redis client
+    redis = await get_redis_client()
+
+    async for raw_key in redis.scan_iter(match=f"{KEY_PREFIX}*", count=scan_count):
+        key = raw_key.decode("utf-8") if isinstance(raw_key, bytes) else raw_key
+        new_key = hash_tagged_key(key)
+        if new_key is None:
+            continue
+        result["scanned"] += 1
+        if dry_run:
+            continue
+
+        # Old and new keys hash to different slots, so this can't be one atomic command
+        ttl_ms = await redis.pttl(key)
+        payload = await redis.dump(key)
+        if payload is None or ttl_ms == -2:
+            result["expired"] += 1
+            continue
+        try:
+            await redis.restore(new_key, max(ttl_ms, 0), payload)
+            result["migrated"] += 1
+        except ResponseError as e:
+            if "BUSYKEY" not in str(e):
+                raise
+            result["existing"] += 1
+        if not keep_old:
+            await redis.delete(key)
+
+    logger.info(f"Hash tag migration{' (dry run)' if dry_run else ''}: {result}")
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the keys to migrate")
+    parser.add_argument("--keep-old", action="store_true", help="Keep the old keys after copying them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        await migrate_keys(dry_run=args.dry_run, keep_old=args.keep_old)
+    finally:
+        await close_redis_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
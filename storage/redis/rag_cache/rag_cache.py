@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import re
+import unicodedata
+import uuid
+from typing import Dict, Optional, Tuple
+
+import logfire
+from ..config import get_redis_client, RAG_CACHE, RAG_CACHE_TTL_SECONDS
+from .rag_cache_key_mapping import get_rag_generation_key, get_rag_cache_key
+
+logger = logging.getLogger(__name__)
+
+lookup_counter = logfire.metric_counter(
+    "rag_cache.lookups", unit="1", description="RAG query cache lookups by result (hit / miss)"
+)
+
+# Lookups of this process, for the hit rate
+stats = {"hits": 0, "misses": 0}
+
+def normalize_query(query: str) -> str:
+    """
+    Normalise a RAG query so trivially different phrasings share a cache entry.
+
+    Args:
+        query: The query text
+
+    Returns:
+        str: The query lower-cased, with whitespace collapsed and trailing punctuation removed
+    """
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip(" ?.!")
+
+def _query_field(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+# Loading cached answers from redis
+async def load_rag_answer(workflow_id: str, query: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Loads the cached answer of a RAG query against the current data of a workflow's collection.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        query: The query text
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: The cached answer (None on a miss) and the collection
+            generation to store a fresh answer under (None if the cache is disabled or unavailable)
+    """
+    if not RAG_CACHE or not workflow_id:
+        return None, None
+
+    try:
+        # Get redis client
+        redis = await get_redis_client()
+
+        generation = await redis.get(await get_rag_generation_key(workflow_id))
+        generation = generation.decode("utf-8") if isinstance(generation, bytes) else (generation or "0")
+        answer = await redis.hget(await get_rag_cache_key(workflow_id, generation), _query_field(query))
+    except Exception as e:
+        logger.error(f"Failed to load RAG answer from Redis for workflow {workflow_id}: {str(e)}")
+        return None, None
+
+    if answer is None:
+        stats["misses"] += 1
+        lookup_counter.add(1, {"result": "miss"})
+        return None, generation
+    stats["hits"] += 1
+    lookup_counter.add(1, {"result": "hit"})
+    return (answer.decode("utf-8") if isinstance(answer, bytes) else answer), generation
+
+# Saving answers in redis
+async def save_rag_answer(workflow_id: str, query: str, generation: str, answer: str) -> bool:
+    """
+    Caches the answer of a RAG query.
+
+    The answer is stored under the generation it was looked up with, so an answer retrieved
+    while new data was being added never becomes visible after the invalidation. The current
+    generation's expiry is extended with the answer's, so it always outlives the answers.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        query: The query text
+        generation: The collection generation returned by load_rag_answer
+        answer: The answer of the RAG service
+
+    Returns:
+        bool: True if the answer was cached successfully, False otherwise
+    """
+    try:
+        key = await get_rag_cache_key(workflow_id, generation)
+
+        # Get redis client
+        redis = await get_redis_client()
+
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, _query_field(query), answer)
+            pipe.expire(key, RAG_CACHE_TTL_SECONDS)
+            # Kept longer than the answers cached under it
+            pipe.expire(await get_rag_generation_key(workflow_id), RAG_CACHE_TTL_SECONDS * 2)
+            await pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save RAG answer to Redis for workflow {workflow_id}: {str(e)}")
+        return False
+
+async def invalidate_rag_cache(workflow_id: str) -> bool:
+    """
+    Drops the cached RAG answers of a workflow, called after new data was added to its collection.
+
+    Every invalidation starts a new random generation, so answers cached under an earlier
+    generation can never become current again.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+
+    Returns:
+        bool: True if the cache was invalidated successfully, False otherwise
+    """
+    if not RAG_CACHE:
+        return True
+
+    try:
+        generation_key = await get_rag_generation_key(workflow_id)
+
+        # Get redis client
+        redis = await get_redis_client()
+
+        generation = uuid.uuid4().hex
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.getset(generation_key, generation)
+            # Kept longer than the answers cached under it
+            pipe.expire(generation_key, RAG_CACHE_TTL_SECONDS * 2)
+            previous, _ = await pipe.execute()
+        previous = previous.decode("utf-8") if isinstance(previous, bytes) else (previous or "0")
+        await redis.delete(await get_rag_cache_key(workflow_id, previous))
+        logger.debug(f"Invalidated RAG cache of workflow {workflow_id} (generation {generation})")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to invalidate RAG cache in Redis for workflow {workflow_id}: {str(e)}")
+        return False
+
+def get_rag_cache_metrics() -> Dict[str, float]:
+    """
+    Hit rate of the RAG query cache lookups of this process.
+
+    Returns:
+        Dict with the hits, misses and hit_rate (0 before the first lookup)
+    """
+    lookups = stats["hits"] + stats["misses"]
+    return {**stats, "hit_rate": stats["hits"] / lookups if lookups else 0.0}
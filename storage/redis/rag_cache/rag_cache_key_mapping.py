@@ -0,0 +1,29 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Key naming conventions
+async def get_rag_generation_key(workflow_id: str) -> str:
+    """
+    Generates the Redis key of the generation id replaced whenever data is added to a workflow's RAG collection.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:rag_generation"
+    """
+    return f"workflow:{{{workflow_id}}}:rag_generation"
+
+async def get_rag_cache_key(workflow_id: str, generation: str) -> str:
+    """
+    Generates the Redis key of the hash of cached RAG answers for one generation of a workflow's collection.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        generation: The collection generation the answers were retrieved from
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:rag_cache:<generation>"
+    """
+    return f"workflow:{{{workflow_id}}}:rag_cache:{generation}"
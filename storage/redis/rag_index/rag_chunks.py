@@ -0,0 +1,75 @@
+import logging
+import uuid
+from typing import List, Optional, Tuple
+from ..config import get_redis_client, RAG_CHUNKS_EXPIRY_SECONDS
+from .rag_index_key_mapping import get_rag_chunks_key, get_rag_chunks_generation_key
+
+logger = logging.getLogger(__name__)
+
+# Saving chunks in redis
+async def append_rag_chunks(workflow_id: str, chunks: List[str]) -> int:
+    """
+    Appends text chunks to a workflow's collection of the local RAG backend.
+
+    A new collection gets a new generation id, which expires with it.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        chunks: The chunks to add
+
+    Returns:
+        int: Number of chunks in the collection after the insert
+
+    Raises:
+        Exception: If the chunks could not be saved
+    """
+    key = await get_rag_chunks_key(workflow_id)
+    generation_key = await get_rag_chunks_generation_key(workflow_id)
+
+    # Get redis client
+    redis = await get_redis_client()
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set(generation_key, uuid.uuid4().hex, nx=True, ex=RAG_CHUNKS_EXPIRY_SECONDS)
+        pipe.rpush(key, *chunks)
+        pipe.expire(key, RAG_CHUNKS_EXPIRY_SECONDS)
+        pipe.expire(generation_key, RAG_CHUNKS_EXPIRY_SECONDS)
+        _, length, _, _ = await pipe.execute()
+    logger.debug(f"Added {len(chunks)} RAG chunks for workflow: {workflow_id}")
+    return length
+
+# Loading chunks from redis
+async def load_rag_chunks(workflow_id: str, start: int = 0, generation: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    Loads the chunks of a workflow's collection of the local RAG backend.
+
+    Chunks are only ever appended, so an index holding the first `start` chunks of a
+    generation is brought up to date by loading the rest. When the collection expired and
+    was created again since, every chunk of the new generation is loaded.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        start: Number of chunks to skip
+        generation: Generation id of the collection the first `start` chunks belong to
+
+    Returns:
+        Tuple[Optional[str], List[str]]: The current generation id (None if the collection
+            doesn't exist) and its chunks from position `start` on, or from the first chunk
+            if the generation changed
+
+    Raises:
+        Exception: If the chunks could not be loaded
+    """
+    key = await get_rag_chunks_key(workflow_id)
+
+    # Get redis client
+    redis = await get_redis_client()
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(await get_rag_chunks_generation_key(workflow_id))
+        pipe.lrange(key, start, -1)
+        current, chunks = await pipe.execute()
+    current = current.decode("utf-8") if isinstance(current, bytes) else current
+    if current != generation and start:
+        chunks = await redis.lrange(key, 0, -1)
+    return current, [chunk.decode("utf-8") if isinstance(chunk, bytes) else chunk for chunk in chunks]
@@ -0,0 +1,28 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Key naming conventions
+async def get_rag_chunks_key(workflow_id: str) -> str:
+    """
+    Generates the Redis key of the list of text chunks indexed by the local RAG backend for a workflow.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:rag_chunks"
+    """
+    return f"workflow:{{{workflow_id}}}:rag_chunks"
+
+async def get_rag_chunks_generation_key(workflow_id: str) -> str:
+    """
+    Generates the Redis key of the generation id of a workflow's RAG chunk list, set when the list is created.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:rag_chunks:generation"
+    """
+    return f"workflow:{{{workflow_id}}}:rag_chunks:generation"
@@ -0,0 +1,135 @@
+"""
+Routing of workflow reads to Redis read replicas.
+
+Loads of agent histories and workflow state go to a replica (see get_redis_replica_client),
+writes and TTL refreshes always go to the primary. Replication is asynchronous, so a
+replica read could miss a write that was just made. Two guards keep reads consistent:
+
+- Workflows written by this process within REDIS_READ_YOUR_WRITES_SECONDS are read from
+  the primary.
+- A key missing on the replica is read again from the primary, so a workflow written
+  moments ago by another worker is never taken for a new one.
+
+For read-your-writes across workers on updated keys, set REDIS_WRITE_WAIT_REPLICAS to the
+number of replicas: writes then WAIT (on the connection that made them) until the replicas
+acknowledged them, for up to REDIS_WRITE_WAIT_TIMEOUT_MS. WAIT is not available in a
+cluster, where only the two guards above apply.
+"""
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+import logfire
+
+from .config import (
+    get_redis_client,
+    get_redis_replica_client,
+    REDIS_CLUSTER,
+    REDIS_READ_FROM_REPLICAS,
+    REDIS_READ_YOUR_WRITES_SECONDS,
+    REDIS_WRITE_WAIT_REPLICAS,
+    REDIS_WRITE_WAIT_TIMEOUT_MS
+)
+
+logger = logging.getLogger(__name__)
+
+# Forget recent writes in bulk once this many workflows are tracked
+MAX_TRACKED_WORKFLOWS = 10000
+
+# Time of the last write of each workflow by this process (monotonic clock)
+_last_writes: Dict[str, float] = {}
+
+read_counter = logfire.metric_counter(
+    "redis.reads", unit="1", description="Workflow reads by the Redis node that served them"
+)
+lagging_write_counter = logfire.metric_counter(
+    "redis.writes.lagging", unit="1", description="Writes not acknowledged by all replicas within the WAIT timeout"
+)
+
+def record_write(workflow_id: str) -> None:
+    """
+    Remember that a workflow was just written, so its reads stay on the primary for a while.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+    """
+    now = time.monotonic()
+    if len(_last_writes) >= MAX_TRACKED_WORKFLOWS:
+        for stale in [key for key, written in _last_writes.items() if now - written > REDIS_READ_YOUR_WRITES_SECONDS]:
+            del _last_writes[stale]
+    _last_writes[workflow_id] = now
+
+def _recently_written(workflow_id: str) -> bool:
+    written = _last_writes.get(workflow_id)
+    return written is not None and time.monotonic() - written <= REDIS_READ_YOUR_WRITES_SECONDS
+
+async def get_workflow_read_client(workflow_id: str):
+    """
+    Get the client to read a workflow's keys with.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+
+    Returns:
+        A replica client, or the primary client when replicas are disabled or the workflow
+        was written recently by this process
+    """
+    if not REDIS_READ_FROM_REPLICAS or _recently_written(workflow_id):
+        return await get_redis_client()
+    return await get_redis_replica_client()
+
+async def routed_get(workflow_id: str, key: str) -> Optional[bytes]:
+    """
+    GET a workflow key from a replica when that is safe, from the primary otherwise.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        key: The Redis key
+
+    Returns:
+        Optional[bytes]: The value, or None if the key does not exist on the primary
+    """
+    primary = await get_redis_client()
+    client = await get_workflow_read_client(workflow_id)
+    if client is primary:
+        read_counter.add(1, {"node": "primary"})
+        return await primary.get(key)
+
+    try:
+        value = await client.get(key)
+    except Exception as e:
+        logger.warning(f"Replica read of {key} failed, reading from the primary: {str(e)}")
+        value = None
+    if value is not None:
+        read_counter.add(1, {"node": "replica"})
+        return value
+
+    # Possibly not replicated yet
+    read_counter.add(1, {"node": "primary_after_miss"})
+    return await primary.get(key)
+
+async def execute_replicated(pipe, workflow_ids: Iterable[str]) -> List:
+    """
+    Execute a pipeline of workflow writes on the primary, waiting for the replicas if configured.
+
+    Args:
+        pipe: Pipeline of the primary client holding the writes
+        workflow_ids: The workflows the writes belong to
+
+    Returns:
+        List: The results of the queued writes
+    """
+    wait = REDIS_WRITE_WAIT_REPLICAS > 0 and not REDIS_CLUSTER
+    if wait:
+        pipe.wait(REDIS_WRITE_WAIT_REPLICAS, REDIS_WRITE_WAIT_TIMEOUT_MS)
+    results = await pipe.execute()
+    for workflow_id in workflow_ids:
+        record_write(workflow_id)
+
+    if not wait:
+        return results
+    acknowledged = results.pop()
+    if acknowledged < REDIS_WRITE_WAIT_REPLICAS:
+        lagging_write_counter.add(1)
+        logger.debug(f"Write acknowledged by {acknowledged}/{REDIS_WRITE_WAIT_REPLICAS} replicas")
+    return results
@@ -0,0 +1,50 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+from ..config import get_redis_client, SCRAPE_CACHE_EXPIRY_SECONDS
+from .scrape_cache_key_mapping import get_scrape_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Saving scrapes in redis
+async def save_scrape(url: str, entry: Dict[str, Any]) -> bool:
+    """
+    Saves the cached scrape of a URL with its validators.
+
+    Args:
+        url: The scraped URL
+        entry: The scraped content and its etag, last_modified, body_hash and fresh_until
+
+    Returns:
+        bool: True if the scrape was saved successfully, False otherwise
+    """
+    try:
+        # Get redis client
+        redis = await get_redis_client()
+
+        await redis.setex(await get_scrape_cache_key(url), SCRAPE_CACHE_EXPIRY_SECONDS, json.dumps(entry))
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save scrape of {url} to Redis: {str(e)}")
+        return False
+
+# Loading scrapes from redis
+async def load_scrape(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads the cached scrape of a URL.
+
+    Args:
+        url: The scraped URL
+
+    Returns:
+        Optional[Dict[str, Any]]: The cache entry, or None if not cached or on error
+    """
+    try:
+        # Get redis client
+        redis = await get_redis_client()
+
+        entry_json = await redis.get(await get_scrape_cache_key(url))
+        return json.loads(entry_json) if entry_json else None
+    except Exception as e:
+        logger.error(f"Failed to load scrape of {url} from Redis: {str(e)}")
+        return None
@@ -0,0 +1,17 @@
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Key naming conventions
+async def get_scrape_cache_key(url: str) -> str:
+    """
+    Generates the Redis key of the cached scrape of a URL, shared by all workflows.
+    
+    Args:
+        url: The scraped URL
+        
+    Returns:
+        str: Formatted Redis key in the pattern "scrape_cache:<sha256 of the url>"
+    """
+    return f"scrape_cache:{hashlib.sha256(url.encode('utf-8')).hexdigest()}"
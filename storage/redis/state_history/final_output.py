@@ -1,7 +1,9 @@
 import json
 import logging
-from ..config import redis_client, MESSAGE_EXPIRY_SECONDS
-from .state_key_mapping import get_state_key    
+from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS
+from ..read_routing import execute_replicated, routed_get
+from .workflow_events import queue_workflow_event, FINAL_OUTPUT_EVENT
+from .state_key_mapping import get_state_key, get_events_key    
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
@@ -24,6 +26,9 @@ async def save_final_output(workflow_id: str, final_output: Dict[str, Any]) -> b
         
     try:
         key = await get_state_key(workflow_id) + ":final_output"
+
+        # Get redis client
+        redis = await get_redis_client()
         
         # Ensure values are strings
         if isinstance(final_output, bytes):
@@ -33,11 +38,15 @@ async def save_final_output(workflow_id: str, final_output: Dict[str, Any]) -> b
         final_output_json = json.dumps(final_output)
         
         # Store in Redis with expiration time
-        result = redis_client.setex(
-            key,
-            MESSAGE_EXPIRY_SECONDS,
-            final_output_json
-        )
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.setex(
+                key,
+                MESSAGE_EXPIRY_SECONDS,
+                final_output_json
+            )
+            # Notify the workflow's followers in the same round trip
+            queue_workflow_event(pipe, await get_events_key(workflow_id), FINAL_OUTPUT_EVENT, final_output)
+            result, *_ = await execute_replicated(pipe, [workflow_id])
         
         if result:
             logger.debug(f"Successfully saved final output for workflow: {workflow_id}")
@@ -69,17 +78,20 @@ async def load_workflow_final_output(workflow_id: str) -> Dict[str, Any]:
     
     try:
         key = await get_state_key(workflow_id) + ":final_output"  
+
+        # Get redis client
+        redis = await get_redis_client()
         
-        # Retrieve from Redis
-        final_output_json = redis_client.get(key)
+        # Retrieve from a read replica when possible
+        final_output_json = await routed_get(workflow_id, key)
         
         if not final_output_json:
             logger.debug(f"No final output found for workflow: {workflow_id}")
             return {}
             
-        # Reset expiration time on access
+        # Reset expiration time on access (on the primary)
         try:
-            redis_client.expire(key, MESSAGE_EXPIRY_SECONDS)
+            await redis.expire(key, MESSAGE_EXPIRY_SECONDS)
         except Exception as e:
             logger.warning(f"Failed to reset expiration for key {key}: {str(e)}")
             # Continue since the data was retrieved successfully
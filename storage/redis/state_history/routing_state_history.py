@@ -1,7 +1,8 @@
 import json
 import logging
 from typing import Dict
-from ..config import redis_client, MESSAGE_EXPIRY_SECONDS
+from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS
+from ..read_routing import execute_replicated, routed_get
 from .state_key_mapping import get_state_key    
 
 logger = logging.getLogger(__name__)
@@ -25,6 +26,9 @@ async def save_routing_state(workflow_id: str, next_agent: str, previous_agent:
         
     try:
         key = await get_state_key(workflow_id) + ":routing_state"
+
+        # Get redis client
+        redis = await get_redis_client()
         
         # Ensure values are strings
         if isinstance(next_agent, bytes):
@@ -42,11 +46,13 @@ async def save_routing_state(workflow_id: str, next_agent: str, previous_agent:
         routing_state_json = json.dumps(routing_state)
         
         # Store in Redis with expiration time
-        result = redis_client.setex(
-            key,
-            MESSAGE_EXPIRY_SECONDS,
-            routing_state_json
-        )
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.setex(
+                key,
+                MESSAGE_EXPIRY_SECONDS,
+                routing_state_json
+            )
+            result, = await execute_replicated(pipe, [workflow_id])
         
         if result:
             logger.debug(f"Successfully saved routing state for workflow: {workflow_id}")
@@ -78,17 +84,20 @@ async def load_routing_state(workflow_id: str) -> Dict[str, str]:
     
     try:
         key = await get_state_key(workflow_id) + ":routing_state"
+
+        # Get redis client
+        redis = await get_redis_client()
         
-        # Retrieve from Redis
-        routing_state_json = redis_client.get(key)
+        # Retrieve from a read replica when possible
+        routing_state_json = await routed_get(workflow_id, key)
         
         if not routing_state_json:
             logger.debug(f"No routing state found for workflow: {workflow_id}")
             return {"next_agent": "", "previous_agent": ""}
             
-        # Reset expiration time on access
+        # Reset expiration time on access (on the primary)
         try:
-            redis_client.expire(key, MESSAGE_EXPIRY_SECONDS)
+            await redis.expire(key, MESSAGE_EXPIRY_SECONDS)
         except Exception as e:
             logger.warning(f"Failed to reset expiration for key {key}: {str(e)}")
             # Continue since the data was retrieved successfully
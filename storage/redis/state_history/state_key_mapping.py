@@ -11,6 +11,18 @@ async def get_state_key(workflow_id: str) -> str:
         workflow_id: The unique identifier for the workflow
         
     Returns:
-        str: Formatted Redis key in the pattern "workflow:{workflow_id}"
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}", the braces are a
+            Redis Cluster hash tag so all keys of a workflow live in the same slot
     """
-    return f"workflow:{workflow_id}"
\ No newline at end of file
+    return f"workflow:{{{workflow_id}}}"
+async def get_events_key(workflow_id: str) -> str:
+    """
+    Generates the Redis key of the stream of status and final output events of a workflow.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:events"
+    """
+    return f"workflow:{{{workflow_id}}}:events"
@@ -1,5 +1,6 @@
 import logging
-from ..config import redis_client, MESSAGE_EXPIRY_SECONDS
+from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS
+from ..read_routing import execute_replicated, routed_get
 from .state_key_mapping import get_state_key    
 
 logger = logging.getLogger(__name__)
@@ -23,16 +24,21 @@ async def save_sub_agent(workflow_id: str, sub_agent: str) -> bool:
     try:
         key = await get_state_key(workflow_id) + ":sub_agent"
 
+        # Get redis client
+        redis = await get_redis_client()
+
         # Ensure sub_agent is a string
         if isinstance(sub_agent, bytes):
             sub_agent = sub_agent.decode('utf-8')
 
         # Store in Redis with expiration time
-        result = redis_client.setex(
-            key,
-            MESSAGE_EXPIRY_SECONDS,
-            sub_agent
-        )
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.setex(
+                key,
+                MESSAGE_EXPIRY_SECONDS,
+                sub_agent
+            )
+            result, = await execute_replicated(pipe, [workflow_id])
         
         if result:
             logger.debug(f"Successfully saved sub agent for workflow: {workflow_id}")
@@ -61,17 +67,20 @@ async def load_sub_agent(workflow_id: str) -> str:
     
     try:
         key = await get_state_key(workflow_id) + ":sub_agent"
+
+        # Get redis client
+        redis = await get_redis_client()
         
-        # Retrieve from Redis
-        sub_agent = redis_client.get(key)
+        # Retrieve from a read replica when possible
+        sub_agent = await routed_get(workflow_id, key)
         
         if not sub_agent:
             logger.debug(f"No sub agent found for workflow: {workflow_id}")
             return ""
             
-        # Reset expiration time on access
+        # Reset expiration time on access (on the primary)
         try:
-            redis_client.expire(key, MESSAGE_EXPIRY_SECONDS)
+            await redis.expire(key, MESSAGE_EXPIRY_SECONDS)
         except Exception as e:
             logger.warning(f"Failed to reset expiration for key {key}: {str(e)}")
             # Continue since the data was retrieved successfully
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS, WORKFLOW_EVENTS_MAXLEN, WORKFLOW_EVENTS_BLOCK_MS
+from .state_key_mapping import get_events_key
+
+logger = logging.getLogger(__name__)
+
+# Event types
+STATUS_EVENT = "status"
+FINAL_OUTPUT_EVENT = "final_output"
+TURN_RESULT_EVENT = "turn_result"
+
+# (stream entry id, {"type": ..., "data": ...})
+WorkflowEvent = Tuple[str, Dict[str, Any]]
+
+def queue_workflow_event(pipe, events_key: str, event_type: str, data: Any) -> None:
+    """
+    Queue the publication of a workflow event on a pipeline, next to the state write it reports.
+
+    The stream is capped at about WORKFLOW_EVENTS_MAXLEN entries and expires with the workflow state.
+
+    Args:
+        pipe: Pipeline of the primary client
+        events_key: The workflow's events stream key (see get_events_key)
+        event_type: STATUS_EVENT or FINAL_OUTPUT_EVENT
+        data: JSON-serializable event payload
+    """
+    pipe.xadd(
+        events_key,
+        {"type": event_type, "data": json.dumps(data)},
+        maxlen=WORKFLOW_EVENTS_MAXLEN,
+        approximate=True
+    )
+    pipe.expire(events_key, MESSAGE_EXPIRY_SECONDS)
+
+# Publishing a workflow event in redis
+async def publish_workflow_event(workflow_id: str, event_type: str, data: Any) -> bool:
+    """
+    Publish an event to the stream of a workflow.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        event_type: The type of event
+        data: JSON-serializable event payload
+        
+    Returns:
+        bool: True if the event was published successfully, False otherwise
+    """
+    try:
+        key = await get_events_key(workflow_id)
+        
+        # Get redis client
+        redis = await get_redis_client()
+        
+        async with redis.pipeline(transaction=False) as pipe:
+            queue_workflow_event(pipe, key, event_type, data)
+            entry_id, _ = await pipe.execute()
+        return bool(entry_id)
+    except (TypeError, ValueError) as e:
+        logger.error(f"JSON serialization error for {event_type} event of workflow {workflow_id}: {str(e)}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to publish {event_type} event to Redis for workflow {workflow_id}: {str(e)}")
+        return False
+
+async def get_last_event_id(workflow_id: str) -> str:
+    """
+    Get the id of the latest event of a workflow, to read only the events published after it.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        
+    Returns:
+        str: The stream id, "0" if the workflow has no events yet
+    """
+    # Get redis client
+    redis = await get_redis_client()
+    
+    entries = await redis.xrevrange(await get_events_key(workflow_id), count=1)
+    return _decode(entries[0][0]) if entries else "0"
+
+async def get_current_turn_start_id(workflow_id: str) -> str:
+    """
+    Get the stream id to follow a workflow's current (or next) turn from: the last final output.
+
+    Replaying from there skips the events of turns that already finished, whose final output
+    would otherwise end a follower's stream right away.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+
+    Returns:
+        str: Id of the latest final output event, "0" if there is none (or on error)
+    """
+    try:
+        # Get redis client
+        redis = await get_redis_client()
+
+        # The stream is capped, so the newest entries are a bounded scan
+        entries = await redis.xrevrange(await get_events_key(workflow_id), count=WORKFLOW_EVENTS_MAXLEN * 2)
+        for entry_id, fields in entries:
+            if _decode(fields.get(b"type", fields.get("type"))) == FINAL_OUTPUT_EVENT:
+                return _decode(entry_id)
+        return "0"
+    except Exception as e:
+        logger.error(f"Failed to find the current turn in events of workflow {workflow_id}: {str(e)}")
+        return "0"
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+# Reading workflow events from redis
+async def read_workflow_events(
+    workflow_id: str,
+    last_id: str = "0",
+    block_ms: Optional[int] = None,
+    count: int = 100
+) -> List[WorkflowEvent]:
+    """
+    Read the events of a workflow published after `last_id`, blocking until one arrives.
+
+    A blocking read holds a connection of the shared pool for up to `block_ms`.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        last_id: Stream id of the last event seen; "0" reads from the oldest retained event,
+            "$" only returns events published from now on
+        block_ms: Max time to wait for an event (default WORKFLOW_EVENTS_BLOCK_MS, 0 = don't wait)
+        count: Max number of events returned
+
+    Returns:
+        List[WorkflowEvent]: The events in publication order, empty on timeout or error
+    """
+    if not workflow_id:
+        logger.error("Invalid argument: workflow_id must be provided")
+        return []
+
+    try:
+        key = await get_events_key(workflow_id)
+
+        # Get redis client
+        redis = await get_redis_client()
+
+        block_ms = WORKFLOW_EVENTS_BLOCK_MS if block_ms is None else block_ms
+        response = await redis.xread({key: last_id}, count=count, block=block_ms or None)
+
+        events = []
+        for _, entries in response or []:
+            for entry_id, fields in entries:
+                fields = {_decode(name): _decode(value) for name, value in fields.items()}
+                events.append((_decode(entry_id), {"type": fields.get("type"), "data": json.loads(fields.get("data", "null"))}))
+        return events
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parsing error in events of workflow {workflow_id}: {str(e)}")
+        return []
+    except Exception as e:
+        logger.error(f"Failed to read events from Redis for workflow {workflow_id}: {str(e)}")
+        return []
+
+async def follow_workflow_events(workflow_id: str, last_id: str = "0") -> AsyncIterator[Optional[WorkflowEvent]]:
+    """
+    Follow the events of a workflow until its final output is published.
+
+    Yields None whenever WORKFLOW_EVENTS_BLOCK_MS pass without an event, so callers can send
+    keep-alives and notice disconnected clients.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        last_id: Stream id of the last event seen, "0" replays every retained event first
+            (see `get_current_turn_start_id` to skip finished turns)
+
+    Yields:
+        Optional[WorkflowEvent]: The next event, or None on an idle interval
+    """
+    while True:
+        started = time.monotonic()
+        events = await read_workflow_events(workflow_id, last_id)
+        if not events:
+            # Back off when the read failed instead of timing out
+            idle_seconds = WORKFLOW_EVENTS_BLOCK_MS / 1000 - (time.monotonic() - started)
+            if idle_seconds > 0:
+                await asyncio.sleep(idle_seconds)
+            yield None
+            continue
+        for event in events:
+            last_id = event[0]
+            yield event
+            if event[1]["type"] == FINAL_OUTPUT_EVENT:
+                return
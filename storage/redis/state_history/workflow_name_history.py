@@ -1,5 +1,6 @@
 import logging
 from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS
+from ..read_routing import execute_replicated, routed_get
 from .state_key_mapping import get_state_key    
 
 logger = logging.getLogger(__name__)
@@ -31,11 +32,13 @@ async def save_workflow_name(workflow_id: str, workflow_name: str) -> bool:
         redis = await get_redis_client()
 
         # Store in Redis with expiration time
-        result = await redis.setex(
-            key, 
-            MESSAGE_EXPIRY_SECONDS, 
-            workflow_name
-        )
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.setex(
+                key, 
+                MESSAGE_EXPIRY_SECONDS, 
+                workflow_name
+            )
+            result, = await execute_replicated(pipe, [workflow_id])
         
         if result:
             logger.debug(f"Successfully saved workflow name for workflow: {workflow_id}")
@@ -68,14 +71,14 @@ async def load_workflow_name(workflow_id: str) -> str:
         # Get redis client
         redis = await get_redis_client()
         
-        # Retrieve from Redis
-        workflow_name = await redis.get(key)
+        # Retrieve from a read replica when possible
+        workflow_name = await routed_get(workflow_id, key)
         
         if not workflow_name:
             logger.debug(f"No workflow name found for workflow: {workflow_id}")
             return ""
             
-        # Reset expiration time on access
+        # Reset expiration time on access (on the primary)
         try:
             await redis.expire(key, MESSAGE_EXPIRY_SECONDS)
         except Exception as e:
@@ -1,6 +1,8 @@
 import logging
-from ..config import redis_client, get_redis_client, MESSAGE_EXPIRY_SECONDS
-from .state_key_mapping import get_state_key    
+from ..config import get_redis_client, MESSAGE_EXPIRY_SECONDS
+from ..read_routing import execute_replicated, routed_get
+from .workflow_events import queue_workflow_event, STATUS_EVENT
+from .state_key_mapping import get_state_key, get_events_key    
 
 logger = logging.getLogger(__name__)
 
@@ -23,16 +25,23 @@ async def save_workflow_status(workflow_id: str, status: str) -> bool:
     try:
         key = await get_state_key(workflow_id) + ":status"
 
+        # Get redis client
+        redis = await get_redis_client()
+
         # Ensure status is a string
         if isinstance(status, bytes):
             status = status.decode('utf-8')
 
         # Store in Redis with expiration time
-        result = await redis_client.setex(
-            key,
-            MESSAGE_EXPIRY_SECONDS,
-            status
-        )
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.setex(
+                key,
+                MESSAGE_EXPIRY_SECONDS,
+                status
+            )
+            # Notify the workflow's followers in the same round trip
+            queue_workflow_event(pipe, await get_events_key(workflow_id), STATUS_EVENT, status)
+            result, *_ = await execute_replicated(pipe, [workflow_id])
         
         if result:
             logger.debug(f"Successfully saved workflow status '{status}' for workflow: {workflow_id}")
@@ -68,14 +77,14 @@ async def load_workflow_status(workflow_id: str) -> str:
             logger.error(f"Failed to get Redis client for workflow {workflow_id}")
             return "PROCESSING"
         
-        # Retrieve from Redis
-        status = await redis.get(key)
+        # Retrieve from a read replica when possible
+        status = await routed_get(workflow_id, key)
         
         if not status:
             logger.debug(f"No workflow status found for workflow: {workflow_id}, returning default 'PROCESSING'")
             return "PROCESSING"
             
-        # Reset expiration time on access
+        # Reset expiration time on access (on the primary)
         try:
             await redis.expire(key, MESSAGE_EXPIRY_SECONDS)
         except Exception as e:
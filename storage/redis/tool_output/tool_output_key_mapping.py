@@ -0,0 +1,17 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Key naming conventions
+async def get_tool_output_key(workflow_id: str, handle: str) -> str:
+    """
+    Generates the Redis key of the pages of a tool output that was cut down to its token budget.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        handle: The handle the agent pages the output with
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:tool_output:<handle>"
+    """
+    return f"workflow:{{{workflow_id}}}:tool_output:{handle}"
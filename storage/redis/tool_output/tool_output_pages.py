@@ -0,0 +1,66 @@
+import logging
+from typing import List, Optional, Tuple
+from ..config import get_redis_client, TOOL_OUTPUT_EXPIRY_SECONDS
+from .tool_output_key_mapping import get_tool_output_key
+
+logger = logging.getLogger(__name__)
+
+# Saving pages in redis
+async def save_tool_output_pages(workflow_id: str, handle: str, pages: List[str]) -> bool:
+    """
+    Saves the pages of a tool output for follow-up reads.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        handle: The handle the agent pages the output with
+        pages: The full output split into pages
+
+    Returns:
+        bool: True if the pages were saved successfully, False otherwise
+    """
+    try:
+        key = await get_tool_output_key(workflow_id, handle)
+
+        # Get redis client
+        redis = await get_redis_client()
+
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.rpush(key, *pages)
+            pipe.expire(key, TOOL_OUTPUT_EXPIRY_SECONDS)
+            await pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save tool output pages to Redis for workflow {workflow_id}: {str(e)}")
+        return False
+
+# Loading pages from redis
+async def load_tool_output_page(workflow_id: str, handle: str, page: int) -> Tuple[Optional[str], int]:
+    """
+    Loads one page of a saved tool output.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        handle: The handle the agent pages the output with
+        page: The page number, starting at 1
+
+    Returns:
+        Tuple[Optional[str], int]: The page (None if it doesn't exist, expired or on error) and
+            the number of pages
+    """
+    try:
+        key = await get_tool_output_key(workflow_id, handle)
+
+        # Get redis client
+        redis = await get_redis_client()
+
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.lindex(key, page - 1)
+            pipe.llen(key)
+            content, pages = await pipe.execute()
+        if content is None or page < 1:
+            return None, pages
+        return (content.decode("utf-8") if isinstance(content, bytes) else content), pages
+    except Exception as e:
+        logger.error(f"Failed to load tool output page from Redis for workflow {workflow_id}: {str(e)}")
+        return None, 0
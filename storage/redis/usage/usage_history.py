@@ -0,0 +1,111 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+import pytz
+from pydantic_ai.usage import Usage
+from ..config import get_redis_client, USAGE_EXPIRY_SECONDS
+from .usage_key_mapping import get_workflow_usage_key, get_agent_usage_key
+
+logger = logging.getLogger(__name__)
+
+ist = pytz.timezone('Asia/Kolkata')
+
+USAGE_FIELDS = ("runs", "requests", "request_tokens", "response_tokens", "total_tokens")
+
+def get_usage_day() -> str:
+    """
+    Get the current accounting day.
+    
+    Returns:
+        str: Current date in IST in format 'YYYY-MM-DD'
+    """
+    return datetime.now(ist).strftime("%Y-%m-%d")
+
+# Saving run usage in redis
+async def save_usage(workflow_id: str, agent_type: str, usage: Usage) -> bool:
+    """
+    Adds the usage of one agent run to the daily workflow, workflow/agent and agent counters.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent (e.g., 'market_price_agent', 'gov_scheme_agent')
+        usage: The pydantic-ai usage of the run
+        
+    Returns:
+        bool: True if usage was saved successfully, False otherwise
+    """
+    if not workflow_id or not agent_type:
+        logger.error("Invalid arguments: workflow_id and agent_type must be provided")
+        return False
+    
+    day = get_usage_day()
+    increments = {
+        "runs": 1,
+        "requests": usage.requests or 0,
+        "request_tokens": usage.request_tokens or 0,
+        "response_tokens": usage.response_tokens or 0,
+        "total_tokens": usage.total_tokens or 0
+    }
+    
+    try:
+        keys = [
+            await get_workflow_usage_key(workflow_id, day),
+            await get_workflow_usage_key(workflow_id, day, agent_type),
+            await get_agent_usage_key(agent_type, day)
+        ]
+        
+        # Get redis client
+        redis = await get_redis_client()
+        
+        # Increment all counters in one round trip
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                for field, amount in increments.items():
+                    pipe.hincrby(key, field, amount)
+                pipe.expire(key, USAGE_EXPIRY_SECONDS)
+            await pipe.execute()
+        
+        logger.debug(f"Saved usage {increments} for workflow: {workflow_id}, agent: {agent_type}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to save usage to Redis for workflow {workflow_id}: {str(e)}")
+        return False
+
+# Loading usage from redis
+async def load_usage(workflow_id: str, agent_type: Optional[str] = None, day: Optional[str] = None) -> Dict[str, int]:
+    """
+    Loads the daily usage of a workflow, optionally scoped to one agent.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent, or None for the usage of all agents of the workflow
+        day: The day in format 'YYYY-MM-DD', defaults to today
+        
+    Returns:
+        Dict[str, int]: Usage counters, all zero if not found or on error
+    """
+    usage = {field: 0 for field in USAGE_FIELDS}
+    
+    if not workflow_id:
+        logger.error("Invalid argument: workflow_id must be provided")
+        return usage
+    
+    try:
+        key = await get_workflow_usage_key(workflow_id, day or get_usage_day(), agent_type)
+        
+        # Get redis client
+        redis = await get_redis_client()
+        
+        # Retrieve from Redis
+        counters = await redis.hgetall(key)
+        
+        for field, value in counters.items():
+            if isinstance(field, bytes):
+                field = field.decode('utf-8')
+            if field in usage:
+                usage[field] = int(value)
+        
+        return usage
+    except Exception as e:
+        logger.error(f"Failed to load usage from Redis for workflow {workflow_id}: {str(e)}")
+        return usage
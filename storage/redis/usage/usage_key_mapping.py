@@ -0,0 +1,35 @@
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Key naming conventions
+async def get_workflow_usage_key(workflow_id: str, day: str, agent_type: Optional[str] = None) -> str:
+    """
+    Generates a Redis key for storing daily usage of a workflow, optionally scoped to one agent.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        day: The day the usage belongs to in format 'YYYY-MM-DD'
+        agent_type: The type of agent (e.g., 'market_price_agent', 'gov_scheme_agent')
+        
+    Returns:
+        str: Formatted Redis key in the pattern "usage:{day}:workflow:{workflow_id}[:{agent_type}]"
+    """
+    key = f"usage:{day}:workflow:{workflow_id}"
+    if agent_type:
+        key += f":{agent_type}"
+    return key
+
+async def get_agent_usage_key(agent_type: str, day: str) -> str:
+    """
+    Generates a Redis key for storing daily usage of an agent across all workflows.
+    
+    Args:
+        agent_type: The type of agent (e.g., 'market_price_agent', 'gov_scheme_agent')
+        day: The day the usage belongs to in format 'YYYY-MM-DD'
+        
+    Returns:
+        str: Formatted Redis key in the pattern "usage:{day}:agent:{agent_type}"
+    """
+    return f"usage:{day}:agent:{agent_type}"
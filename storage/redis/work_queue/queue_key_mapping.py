@@ -0,0 +1,26 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Consumer group shared by all agent workers
+QUEUE_GROUP = "agent_workers"
+
+# Key naming conventions
+async def get_queue_key() -> str:
+    """
+    Generates the Redis key of the stream of queued agent turns.
+    
+    Returns:
+        str: The key "{agent_turns}:queue" (the braces are a Redis Cluster hash tag shared
+            with the dead-letter stream)
+    """
+    return "{agent_turns}:queue"
+
+async def get_dead_letter_key() -> str:
+    """
+    Generates the Redis key of the stream of agent turns that failed too often.
+    
+    Returns:
+        str: The key "{agent_turns}:dead"
+    """
+    return "{agent_turns}:dead"
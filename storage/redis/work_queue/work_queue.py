@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from redis.exceptions import ResponseError
+from .queue_key_mapping import get_queue_key, get_dead_letter_key, QUEUE_GROUP
+from ..config import (
+    get_redis_client,
+    AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS,
+    AGENT_QUEUE_RESULT_TIMEOUT_SECONDS,
+    AGENT_QUEUE_DEAD_LETTER_MAXLEN,
+    WORKFLOW_EVENTS_BLOCK_MS
+)
+from ..state_history.workflow_events import (
+    get_last_event_id,
+    publish_workflow_event,
+    read_workflow_events,
+    TURN_RESULT_EVENT
+)
+
+logger = logging.getLogger(__name__)
+
+class QueuedTurnFailed(RuntimeError):
+    """Raised to the waiting API process when a queued agent turn failed on the workers."""
+
+@dataclass
+class QueuedTurn:
+    """An agent turn claimed from the queue by a worker."""
+    entry_id: str
+    job_id: str
+    workflow_id: str
+    agent_name: str
+    state: Dict[str, Any]
+    # How often the turn has been handed to a worker, including this time
+    deliveries: int = 1
+
+def _decode(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def _to_turn(entry_id: Any, fields: Dict[Any, Any], deliveries: int = 1) -> QueuedTurn:
+    fields = {_decode(name): _decode(value) for name, value in fields.items()}
+    return QueuedTurn(
+        entry_id=_decode(entry_id),
+        job_id=fields["job_id"],
+        workflow_id=fields["workflow_id"],
+        agent_name=fields["agent_name"],
+        state=json.loads(fields["state"]),
+        deliveries=deliveries
+    )
+
+async def ensure_consumer_group() -> None:
+    """Create the queue stream and its consumer group if they don't exist yet."""
+    # Get redis client
+    redis = await get_redis_client()
+    try:
+        await redis.xgroup_create(await get_queue_key(), QUEUE_GROUP, id="0", mkstream=True)
+        logger.info(f"Created consumer group {QUEUE_GROUP}")
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+async def enqueue_turn(workflow_id: str, agent_name: str, state: Dict[str, Any]) -> str:
+    """
+    Queue an agent turn for the workers.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_name: The agent to run (e.g., 'market_price_agent', 'gov_scheme_agent')
+        state: JSON-serializable graph state the agent runs on
+
+    Returns:
+        str: The job id the turn's result is published under
+    """
+    job_id = uuid.uuid4().hex
+
+    # Get redis client
+    redis = await get_redis_client()
+
+    await redis.xadd(await get_queue_key(), {
+        "job_id": job_id,
+        "workflow_id": workflow_id,
+        "agent_name": agent_name,
+        "state": json.dumps(state),
+        "enqueued_at": str(time.time())
+    })
+    logger.debug(f"Queued {agent_name} turn {job_id} for workflow {workflow_id}")
+    return job_id
+
+async def run_queued_turn(workflow_id: str, agent_name: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queue an agent turn and wait for a worker to publish its result.
+
+    The result arrives as a turn_result event on the workflow's event stream, so waiting
+    costs one blocking read per WORKFLOW_EVENTS_BLOCK_MS and no polling.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_name: The agent to run
+        state: JSON-serializable graph state the agent runs on
+
+    Returns:
+        Dict[str, Any]: The state update returned by the agent graph
+
+    Raises:
+        QueuedTurnFailed: If the turn failed on the workers and was dead-lettered
+        TimeoutError: If no result arrived within AGENT_QUEUE_RESULT_TIMEOUT_SECONDS
+    """
+    # Results published from now on are the candidates
+    last_id = await get_last_event_id(workflow_id)
+    job_id = await enqueue_turn(workflow_id, agent_name, state)
+
+    deadline = time.monotonic() + AGENT_QUEUE_RESULT_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        events = await read_workflow_events(workflow_id, last_id)
+        if not events and time.monotonic() - started < WORKFLOW_EVENTS_BLOCK_MS / 2000:
+            # The read failed instead of timing out
+            await asyncio.sleep(1)
+        for event_id, event in events:
+            last_id = event_id
+            data = event["data"] if event["type"] == TURN_RESULT_EVENT else None
+            if not data or data.get("job_id") != job_id:
+                continue
+            if data.get("error"):
+                raise QueuedTurnFailed(f"{agent_name} turn {job_id} failed: {data['error']}")
+            return data["result"]
+    raise TimeoutError(f"No result for {agent_name} turn {job_id} after {AGENT_QUEUE_RESULT_TIMEOUT_SECONDS}s")
+
+async def claim_turns(consumer: str, count: int = 1, block_ms: Optional[int] = None) -> List[QueuedTurn]:
+    """
+    Claim turns for a worker: first turns whose worker went silent, then new ones.
+
+    A turn not acknowledged within AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS (and not kept
+    claimed with extend_turn) is handed to the next worker that asks.
+
+    Args:
+        consumer: Unique name of the worker
+        count: Max turns to claim
+        block_ms: Max time to wait for a new turn (default WORKFLOW_EVENTS_BLOCK_MS)
+
+    Returns:
+        List[QueuedTurn]: The claimed turns, empty if none arrived in time
+    """
+    key = await get_queue_key()
+
+    # Get redis client
+    redis = await get_redis_client()
+
+    _, entries, *_ = await redis.xautoclaim(
+        key, QUEUE_GROUP, consumer, AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS * 1000, start_id="0-0", count=count
+    )
+    turns = []
+    for entry_id, fields in entries:
+        if fields is None:
+            # Deleted while pending
+            continue
+        pending = await redis.xpending_range(key, QUEUE_GROUP, min=entry_id, max=entry_id, count=1)
+        turns.append(_to_turn(entry_id, fields, pending[0]["times_delivered"] if pending else 1))
+    if turns:
+        return turns
+
+    block_ms = WORKFLOW_EVENTS_BLOCK_MS if block_ms is None else block_ms
+    response = await redis.xreadgroup(QUEUE_GROUP, consumer, {key: ">"}, count=count, block=block_ms or None)
+    return [_to_turn(entry_id, fields) for _, entries in response or [] for entry_id, fields in entries]
+
+async def extend_turn(consumer: str, turn: QueuedTurn) -> None:
+    """
+    Reset the visibility timeout of a turn that is still running.
+
+    Args:
+        consumer: Unique name of the worker running the turn
+        turn: The claimed turn
+    """
+    # Get redis client
+    redis = await get_redis_client()
+    await redis.xclaim(await get_queue_key(), QUEUE_GROUP, consumer, 0, [turn.entry_id], justid=True)
+
+async def ack_turn(turn: QueuedTurn) -> None:
+    """
+    Acknowledge a finished turn and remove it from the queue.
+
+    Args:
+        turn: The claimed turn
+    """
+    key = await get_queue_key()
+
+    # Get redis client
+    redis = await get_redis_client()
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.xack(key, QUEUE_GROUP, turn.entry_id)
+        pipe.xdel(key, turn.entry_id)
+        await pipe.execute()
+
+async def dead_letter_turn(turn: QueuedTurn, error: str) -> None:
+    """
+    Move a turn that keeps failing to the dead-letter stream and tell its waiter.
+
+    Args:
+        turn: The claimed turn
+        error: Description of the last failure
+    """
+    # Get redis client
+    redis = await get_redis_client()
+
+    await redis.xadd(
+        await get_dead_letter_key(),
+        {
+            "job_id": turn.job_id,
+            "workflow_id": turn.workflow_id,
+            "agent_name": turn.agent_name,
+            "state": json.dumps(turn.state),
+            "deliveries": str(turn.deliveries),
+            "error": error
+        },
+        maxlen=AGENT_QUEUE_DEAD_LETTER_MAXLEN,
+        approximate=True
+    )
+    await ack_turn(turn)
+    await publish_turn_result(turn, error=error)
+    logger.error(f"Dead-lettered {turn.agent_name} turn {turn.job_id} of workflow {turn.workflow_id} after {turn.deliveries} deliveries: {error}")
+
+async def publish_turn_result(
+    turn: QueuedTurn,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None
+) -> bool:
+    """
+    Publish the result of a turn to its workflow's event stream, where the API process waits for it.
+
+    Args:
+        turn: The claimed turn
+        result: The state update returned by the agent graph
+        error: Description of the failure, for dead-lettered turns
+
+    Returns:
+        bool: True if the result was published successfully, False otherwise
+    """
+    return await publish_workflow_event(
+        turn.workflow_id,
+        TURN_RESULT_EVENT,
+        {"job_id": turn.job_id, "agent_name": turn.agent_name, "result": result, "error": error}
+    )
@@ -0,0 +1,46 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Key naming conventions
+async def get_lock_key(workflow_id: str, agent_type: str) -> str:
+    """
+    Generates a Redis key for the lease of a workflow's agent.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent (e.g., 'market_price_agent', 'gov_scheme_agent')
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:lock:{agent_type}"
+            (the braces around the workflow id are a Redis Cluster hash tag)
+    """
+    return f"workflow:{{{workflow_id}}}:lock:{agent_type}"
+
+async def get_fence_key(workflow_id: str, agent_type: str) -> str:
+    """
+    Generates a Redis key for the fencing token counter of a workflow's agent.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent (e.g., 'market_price_agent', 'gov_scheme_agent')
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:lock:{agent_type}:fence"
+            (same slot as the lease and the history it fences)
+    """
+    return f"workflow:{{{workflow_id}}}:lock:{agent_type}:fence"
+
+async def get_single_flight_key(workflow_id: str, request_hash: str) -> str:
+    """
+    Generates a Redis key for the result of a coalesced request of a workflow.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        request_hash: Hash of the request (agent and input)
+        
+    Returns:
+        str: Formatted Redis key in the pattern "workflow:{<workflow_id>}:single_flight:{request_hash}"
+            (the braces around the workflow id are a Redis Cluster hash tag)
+    """
+    return f"workflow:{{{workflow_id}}}:single_flight:{request_hash}"
@@ -0,0 +1,65 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+from .lock_key_mapping import get_single_flight_key
+from ..config import get_redis_client, SINGLE_FLIGHT_RESULT_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Saving the result of a coalesced request in redis
+async def save_single_flight_result(workflow_id: str, request_hash: str, result: Dict[str, Any], fencing_token: int) -> bool:
+    """
+    Saves the result of a request so identical requests waiting on other workers can reuse it.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        request_hash: Hash of the request (agent and input)
+        result: The JSON-serializable result of the request
+        fencing_token: Token of the lease the request ran under
+        
+    Returns:
+        bool: True if the result was saved successfully, False otherwise
+    """
+    try:
+        key = await get_single_flight_key(workflow_id, request_hash)
+        
+        # Get redis client
+        redis = await get_redis_client()
+        
+        entry = {"fencing_token": fencing_token, "result": result}
+        return bool(await redis.setex(key, SINGLE_FLIGHT_RESULT_TTL_SECONDS, json.dumps(entry)))
+    except (TypeError, ValueError) as e:
+        logger.error(f"JSON serialization error for single-flight result of workflow {workflow_id}: {str(e)}")
+        return False
+    except Exception as e:
+        logger.error(f"Failed to save single-flight result for workflow {workflow_id}: {str(e)}")
+        return False
+
+# Loading the result of a coalesced request from redis
+async def load_single_flight_result(workflow_id: str, request_hash: str, min_fencing_token: int) -> Optional[Dict[str, Any]]:
+    """
+    Loads the result of an identical request that ran under a lease at least as new as `min_fencing_token`.
+    
+    Args:
+        workflow_id: The unique identifier for the workflow
+        request_hash: Hash of the request (agent and input)
+        min_fencing_token: Token of the lease the caller waited on; results of older leases
+            finished before the caller arrived and are not reused
+        
+    Returns:
+        Optional[Dict[str, Any]]: The result, or None if not found, too old or on error
+    """
+    try:
+        key = await get_single_flight_key(workflow_id, request_hash)
+        
+        # Get redis client
+        redis = await get_redis_client()
+        
+        entry_json = await redis.get(key)
+        entry = json.loads(entry_json) if entry_json else None
+        if not entry or entry.get("fencing_token", 0) < min_fencing_token:
+            return None
+        return entry["result"]
+    except Exception as e:
+        logger.error(f"Failed to load single-flight result for workflow {workflow_id}: {str(e)}")
+        return None
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional, Set
+from .lock_key_mapping import get_lock_key, get_fence_key
+from ..config import (
+    get_redis_client,
+    HISTORY_WRITE_BEHIND,
+    WORKFLOW_LOCK,
+    WORKFLOW_LOCK_LEASE_SECONDS,
+    WORKFLOW_LOCK_WAIT_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Fencing counters outlive any lease by far; they only expire for idle workflows
+FENCE_EXPIRY_SECONDS = 24 * 60 * 60
+
+# Lease type of whole workflow turns, held around the graph run
+TURN_LEASE_TYPE = "turn"
+
+# Take the lease and issue the next fencing token atomically; when the lease is
+# held, return the holder's token (negated) instead
+ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    local token = redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return token
+end
+return -tonumber(redis.call('GET', KEYS[2]) or '0')
+"""
+
+# Only the owner may extend or release its lease
+EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Write only if no newer lease was issued since the writer's token
+FENCED_SETEX_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tonumber(ARGV[1]) < current then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+return 1
+"""
+
+class WorkflowLockTimeout(TimeoutError):
+    """Raised when the lease of a workflow could not be acquired in time."""
+
+@dataclass
+class WorkflowLease:
+    """A held lease on a workflow's agent and its fencing token."""
+    workflow_id: str
+    agent_type: str
+    owner: str
+    fencing_token: int
+    # Token of the lease found held on the first attempt, None if it was free
+    waited_on: Optional[int] = None
+    renewal: Optional[asyncio.Task] = field(default=None, repr=False)
+
+# Lease held by the current task, read by the history writes it protects
+current_lease: ContextVar[Optional[WorkflowLease]] = ContextVar("current_lease", default=None)
+
+# Keep references to background releases until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+def get_fencing_token(workflow_id: str, agent_type: str) -> Optional[int]:
+    """
+    Get the fencing token of the lease the current task holds.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent
+
+    Returns:
+        Optional[int]: The fencing token, or None when no matching lease is held
+    """
+    lease = current_lease.get()
+    if lease and lease.workflow_id == workflow_id and lease.agent_type == agent_type:
+        return lease.fencing_token
+    return None
+
+async def acquire_lease(workflow_id: str, agent_type: str, wait_seconds: Optional[float] = None) -> Optional[WorkflowLease]:
+    """
+    Acquire the lease of a workflow's agent, waiting while another turn holds it.
+
+    The lease expires after WORKFLOW_LOCK_LEASE_SECONDS unless renewed, which happens in the
+    background while it is held. Each acquisition gets a higher fencing token.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent
+        wait_seconds: Max time to wait for the lease (default WORKFLOW_LOCK_WAIT_SECONDS)
+
+    Returns:
+        Optional[WorkflowLease]: The lease, or None if Redis is unavailable (the turn runs unlocked)
+
+    Raises:
+        WorkflowLockTimeout: If the lease is still held by another turn after wait_seconds
+    """
+    lease_ms = WORKFLOW_LOCK_LEASE_SECONDS * 1000
+    deadline = time.monotonic() + (WORKFLOW_LOCK_WAIT_SECONDS if wait_seconds is None else wait_seconds)
+    owner = uuid.uuid4().hex
+    delay = 0.05
+    waited_on = None
+
+    try:
+        lock_key = await get_lock_key(workflow_id, agent_type)
+        fence_key = await get_fence_key(workflow_id, agent_type)
+
+        # Get redis client
+        redis = await get_redis_client()
+        acquire = redis.register_script(ACQUIRE_SCRIPT)
+
+        while True:
+            token = int(await acquire(keys=[lock_key, fence_key], args=[owner, lease_ms, FENCE_EXPIRY_SECONDS]))
+            if token > 0:
+                lease = WorkflowLease(workflow_id, agent_type, owner, token, waited_on)
+                lease.renewal = asyncio.create_task(_renew(lease, lock_key))
+                logger.debug(f"Acquired lease {lock_key} with fencing token {lease.fencing_token}")
+                return lease
+            if waited_on is None:
+                waited_on = -token
+            if time.monotonic() + delay > deadline:
+                raise WorkflowLockTimeout(f"Workflow {workflow_id} is busy in {agent_type}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+    except WorkflowLockTimeout:
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to acquire lease for workflow {workflow_id}, running unlocked: {str(e)}")
+        return None
+
+async def _renew(lease: WorkflowLease, lock_key: str) -> None:
+    """Extend a lease every third of its duration until it is released."""
+    redis = await get_redis_client()
+    extend = redis.register_script(EXTEND_SCRIPT)
+    while True:
+        await asyncio.sleep(WORKFLOW_LOCK_LEASE_SECONDS / 3)
+        try:
+            if not await extend(keys=[lock_key], args=[lease.owner, WORKFLOW_LOCK_LEASE_SECONDS * 1000]):
+                logger.warning(f"Lost lease {lock_key} (fencing token {lease.fencing_token})")
+                return
+        except Exception as e:
+            logger.warning(f"Failed to extend lease {lock_key}: {str(e)}")
+
+async def release_lease(lease: WorkflowLease) -> bool:
+    """
+    Release a lease if it is still held by its owner.
+
+    Args:
+        lease: The lease to release
+
+    Returns:
+        bool: True if the lease was released, False if it had already expired or on error
+    """
+    if lease.renewal is not None:
+        lease.renewal.cancel()
+    try:
+        lock_key = await get_lock_key(lease.workflow_id, lease.agent_type)
+
+        # Get redis client
+        redis = await get_redis_client()
+        release = redis.register_script(RELEASE_SCRIPT)
+        return bool(await release(keys=[lock_key], args=[lease.owner]))
+    except Exception as e:
+        logger.warning(f"Failed to release lease for workflow {lease.workflow_id}: {str(e)}")
+        return False
+
+async def _flush_and_release(lease: WorkflowLease) -> None:
+    """Release a lease once the write-behind history saves made under it have landed."""
+    # Imported here as agent_history builds on the fencing helpers of this module
+    from ..agent_history.write_behind import flush_history_writes
+    try:
+        await flush_history_writes(lease.workflow_id)
+    finally:
+        await release_lease(lease)
+
+@asynccontextmanager
+async def workflow_lease(workflow_id: str, agent_type: str) -> AsyncIterator[Optional[WorkflowLease]]:
+    """
+    Hold the lease of a workflow's agent for the duration of a turn.
+
+    History saves inside the block carry the lease's fencing token, so a turn whose lease
+    expired cannot overwrite the history of a newer turn. With write-behind history the lease
+    is released in the background once the queued saves of the workflow are written.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent
+
+    Yields:
+        Optional[WorkflowLease]: The held lease, None when locking is disabled or Redis is unavailable
+    """
+    lease = await acquire_lease(workflow_id, agent_type) if WORKFLOW_LOCK else None
+    context_token = current_lease.set(lease)
+    try:
+        yield lease
+    finally:
+        current_lease.reset(context_token)
+        if lease is not None:
+            if HISTORY_WRITE_BEHIND:
+                task = asyncio.create_task(_flush_and_release(lease))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            else:
+                await release_lease(lease)
@@ -1,13 +1,14 @@
 import aiohttp,os
 from dotenv import load_dotenv
 from typing import Any, Optional
+from utils.scrape_cache import cached_scrape
 
 load_dotenv()
 
 BASE_URL = os.environ.get("NEXUS_SERVICE_BASE_URL")
 
-async def web_scraper(url_to_scrape: str) -> dict | str:
-    """Scrape a website via helper server.
+async def scrape_url(url_to_scrape: str) -> dict | str:
+    """Scrape a website via helper server, bypassing the scrape cache.
 
     Args:
         url_to_scrape (str): Full URL of the page to scrape.
@@ -27,4 +28,15 @@ async def web_scraper(url_to_scrape: str) -> dict | str:
                     return await response.text()
                 return {"error": f"HTTP {response.status}"}
     except Exception as e:
-        return f"Error in scrape: {str(e)}"
\ No newline at end of file
+        return f"Error in scrape: {str(e)}"
+
+async def web_scraper(url_to_scrape: str) -> dict | str:
+    """Scrape a website via helper server.
+
+    Args:
+        url_to_scrape (str): Full URL of the page to scrape.
+
+    Returns:
+        dict | str: Scraped data or error message.
+    """
+    return await cached_scrape(url_to_scrape, scrape_url)
@@ -1,15 +1,17 @@
-import aiohttp,os
 from dotenv import load_dotenv
 from typing import Any
+from storage.redis.rag_cache.rag_cache import load_rag_answer, save_rag_answer
+from utils.rag_backend import get_rag_backend
 
 load_dotenv()
 
-BASE_URL = os.environ.get("NEXUS_SERVICE_BASE_URL")
-
 async def rag_query(workflow_id: str,query: str) -> str:
     """
     Rag query tool to get the answer from internet by doing web search.
     
+    Answers are cached per workflow until new data is added to its collection. The
+    collection is served by the backend selected with RAG_BACKEND.
+    
     Args:
         workflow_id (str): The workflow id.
         query (str): The question to answer.
@@ -17,18 +19,16 @@ async def rag_query(workflow_id: str,query: str) -> str:
     Returns:
         str: The answer to the question.
     """
-    url = f"{BASE_URL}/query-data"
-    payload = {"workflow_id": workflow_id, "query": query}
+    answer, generation = await load_rag_answer(workflow_id, query)
+    if answer is not None:
+        return answer
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    return data["response"]
-                else:
-                    return f"Error in rag query: HTTP {response.status}"
+        answer = await get_rag_backend().query(workflow_id, query)
+        
+        if generation is not None:
+            await save_rag_answer(workflow_id, query, generation, answer)
+        return answer
     except Exception as e:
         return f"Error in rag query: {str(e)}"
 
@@ -1,6 +1,10 @@
-import aiohttp,os,time
+import aiohttp,asyncio,os
 from dotenv import load_dotenv
-from typing import Any
+from typing import Any, Optional
+from utils.scheduler import scheduled, BACKGROUND
+from storage.redis.rag_cache.rag_cache import invalidate_rag_cache
+from storage.mongodb.research_store import find_research, save_research
+from utils.rag_backend import get_rag_backend, RagBackendError
 
 load_dotenv()
 
@@ -16,18 +20,15 @@ async def add_data(workflow_id: str, data: Any) -> dict | str:
     Returns:
         dict | str: Success response (202) or error string.
     """
-    url = f"{BASE_URL}/add-data"
-    body = {"workflow_id": workflow_id, "data": data}
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=body) as response:
-                if response.status in (200, 202):
-                    # 202 Accepted is expected
-                    content_type = response.headers.get("Content-Type", "")
-                    if "application/json" in content_type:
-                        return await response.json()
-                    return await response.text()
-                return {"error": f"HTTP {response.status}"}
+        # Ingestion is background work
+        async with scheduled(BACKGROUND, workflow_id):
+            result = await get_rag_backend().add(workflow_id, data)
+        # Cached answers don't know the new data
+        await invalidate_rag_cache(workflow_id)
+        return result
+    except RagBackendError as e:
+        return {"error": str(e)}
     except Exception as e:
         return f"Error in add_data: {str(e)}"
 
@@ -53,7 +54,8 @@ async def research_scheme(
     }
 
     try:
-        async with aiohttp.ClientSession() as session:
+        # Runs as background work so it never delays interactive model requests
+        async with scheduled(BACKGROUND, workflow_id), aiohttp.ClientSession() as session:
             async with session.post(url, json=body) as response:
                 if response.status == 200:
                     content_type = response.headers.get("Content-Type", "")
@@ -65,23 +67,43 @@ async def research_scheme(
         return f"Error in research_scheme: {str(e)}"
 
 
-async def research_gov_schemes(workflow_id: str, problem: str) -> str:
+async def research_gov_schemes(
+    workflow_id: str,
+    problem: str,
+    region: Optional[str] = None,
+    crop: Optional[str] = None
+) -> str:
     """
     Research government schemes for farmer's specific problems.
 
     Args:
         workflow_id (str): Workflow identifier to store under.
         problem (str): Farmer's problem description (required).
+        region (Optional[str], optional): Farmer's state, e.g. "Maharashtra". Defaults to None.
+        crop (Optional[str], optional): The affected crop, e.g. "cotton". Defaults to None.
     Returns:
         dict | str: Report string or JSON, or error message.
     """
     try:
-        scheme_data = await research_scheme(workflow_id, problem)
+        # Research of the same problem done for another farmer is reused
+        shared = await find_research(problem, region, crop)
+        if shared is not None:
+            _, scheme_data = shared
+        else:
+            scheme_data = await research_scheme(workflow_id, problem)
+            failed = (isinstance(scheme_data, str) and scheme_data.startswith("Error")) or (
+                isinstance(scheme_data, dict) and "error" in scheme_data
+            )
+            if not failed:
+                await save_research(workflow_id, problem, scheme_data, region, crop)
     
         await add_data(workflow_id, scheme_data)
-        time.sleep(10)
+        if not get_rag_backend().ingests_synchronously:
+            # Give the ingestion time to finish without blocking the event loop
+            await asyncio.sleep(10)
+            # Answers cached while the data was still being ingested
+            await invalidate_rag_cache(workflow_id)
     
         return "Research is completed successfully you can use the rag query tool to get the information"
     except Exception as e:
         return f"Error in research_gov_schemes: {str(e)}"
-
@@ -0,0 +1,20 @@
+from storage.redis.tool_output.tool_output_pages import load_tool_output_page
+from utils.scheduler import current_tenant
+
+async def read_tool_output(handle: str, page: int = 1) -> str:
+    """
+    Read a page of a tool output that was too long and returned as an extract.
+
+    Args:
+        handle (str): The handle given in the extract's header.
+        page (int, optional): The page to read, starting at 1. Defaults to 1.
+
+    Returns:
+        str: The page of the full output.
+    """
+    content, pages = await load_tool_output_page(current_tenant.get() or "", handle, page)
+    if content is None:
+        if pages:
+            return f"Error: page {page} doesn't exist, the output has {pages} pages."
+        return f"Error: no output found for handle {handle}, it may have expired."
+    return f"[Page {page} of {pages}]\n\n{content}"
@@ -1,6 +1,11 @@
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 import pybreaker
-from pydantic_ai.usage import UsageLimits
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.usage import Usage, UsageLimits
+from utils.usage_budget import UsageBudgetExceeded, get_usage_limits, record_usage, run_usage_limits
+from utils.scheduler import current_tenant
+from utils.turn_journal import current_journal, turn_journal
+from utils.output_governor import current_focus
 import logging
 from typing import Any, Dict, Optional, Union
 import asyncio
@@ -18,12 +23,15 @@ DEFAULT_CONFIG = {
     "circuit_reset_timeout": 60
 }
 
+# Budget errors are final - retrying would only spend more of the budget
+NON_RETRYABLE_ERRORS = (UsageLimitExceeded, UsageBudgetExceeded)
+
 # Circuit breaker configuration
 AGENT_BREAKER = pybreaker.CircuitBreaker(
     fail_max=DEFAULT_CONFIG["circuit_fail_max"], 
     reset_timeout=DEFAULT_CONFIG["circuit_reset_timeout"],
     name="agent_circuit",
-    exclude=[KeyboardInterrupt, asyncio.CancelledError]
+    exclude=[KeyboardInterrupt, asyncio.CancelledError, *NON_RETRYABLE_ERRORS]
 )
 
 @lru_cache(maxsize=128)
@@ -45,6 +53,7 @@ def get_configured_retry(attempts: int = None, multiplier: int = None, max_wait:
     
     return retry(
         stop=stop_after_attempt(attempts),
+        retry=retry_if_not_exception_type(NON_RETRYABLE_ERRORS),
         wait=wait_exponential(multiplier=multiplier, max=max_wait),
         reraise=True,
         before_sleep=lambda retry_state: logger.info(
@@ -56,21 +65,31 @@ async def execute_agent_with_retries(
     agent,
     prompt: str,
     retry_config: Optional[Dict[str, int]] = None,
-    usage_limits: Optional[UsageLimits] = None
+    usage_limits: Optional[UsageLimits] = None,
+    workflow_id: Optional[str] = None,
+    agent_type: Optional[str] = None
 ) -> Any:
     """
     Execute an agent with retry capabilities.
     
+    The usage of every attempt is recorded against the workflow and agent, and the
+    configured request and token budgets are enforced. Tool results and model responses
+    of failed attempts are journaled, so a retry only repeats the step that failed.
+    
     Args:
         agent: The agent to execute
         prompt: The prompt to send to the agent
         retry_config: Optional configuration for retries
-        usage_limits: Optional usage limits
+        usage_limits: Optional usage limits, defaults to the configured budgets
+        workflow_id: Optional workflow the usage is accounted to
+        agent_type: Optional agent type the usage is accounted to
         
     Returns:
         The agent response
     
     Raises:
+        UsageBudgetExceeded: If the workflow has no budget left
+        UsageLimitExceeded: If the run exceeded its usage limits
         Exception: Any exception raised by the agent after all retries are exhausted
     """
     retry_config = retry_config or {}
@@ -82,26 +101,52 @@ async def execute_agent_with_retries(
     
     @retry_decorator
     async def _execute():
+        usage = Usage()
+        journal = current_journal.get()
+        if journal is not None:
+            journal.begin_attempt()
         try:
             logger.debug(f"Executing agent with prompt: {prompt[:50]}...")
-            async with agent.run_mcp_servers():
-                agent_response = await agent.run(
-                    prompt, 
-                    usage_limits=usage_limits or UsageLimits(request_limit=None)
-                )
+            limits = usage_limits or await get_usage_limits(workflow_id)
+            # The tool guard hides tools relative to this run's limit
+            limits_token = run_usage_limits.set(limits)
+            try:
+                async with agent.run_mcp_servers():
+                    agent_response = await agent.run(
+                        prompt, 
+                        usage_limits=limits,
+                        usage=usage
+                    )
+            finally:
+                run_usage_limits.reset(limits_token)
             return agent_response
         except Exception as e:
             logger.error(f"Agent execution failed: {str(e)}")
             raise
+        finally:
+            # Failed attempts consume capacity too
+            await record_usage(workflow_id, agent_type, usage)
     
-    return await _execute()
+    # Model requests of the run share the scheduler's slots fairly with other workflows
+    tenant_token = current_tenant.set(workflow_id)
+    # Long tool outputs are cut down to the parts relevant to the prompt
+    focus_token = current_focus.set(prompt)
+    try:
+        with turn_journal():
+            return await _execute()
+    finally:
+        current_focus.reset(focus_token)
+        current_tenant.reset(tenant_token)
 
 async def execute_agent_safely(
     agent,
     prompt: str,
     retry_config: Optional[Dict[str, int]] = None,
     circuit_config: Optional[Dict[str, int]] = None,
-    usage_limits: Optional[UsageLimits] = None
+    usage_limits: Optional[UsageLimits] = None,
+    workflow_id: Optional[str] = None,
+    agent_type: Optional[str] = None,
+    circuit_breaker: Optional[pybreaker.CircuitBreaker] = None
 ) -> Any:
     """
     Execute an agent with both circuit breaker and retry capabilities.
@@ -112,6 +157,9 @@ async def execute_agent_safely(
         retry_config: Optional configuration for retries
         circuit_config: Optional configuration for the circuit breaker
         usage_limits: Optional usage limits
+        workflow_id: Optional workflow the usage is accounted to
+        agent_type: Optional agent type the usage is accounted to
+        circuit_breaker: Optional circuit breaker of its own, instead of the shared agent breaker
         
     Returns:
         The agent response
@@ -121,24 +169,29 @@ async def execute_agent_safely(
         Exception: Any exception raised by the agent after all retries are exhausted
     """
     # Apply custom circuit breaker if configured
-    if circuit_config:
+    if circuit_breaker is None and circuit_config:
         circuit_breaker = pybreaker.CircuitBreaker(
             fail_max=circuit_config.get("fail_max", DEFAULT_CONFIG["circuit_fail_max"]),
             reset_timeout=circuit_config.get("reset_timeout", DEFAULT_CONFIG["circuit_reset_timeout"]),
             name="custom_agent_circuit",
-            exclude=[KeyboardInterrupt, asyncio.CancelledError]
+            exclude=[KeyboardInterrupt, asyncio.CancelledError, *NON_RETRYABLE_ERRORS]
         )
-    else:
+    elif circuit_breaker is None:
         circuit_breaker = AGENT_BREAKER
         
     try:
         @circuit_breaker
         async def _execute_with_circuit_breaker():
-            return await execute_agent_with_retries(agent, prompt, retry_config, usage_limits)
+            return await execute_agent_with_retries(
+                agent, prompt, retry_config, usage_limits, workflow_id, agent_type
+            )
             
         return await _execute_with_circuit_breaker()
     except pybreaker.CircuitBreakerError:
-        logger.critical("Agent circuit breaker open - too many failures")
+        logger.critical(f"Circuit breaker {circuit_breaker.name} open - too many failures")
+        raise
+    except NON_RETRYABLE_ERRORS as e:
+        logger.warning(f"Agent execution stopped by usage budget: {str(e)}")
         raise
     except Exception as e:
         logger.error(f"Agent execution failed after retries: {str(e)}")
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from utils.scheduler import ScheduledTransport
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Context cache configuration
+CONTEXT_CACHE_CONFIG = {
+    "enabled": os.environ.get("GEMINI_CONTEXT_CACHE", "true").lower() == "true",
+    "ttl_seconds": int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600")),
+    "refresh_margin_seconds": int(os.environ.get("GEMINI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS", "300")),
+    # Back-off after the API refused to create a cache (e.g. prompt below the minimum cacheable size)
+    "failure_backoff_seconds": int(os.environ.get("GEMINI_CONTEXT_CACHE_FAILURE_BACKOFF_SECONDS", "900")),
+    # Optional cache entry for the conversation prefix of long multi-step turns
+    "conversation_cache": os.environ.get("GEMINI_CONVERSATION_CACHE", "false").lower() == "true",
+    "conversation_min_chars": int(os.environ.get("GEMINI_CONVERSATION_CACHE_MIN_CHARS", "20000")),
+    "conversation_ttl_seconds": int(os.environ.get("GEMINI_CONVERSATION_CACHE_TTL_SECONDS", "600")),
+    # Handles, locks and back-offs kept per process, least recently used evicted first
+    "max_handles": int(os.environ.get("GEMINI_CONTEXT_CACHE_MAX_HANDLES", "512"))
+}
+
+# Request fields that live inside the cached content and must not be sent alongside it
+CACHED_FIELDS = ("systemInstruction", "tools", "toolConfig")
+
+# Response headers that no longer apply once a response body has been read and decoded
+DECODED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class ContextCacheAuthError(Exception):
+    """Raised when the API refuses a cache request because of the credentials."""
+
+
+def _is_cache_error(response: httpx.Response) -> bool:
+    """Whether a 403 / 404 is about the referenced cached content rather than the credentials."""
+    return response.status_code == 404 or "cachedcontent" in response.text.lower().replace(" ", "")
+
+
+def _remember(mapping: OrderedDict, key: str, value: Any) -> Any:
+    """Store a per-fingerprint value, evicting the least recently used beyond max_handles."""
+    mapping[key] = value
+    mapping.move_to_end(key)
+    while len(mapping) > CONTEXT_CACHE_CONFIG["max_handles"]:
+        mapping.popitem(last=False)
+    return value
+
+
+@dataclass
+class CachedContentHandle:
+    """A Gemini cached-content resource and its local expiry."""
+    name: str
+    ttl_seconds: int
+    expires_at: float
+
+
+class GeminiContextCacheTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that moves the static part of Gemini requests into explicit context caches.
+
+    The system instruction and tool definitions of each `generateContent` request are uploaded
+    once as a `cachedContents` resource and referenced by name on every following request with
+    the same prefix. Handles are refreshed before they expire and re-created when the API no
+    longer knows them. Any caching failure falls back to sending the request unchanged, except
+    that authentication errors are passed through to the caller. Handles, locks and failure
+    back-offs are bounded LRU maps with expired entries pruned.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._handles: "OrderedDict[str, CachedContentHandle]" = OrderedDict()
+        self._failed_until: "OrderedDict[str, float]" = OrderedDict()
+        self._locks: "OrderedDict[str, asyncio.Lock]" = OrderedDict()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not CONTEXT_CACHE_CONFIG["enabled"] or not self._is_generate_request(request):
+            return await self._transport.handle_async_request(request)
+
+        body = json.loads(await request.aread())
+        cached_body, fingerprint = await self._apply_cache(request, body)
+        if cached_body is None:
+            return await self._transport.handle_async_request(request)
+
+        response = await self._transport.handle_async_request(self._rebuild(request, cached_body))
+        if response.status_code in (403, 404):
+            await response.aread()
+            await response.aclose()
+            if not _is_cache_error(response):
+                # e.g. an invalid API key, not a cache miss
+                return httpx.Response(
+                    response.status_code,
+                    headers=[(k, v) for k, v in response.headers.items() if k.lower() not in DECODED_HEADERS],
+                    content=response.content,
+                    extensions=response.extensions
+                )
+            # The cache was deleted or expired on the provider side, retry uncached
+            logger.warning(f"Gemini cached content rejected (HTTP {response.status_code}), retrying without cache")
+            self._handles.pop(fingerprint, None)
+            return await self._transport.handle_async_request(self._rebuild(request, body))
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+    def _prune(self, now: float) -> None:
+        """Forget expired handles and back-offs."""
+        for fingerprint in [f for f, handle in self._handles.items() if handle.expires_at <= now]:
+            del self._handles[fingerprint]
+        for fingerprint in [f for f, until in self._failed_until.items() if until <= now]:
+            del self._failed_until[fingerprint]
+
+    @staticmethod
+    def _is_generate_request(request: httpx.Request) -> bool:
+        return request.method == "POST" and request.url.path.endswith(
+            (":generateContent", ":streamGenerateContent")
+        )
+
+    @staticmethod
+    def _model_name(request: httpx.Request) -> str:
+        # /v1beta/models/gemini-2.5-flash:generateContent -> models/gemini-2.5-flash
+        path = request.url.path.rsplit(":", 1)[0]
+        return "models/" + path.rsplit("/models/", 1)[-1]
+
+    @staticmethod
+    def _fingerprint(model: str, cached_part: Dict[str, Any]) -> str:
+        payload = {"model": model, **{field: cached_part.get(field) for field in (*CACHED_FIELDS, "contents")}}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _rebuild(request: httpx.Request, body: Dict[str, Any]) -> httpx.Request:
+        headers = {k: v for k, v in request.headers.items() if k.lower() != "content-length"}
+        return httpx.Request(
+            request.method,
+            request.url,
+            headers=headers,
+            content=json.dumps(body).encode("utf-8"),
+            extensions=request.extensions
+        )
+
+    def _split_request(self, body: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, Any], int]:
+        """Split a request body into the part to cache and the part still sent per request."""
+        cached_part = {field: body[field] for field in CACHED_FIELDS if field in body}
+        remaining = {k: v for k, v in body.items() if k not in CACHED_FIELDS}
+        ttl = CONTEXT_CACHE_CONFIG["ttl_seconds"]
+
+        contents = body.get("contents") or []
+        if (
+            CONTEXT_CACHE_CONFIG["conversation_cache"]
+            and len(contents) > 1
+            and len(json.dumps(contents[0])) >= CONTEXT_CACHE_CONFIG["conversation_min_chars"]
+        ):
+            # Later steps of a tool-using turn resend the same large first message
+            cached_part["contents"] = contents[:1]
+            remaining["contents"] = contents[1:]
+            ttl = CONTEXT_CACHE_CONFIG["conversation_ttl_seconds"]
+
+        return cached_part, remaining, ttl
+
+    async def _apply_cache(
+        self,
+        request: httpx.Request,
+        body: Dict[str, Any]
+    ) -> tuple[Optional[Dict[str, Any]], Optional[str]]:
+        if "cachedContent" in body or "systemInstruction" not in body:
+            return None, None
+
+        model = self._model_name(request)
+        cached_part, remaining, ttl = self._split_request(body)
+        fingerprint = self._fingerprint(model, cached_part)
+
+        now = time.monotonic()
+        self._prune(now)
+        if self._failed_until.get(fingerprint, 0) > now:
+            return None, fingerprint
+
+        lock = self._locks.get(fingerprint)
+        if lock is None:
+            lock = _remember(self._locks, fingerprint, asyncio.Lock())
+        self._locks.move_to_end(fingerprint)
+        async with lock:
+            try:
+                handle = await self._get_handle(request, model, fingerprint, cached_part, ttl)
+            except ContextCacheAuthError as e:
+                # The uncached request fails the same way and surfaces the error; no back-off
+                # so caching resumes as soon as the credentials are fixed
+                logger.error(f"Gemini context caching refused: {str(e)}")
+                return None, fingerprint
+            except Exception as e:
+                logger.warning(f"Gemini context caching unavailable, sending full request: {str(e)}")
+                _remember(self._failed_until, fingerprint, time.monotonic() + CONTEXT_CACHE_CONFIG["failure_backoff_seconds"])
+                return None, fingerprint
+
+        remaining["cachedContent"] = handle.name
+        return remaining, fingerprint
+
+    async def _get_handle(
+        self,
+        request: httpx.Request,
+        model: str,
+        fingerprint: str,
+        cached_part: Dict[str, Any],
+        ttl: int
+    ) -> CachedContentHandle:
+        handle = self._handles.get(fingerprint)
+        now = time.monotonic()
+
+        if handle and handle.expires_at - now > CONTEXT_CACHE_CONFIG["refresh_margin_seconds"]:
+            self._handles.move_to_end(fingerprint)
+            return handle
+
+        if handle and handle.expires_at > now:
+            # Extend the TTL of a handle that is about to expire
+            response = await self._send_cache_request(
+                request, "PATCH", f"/v1beta/{handle.name}", {"ttl": f"{ttl}s"}, params={"updateMask": "ttl"}
+            )
+            if response.status_code == 200:
+                handle.expires_at = now + ttl
+                logger.debug(f"Refreshed Gemini cached content {handle.name}")
+                return handle
+            logger.warning(f"Failed to refresh Gemini cached content {handle.name}: HTTP {response.status_code}")
+
+        response = await self._send_cache_request(
+            request,
+            "POST",
+            "/v1beta/cachedContents",
+            {"model": model, "displayName": fingerprint[:32], "ttl": f"{ttl}s", **cached_part}
+        )
+        if response.status_code in (401, 403):
+            raise ContextCacheAuthError(f"HTTP {response.status_code}: {response.text[:200]}")
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+        handle = _remember(
+            self._handles,
+            fingerprint,
+            CachedContentHandle(name=response.json()["name"], ttl_seconds=ttl, expires_at=now + ttl)
+        )
+        logger.info(f"Created Gemini cached content {handle.name} for {model}")
+        return handle
+
+    async def _send_cache_request(
+        self,
+        request: httpx.Request,
+        method: str,
+        path: str,
+        body: Dict[str, Any],
+        params: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        url = httpx.URL(f"{request.url.scheme}://{request.url.netloc.decode('ascii')}{path}", params=params)
+        headers = {
+            "Content-Type": "application/json",
+            "X-Goog-Api-Key": request.headers.get("X-Goog-Api-Key", "")
+        }
+        cache_request = httpx.Request(method, url, headers=headers, content=json.dumps(body).encode("utf-8"))
+        response = await self._transport.handle_async_request(cache_request)
+        await response.aread()
+        return response
+
+
+# Shared client for all Gemini providers so every agent reuses the same cache handles;
+# model requests are interactive work for the scheduler
+gemini_http_client = httpx.AsyncClient(
+    transport=ScheduledTransport(GeminiContextCacheTransport()),
+    timeout=httpx.Timeout(timeout=600, connect=5)
+)
@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional
+
+import logfire
+import numpy as np
+import pybreaker
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+from pydantic_ai import Agent
+
+from prompts.intent_router import intent_router_prompt
+from utils.agent_execution import execute_agent_safely, NON_RETRYABLE_ERRORS
+from utils.llms import router_llm
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+AGENT_NAMES = ("market_price_agent", "gov_scheme_agent")
+
+# Router configuration
+ROUTER_CONFIG = {
+    # Below this confidence the LLM classifier decides
+    "confidence_threshold": float(os.environ.get("ROUTER_CONFIDENCE_THRESHOLD", "0.65")),
+    "llm_fallback": os.environ.get("ROUTER_LLM_FALLBACK", "true").lower() == "true",
+    # Minimum score share of every agent for a question to be fanned out to all of them
+    "compound_min_share": float(os.environ.get("ROUTER_COMPOUND_MIN_SHARE", "0.3")),
+    # Agent answering inputs nothing could be routed for (e.g. greetings)
+    "default_agent": os.environ.get("ROUTER_DEFAULT_AGENT", "gov_scheme_agent"),
+    "keyword_weight": 0.35,
+    "max_keyword_hits": 3
+}
+
+# Gazetteer of strong intent keywords (English and common Hindi transliterations)
+KEYWORDS: Dict[str, re.Pattern] = {
+    "market_price_agent": re.compile(
+        r"\b(price[sd]?|rates?|mandi|mandis|bhav|bhaav|daam|market|apmc|modal|quintal|wholesale|"
+        r"selling price|sell|trader|procurement price|kimat|keemat)\b",
+        re.IGNORECASE
+    ),
+    "gov_scheme_agent": re.compile(
+        r"\b(schemes?|yojana|subsid(y|ies)|government|govt|sarkari|loan|insurance|pm[- ]?kisan|pmfby|kcc|"
+        r"kisan credit|grant|benefit|eligib\w*|apply|application|compensation|relief|pension|"
+        r"ministry|department)\b",
+        re.IGNORECASE
+    )
+}
+
+# Labelled examples the TF-IDF model is fitted on
+TRAINING_EXAMPLES: Dict[str, List[str]] = {
+    "market_price_agent": [
+        "what is the price of wheat in indore mandi today",
+        "current market rate of soybean in madhya pradesh",
+        "onion price per quintal in nashik",
+        "tomato bhav in azadpur mandi",
+        "cotton rate in rajkot market",
+        "how much will i get for 20 quintal paddy",
+        "compare the price of chana in two markets",
+        "modal price of maize in karnataka",
+        "convert price per quintal to price per kg",
+        "profit if i sell my crop at this rate",
+        "latest mustard prices in rajasthan",
+        "where can i sell potatoes at the best rate",
+        "price trend of garlic this week",
+        "average price of groundnut across markets"
+    ],
+    "gov_scheme_agent": [
+        "is there any government scheme for farmers",
+        "subsidy for drip irrigation",
+        "how to apply for pm kisan",
+        "crop insurance for pest attack on cotton",
+        "loan scheme for buying a tractor",
+        "eligibility for kisan credit card",
+        "compensation for crop loss due to flood",
+        "subsidy for cold storage construction",
+        "yojana for solar pump",
+        "which schemes help small farmers in maharashtra",
+        "documents needed for scheme application",
+        "government support for organic farming",
+        "pension scheme for farmers",
+        "grant for setting up a warehouse"
+    ]
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _tokenize(text: str) -> List[str]:
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    # Unigrams plus bigrams capture phrases like "cold storage" or "per quintal"
+    return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+
+class TfidfCentroidClassifier:
+    """Tiny TF-IDF model scoring a text against one L2-normalised centroid per label."""
+
+    def __init__(self, examples: Dict[str, List[str]]):
+        self.labels = list(examples)
+        documents = [(label, _tokenize(text)) for label, texts in examples.items() for text in texts]
+
+        vocabulary = sorted({token for _, tokens in documents for token in tokens})
+        self.index = {token: i for i, token in enumerate(vocabulary)}
+
+        document_frequency = np.zeros(len(vocabulary))
+        for _, tokens in documents:
+            for token in set(tokens):
+                document_frequency[self.index[token]] += 1
+        self.idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+
+        self.centroids = np.zeros((len(self.labels), len(vocabulary)))
+        for label, tokens in documents:
+            self.centroids[self.labels.index(label)] += self._vectorize(tokens)
+        self.centroids /= np.linalg.norm(self.centroids, axis=1, keepdims=True)
+
+    def _vectorize(self, tokens: List[str]) -> np.ndarray:
+        vector = np.zeros(len(self.index))
+        for token in tokens:
+            i = self.index.get(token)
+            if i is not None:
+                vector[i] += 1
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def similarities(self, text: str) -> Dict[str, float]:
+        scores = self.centroids @ self._vectorize(_tokenize(text))
+        return dict(zip(self.labels, scores.tolist()))
+
+
+tfidf_classifier = TfidfCentroidClassifier(TRAINING_EXAMPLES)
+
+
+@dataclass
+class IntentPrediction:
+    """Routing decision of the intent router."""
+    agent_name: Optional[str]
+    confidence: float
+    method: Literal["rules", "llm", "caller", "default", "none"]
+    scores: Dict[str, float] = field(default_factory=dict)
+    # Every agent that should answer, more than one for compound questions
+    agent_names: List[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        if not self.agent_names and self.agent_name:
+            self.agent_names = [self.agent_name]
+
+
+def classify_intent(text: str) -> IntentPrediction:
+    """
+    Classify a user input with keyword rules and the TF-IDF model.
+
+    A question is compound when it has keyword hits for every agent and each agent
+    holds at least `compound_min_share` of the score; it is then routed to all agents.
+
+    Args:
+        text: The user input
+
+    Returns:
+        IntentPrediction with normalised scores; confidence is 0 when nothing matched
+    """
+    similarities = tfidf_classifier.similarities(text)
+    scores = {}
+    hits = {}
+    for agent_name in AGENT_NAMES:
+        hits[agent_name] = min(len(KEYWORDS[agent_name].findall(text)), ROUTER_CONFIG["max_keyword_hits"])
+        scores[agent_name] = similarities[agent_name] + ROUTER_CONFIG["keyword_weight"] * hits[agent_name]
+
+    total = sum(scores.values())
+    if total <= 0:
+        return IntentPrediction(agent_name=None, confidence=0.0, method="rules", scores=scores)
+
+    scores = {agent_name: score / total for agent_name, score in scores.items()}
+    ranked = sorted(scores, key=scores.get, reverse=True)
+
+    if all(hits.values()) and scores[ranked[-1]] >= ROUTER_CONFIG["compound_min_share"]:
+        # Both agents are clearly asked for, no need for the LLM to pick one
+        return IntentPrediction(agent_name=ranked[0], confidence=1.0, method="rules", scores=scores, agent_names=ranked)
+
+    return IntentPrediction(agent_name=ranked[0], confidence=scores[ranked[0]], method="rules", scores=scores)
+
+
+# ---------- LLM fallback ----------
+class IntentRouterOutput(BaseModel):
+    agent_name: Literal["market_price_agent", "gov_scheme_agent"] = Field(
+        ..., description="The agent that should handle the user input."
+    )
+
+
+# Own breaker, so a failing router model neither opens nor is opened by the agents' breaker
+ROUTER_BREAKER = pybreaker.CircuitBreaker(
+    fail_max=5,
+    reset_timeout=60,
+    name="intent_router_circuit",
+    exclude=[KeyboardInterrupt, asyncio.CancelledError, *NON_RETRYABLE_ERRORS]
+)
+
+intent_router_agent = Agent(
+    name="Intent Router",
+    model=router_llm,
+    system_prompt=intent_router_prompt,
+    result_type=IntentRouterOutput,
+    retries=2,
+    instrument=True
+)
+
+
+# ---------- Metrics ----------
+ROUTER_METRICS = {
+    "decisions": {method: 0 for method in ("rules", "llm", "caller", "default", "none")},
+    "labelled": 0,
+    "correct": 0,
+    "latency_ms_total": 0.0,
+    "latency_ms_max": 0.0
+}
+
+decision_counter = logfire.metric_counter("router.decisions", unit="1", description="Routing decisions by method")
+latency_histogram = logfire.metric_histogram("router.latency", unit="ms", description="Local routing latency")
+accuracy_counter = logfire.metric_counter("router.labelled", unit="1", description="Routing decisions with a known label")
+
+
+def _record_decision(prediction: IntentPrediction, latency_ms: float, label: Optional[str]) -> None:
+    method = "caller" if label is not None else prediction.method
+    ROUTER_METRICS["decisions"][method] += 1
+    ROUTER_METRICS["latency_ms_total"] += latency_ms
+    ROUTER_METRICS["latency_ms_max"] = max(ROUTER_METRICS["latency_ms_max"], latency_ms)
+    decision_counter.add(1, {"method": method, "agent_name": str(label or prediction.agent_name)})
+    latency_histogram.record(latency_ms)
+
+    if label is not None:
+        correct = label == prediction.agent_name
+        ROUTER_METRICS["labelled"] += 1
+        ROUTER_METRICS["correct"] += int(correct)
+        accuracy_counter.add(1, {"correct": str(correct)})
+
+
+def get_router_metrics() -> Dict[str, Optional[float]]:
+    """
+    Snapshot of the routing metrics of this process.
+
+    Returns:
+        Dict with decision counts per method, accuracy against labelled decisions (None before
+        the first labelled decision) and local latency
+    """
+    decisions = sum(ROUTER_METRICS["decisions"].values())
+    return {
+        **{f"decisions_{method}": count for method, count in ROUTER_METRICS["decisions"].items()},
+        "accuracy": ROUTER_METRICS["correct"] / ROUTER_METRICS["labelled"] if ROUTER_METRICS["labelled"] else None,
+        "latency_ms_avg": ROUTER_METRICS["latency_ms_total"] / decisions if decisions else 0.0,
+        "latency_ms_max": ROUTER_METRICS["latency_ms_max"]
+    }
+
+
+async def route_intent(text: str, workflow_id: Optional[str] = None, label: Optional[str] = None) -> IntentPrediction:
+    """
+    Decide which agent handles a user input.
+
+    The local classifier decides when it is confident, otherwise the LLM classifier is asked.
+    Inputs neither could route (nothing matched and the LLM is disabled or failed) go to the
+    configured default agent, so every turn is answered. When the caller already chose an agent (label), that choice is kept and used to measure
+    the accuracy of the local classifier; a compound question is still fanned out to the
+    other agents it asks for, with the caller's agent first.
+
+    Args:
+        text: The user input
+        workflow_id: The workflow the LLM fallback usage is accounted to
+        label: Optional agent name chosen by the caller
+
+    Returns:
+        IntentPrediction with the chosen agent
+    """
+    start = time.perf_counter()
+    prediction = classify_intent(text) if text else IntentPrediction(agent_name=None, confidence=0.0, method="none")
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    if label is not None:
+        _record_decision(prediction, latency_ms, label)
+        agent_names = [label]
+        if len(prediction.agent_names) > 1:
+            agent_names += [agent_name for agent_name in prediction.agent_names if agent_name != label]
+        return IntentPrediction(
+            agent_name=label, confidence=1.0, method="caller", scores=prediction.scores, agent_names=agent_names
+        )
+
+    if text and prediction.confidence < ROUTER_CONFIG["confidence_threshold"] and ROUTER_CONFIG["llm_fallback"]:
+        try:
+            result = await execute_agent_safely(
+                intent_router_agent,
+                text,
+                retry_config={"attempts": 2},
+                workflow_id=workflow_id,
+                agent_type="intent_router",
+                circuit_breaker=ROUTER_BREAKER
+            )
+            prediction = IntentPrediction(
+                agent_name=result.data.agent_name,
+                confidence=prediction.confidence,
+                method="llm",
+                scores=prediction.scores
+            )
+        except Exception as e:
+            logger.warning(f"LLM intent routing failed, using local prediction: {str(e)}")
+
+    if prediction.agent_name is None:
+        prediction = IntentPrediction(
+            agent_name=ROUTER_CONFIG["default_agent"],
+            confidence=prediction.confidence,
+            method="default",
+            scores=prediction.scores
+        )
+
+    _record_decision(prediction, latency_ms, None)
+    logger.debug(
+        f"Routed to {prediction.agent_name} via {prediction.method} "
+        f"(confidence {prediction.confidence:.2f}, local latency {latency_ms:.3f} ms)"
+    )
+    return prediction
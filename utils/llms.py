@@ -1,16 +1,23 @@
 from pydantic_ai.models.gemini import GeminiModel
 from pydantic_ai.providers.google_gla import GoogleGLAProvider
+from utils.context_cache import gemini_http_client
+from utils.turn_journal import JournaledModel
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-market_price_llm = GeminiModel(
+market_price_llm = JournaledModel(GeminiModel(
     'gemini-2.5-flash', 
-    provider=GoogleGLAProvider(api_key=os.getenv("GOOGLE_API_KEY"))
-)
+    provider=GoogleGLAProvider(api_key=os.getenv("GOOGLE_API_KEY"), http_client=gemini_http_client)
+))
 
-gov_scheme_llm = GeminiModel(
+gov_scheme_llm = JournaledModel(GeminiModel(
     'gemini-2.5-flash', 
-    provider=GoogleGLAProvider(api_key=os.getenv("GOOGLE_API_KEY"))
+    provider=GoogleGLAProvider(api_key=os.getenv("GOOGLE_API_KEY"), http_client=gemini_http_client)
+))
+
+router_llm = GeminiModel(
+    'gemini-2.5-flash-lite', 
+    provider=GoogleGLAProvider(api_key=os.getenv("GOOGLE_API_KEY"), http_client=gemini_http_client)
 )
\ No newline at end of file
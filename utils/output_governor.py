@@ -0,0 +1,286 @@
+import functools
+import json
+import logging
+import math
+import os
+import re
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+import logfire
+from dotenv import load_dotenv
+
+from storage.redis.tool_output.tool_output_pages import save_tool_output_pages
+from utils.rag_backend import chunk_text, LocalIndex, RAG_BACKEND_CONFIG
+from utils.scheduler import current_tenant
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _tool_budgets(value: str) -> Dict[str, int]:
+    """Parse "tool=tokens,..." pairs."""
+    budgets = {}
+    for pair in value.split(","):
+        tool, _, tokens = pair.partition("=")
+        if tool.strip() and tokens.strip():
+            budgets[tool.strip()] = int(tokens)
+    return budgets
+
+# Tool output governor configuration
+OUTPUT_GOVERNOR_CONFIG = {
+    "enabled": os.environ.get("TOOL_OUTPUT_GOVERNOR", "true").lower() == "true",
+    # Budget of tools without their own
+    "default_max_tokens": int(os.environ.get("TOOL_OUTPUT_MAX_TOKENS", "2000")),
+    "tool_budgets": {
+        "web_scraper": 3000,
+        "get_market_price": 1500,
+        "rag_query": 2000,
+        "web_search": 1000,
+        **_tool_budgets(os.environ.get("TOOL_OUTPUT_BUDGETS", ""))
+    },
+    # Gemini averages about four characters per token for English text
+    "chars_per_token": 4,
+    # Size of the chunks an over-budget output is ranked in
+    "extract_chunk_chars": 800,
+    # Tools returning scraped pages, the only outputs boilerplate is stripped from
+    "scraped_page_tools": ("web_scraper",)
+}
+
+# Fields that only repeat another field of the same output
+DUPLICATE_FIELDS = {
+    "html": "markdown",
+    "rawHtml": "markdown",
+    "raw_html": "markdown",
+    "raw_response": "markets"
+}
+
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK_ONLY_LINE_PATTERN = re.compile(r"^(?:[\s*\-|•·>#]*\[[^\]]*\]\([^)]*\)[\s|•·,]*)+$")
+LINK_PATTERN = re.compile(r"\[[^\]]*\]\([^)]*\)|https?://")
+URL_PATTERN = re.compile(r"https?://\S+")
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|privacy policy|terms (of use|and conditions)|all rights reserved|©|copyright|skip to (main )?content|"
+    r"screen reader|follow us|share (on|this)|subscribe|back to top|sitemap",
+    re.IGNORECASE
+)
+
+# Text the current agent turn is about, the relevance query for extracts
+current_focus: ContextVar[Optional[str]] = ContextVar("current_focus", default=None)
+
+tokens_histogram = logfire.metric_histogram(
+    "tool_output.tokens", unit="1", description="Estimated tokens of tool outputs before and after governing"
+)
+truncated_counter = logfire.metric_counter(
+    "tool_output.truncated", unit="1", description="Tool outputs cut down to a relevant extract"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / OUTPUT_GOVERNOR_CONFIG["chars_per_token"])
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Remove the parts of scraped pages that carry no content.
+
+    Drops images, navigation lines made of links only, cookie / copyright / sharing lines and
+    repeated lines with links, and collapses blank lines. Repeated lines of plain text are kept.
+
+    Args:
+        text: Scraped text or markdown
+
+    Returns:
+        str: The cleaned text
+    """
+    lines, seen, blank = [], set(), False
+    for line in IMAGE_PATTERN.sub("", text).splitlines():
+        stripped = line.strip()
+        if not stripped:
+            if lines and not blank:
+                lines.append("")
+            blank = True
+            continue
+        if LINK_ONLY_LINE_PATTERN.match(stripped):
+            continue
+        if len(stripped) < 200 and BOILERPLATE_PATTERN.search(stripped):
+            continue
+        if LINK_PATTERN.search(stripped):
+            # Menus and link lists repeated in page headers, sidebars and footers
+            key = " ".join(stripped.lower().split())
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line.rstrip())
+        blank = False
+    return "\n".join(lines).strip()
+
+
+def compact(value: Any, scraped: bool = False) -> Any:
+    """
+    Drop duplicated raw fields from a tool output and, for scraped pages, strip boilerplate from its long texts.
+
+    A raw field is only dropped when the field it duplicates is non-empty: when parsing found
+    no markets, the full `raw_response` is kept and only the token budget bounds it.
+
+    Args:
+        value: The tool output
+        scraped: Whether the output is scraped page content
+
+    Returns:
+        The compacted output, of the same shape
+    """
+    if isinstance(value, str):
+        return strip_boilerplate(value) if scraped and len(value) > 500 else value
+    if isinstance(value, list):
+        return [compact(item, scraped) for item in value]
+    if isinstance(value, dict):
+        return {
+            name: compact(item, scraped) for name, item in value.items()
+            if not (name in DUPLICATE_FIELDS and value.get(DUPLICATE_FIELDS[name]))
+        }
+    return value
+
+
+def _render(value: Any, path: str = "") -> List[str]:
+    """Render an output as text blocks, long strings unescaped so they chunk on their paragraphs."""
+    if isinstance(value, str) and len(value) > 500:
+        return [f"{path}:\n{value}" if path else value]
+    if isinstance(value, (dict, list)) and len(json.dumps(value, ensure_ascii=False, default=str)) > 500:
+        items = value.items() if isinstance(value, dict) else enumerate(value)
+        return [block for name, item in items for block in _render(item, f"{path}.{name}" if path else str(name))]
+    rendered = json.dumps(value, ensure_ascii=False, default=str)
+    return [f"{path}: {rendered}" if path else rendered]
+
+
+def _focus_queries(args_text: str) -> List[str]:
+    """Relevance queries of an extract, most important first: the tool's arguments (without URLs), then the user input."""
+    focus = current_focus.get() or ""
+    # The agent nodes build the prompt as history followed by "# User Input"
+    return [URL_PATTERN.sub(" ", args_text), focus.rsplit("# User Input", 1)[-1]]
+
+
+def extract_relevant(text: str, queries: List[str], max_chars: int) -> str:
+    """
+    Pick the chunks of a text most relevant to some queries, up to `max_chars`, in their original order.
+
+    Chunks are ranked by the first query, then the chunks it didn't match by the next one, so
+    a later query only fills the space the earlier ones leave.
+
+    Args:
+        text: The full text
+        queries: What the extract should be relevant to, most important first
+        max_chars: Size limit of the extract
+
+    Returns:
+        str: The chunks joined with "[...]" markers where text was left out
+    """
+    chunks = chunk_text(text, OUTPUT_GOVERNOR_CONFIG["extract_chunk_chars"], 0)
+    index = LocalIndex(RAG_BACKEND_CONFIG["vector_dims"])
+    index.add(chunks)
+    positions = {}
+    for position, chunk in enumerate(chunks):
+        positions.setdefault(chunk, position)
+
+    # Ranked chunks first, then the unranked ones from the top of the text
+    ranked, ranked_positions = [], set()
+    for query in queries:
+        for chunk in index.search(query, len(chunks), RAG_BACKEND_CONFIG["bm25_weight"]):
+            if positions[chunk] not in ranked_positions:
+                ranked.append(positions[chunk])
+                ranked_positions.add(positions[chunk])
+    ranked += [position for position in range(len(chunks)) if position not in ranked_positions]
+
+    selected, size = [], 0
+    for position in ranked:
+        if size + len(chunks[position]) > max_chars:
+            continue
+        selected.append(position)
+        size += len(chunks[position]) + 7
+    if not selected:
+        return chunks[0][:max_chars]
+
+    parts, previous = [], -1
+    for position in sorted(selected):
+        if position != previous + 1:
+            parts.append("[...]")
+        parts.append(chunks[position])
+        previous = position
+    if previous != len(chunks) - 1:
+        parts.append("[...]")
+    return "\n\n".join(parts)
+
+
+async def govern_output(tool_name: str, args_text: str, result: Any) -> Any:
+    """
+    Bound the size of a tool output before it enters the model context.
+
+    Outputs within the tool's token budget are only compacted, with boilerplate stripped from
+    scraped pages only. Larger outputs are replaced by an extract of the chunks most relevant
+    to the tool call's arguments and then to the user input of the current turn, and the full
+    text is saved in pages the agent can read with `read_tool_output`.
+
+    Args:
+        tool_name: The tool's name, selects the budget
+        args_text: The tool's arguments, the main relevance query
+        result: The tool output
+
+    Returns:
+        The compacted output, or a string with the extract and the paging handle
+    """
+    budget = OUTPUT_GOVERNOR_CONFIG["tool_budgets"].get(tool_name, OUTPUT_GOVERNOR_CONFIG["default_max_tokens"])
+    raw_text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+    tokens_histogram.record(estimate_tokens(raw_text), {"tool": tool_name, "stage": "raw"})
+
+    result = compact(result, tool_name in OUTPUT_GOVERNOR_CONFIG["scraped_page_tools"])
+    text = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, indent=1, default=str)
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        tokens_histogram.record(tokens, {"tool": tool_name, "stage": "returned"})
+        return result
+
+    max_chars = budget * OUTPUT_GOVERNOR_CONFIG["chars_per_token"]
+    text = "\n\n".join(_render(result))
+    pages = chunk_text(text, max_chars, 0)
+    handle = uuid.uuid4().hex[:12]
+    workflow_id = current_tenant.get()
+    if workflow_id and await save_tool_output_pages(workflow_id, handle, pages):
+        header = (
+            f"[Extract of the {tool_name} output (about {tokens} tokens) with the parts most relevant to the question. "
+            f"The full output has {len(pages)} pages, read them with read_tool_output(handle=\"{handle}\", page=N).]"
+        )
+    else:
+        header = f"[Extract of the {tool_name} output (about {tokens} tokens) with the parts most relevant to the question.]"
+
+    extract = f"{header}\n\n{extract_relevant(text, _focus_queries(args_text), max_chars - len(header))}"
+    truncated_counter.add(1, {"tool": tool_name})
+    tokens_histogram.record(estimate_tokens(extract), {"tool": tool_name, "stage": "returned"})
+    logger.debug(f"Cut {tool_name} output from {tokens} tokens to its {budget} token budget (handle {handle})")
+    return extract
+
+
+def governed(tool: Callable) -> Callable:
+    """
+    Apply the output governor to an async tool.
+
+    The wrapper keeps the tool's name, signature and docstring. Error outputs are passed through.
+
+    Args:
+        tool: The tool function
+
+    Returns:
+        The governed tool function
+    """
+    @functools.wraps(tool)
+    async def wrapper(*args, **kwargs):
+        result = await tool(*args, **kwargs)
+        if not OUTPUT_GOVERNOR_CONFIG["enabled"] or result is None:
+            return result
+        if isinstance(result, str) and result.startswith("Error"):
+            return result
+        args_text = " ".join(str(value) for value in [*args, *kwargs.values()])
+        return await govern_output(tool.__name__, args_text, result)
+
+    return wrapper
@@ -0,0 +1,252 @@
+import json
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import numpy as np
+from dotenv import load_dotenv
+
+from storage.redis.rag_index.rag_chunks import append_rag_chunks, load_rag_chunks
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Retrieval backend configuration
+RAG_BACKEND_CONFIG = {
+    # "remote": the Nexus service at NEXUS_SERVICE_BASE_URL, "local": in-process index over chunks in Redis
+    "backend": os.environ.get("RAG_BACKEND", "remote").lower(),
+    "base_url": os.environ.get("NEXUS_SERVICE_BASE_URL"),
+    "chunk_chars": int(os.environ.get("RAG_LOCAL_CHUNK_CHARS", "1200")),
+    "chunk_overlap_chars": int(os.environ.get("RAG_LOCAL_CHUNK_OVERLAP_CHARS", "200")),
+    "top_k": int(os.environ.get("RAG_LOCAL_TOP_K", "5")),
+    # Workflow indexes kept in memory per process
+    "max_indexes": int(os.environ.get("RAG_LOCAL_MAX_INDEXES", "256")),
+    # Dimensions of the hashed term vectors used for cosine similarity
+    "vector_dims": 2048,
+    # Weight of BM25 (vs. cosine similarity) in the hybrid score
+    "bm25_weight": 0.5
+}
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+class RagBackendError(Exception):
+    """Raised when the retrieval backend rejects a query or an insert."""
+
+
+def _tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _to_text(data: Any) -> str:
+    if isinstance(data, str):
+        return data
+    return json.dumps(data, ensure_ascii=False, indent=1)
+
+
+def chunk_text(text: str, chunk_chars: int, overlap_chars: int) -> List[str]:
+    """
+    Split text into chunks of about `chunk_chars`, on paragraph boundaries where possible.
+
+    Paragraphs longer than a chunk are split on whitespace, with `overlap_chars` of the
+    previous piece repeated so a sentence cut in two is still found.
+
+    Args:
+        text: The text to split
+        chunk_chars: Target chunk size in characters
+        overlap_chars: Characters shared by consecutive pieces of a long paragraph
+
+    Returns:
+        List[str]: The non-empty chunks
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        while len(paragraph) > chunk_chars:
+            cut = paragraph.rfind(" ", chunk_chars // 2, chunk_chars)
+            cut = cut if cut > 0 else chunk_chars
+            pieces.append(paragraph[:cut])
+            paragraph = paragraph[max(cut - overlap_chars, cut // 2):].lstrip()
+        if paragraph:
+            pieces.append(paragraph)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > chunk_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class LocalIndex:
+    """
+    In-memory hybrid index of one workflow's chunks: BM25 over an inverted index plus cosine
+    similarity of hashed, sublinear term-frequency vectors. Chunks are only ever appended.
+    """
+
+    def __init__(self, dims: int, generation: Optional[str] = None):
+        self.dims = dims
+        # Generation of the stored chunk collection the index was built from
+        self.generation = generation
+        self.chunks: List[str] = []
+        self._lengths: List[int] = []
+        # term -> ([chunk positions], [term frequencies])
+        self._postings: Dict[str, tuple] = {}
+        self._rows: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def _vectorize(self, counts: Counter) -> np.ndarray:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for term, count in counts.items():
+            # crc32 is stable across processes, unlike hash()
+            vector[zlib.crc32(term.encode("utf-8")) % self.dims] += 1 + math.log(count)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, chunks: List[str]) -> None:
+        for chunk in chunks:
+            position = len(self.chunks)
+            counts = Counter(_tokenize(chunk))
+            self.chunks.append(chunk)
+            self._lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                positions, frequencies = self._postings.setdefault(term, ([], []))
+                positions.append(position)
+                frequencies.append(count)
+            self._rows.append(self._vectorize(counts))
+        self._matrix = None
+
+    def search(self, query: str, top_k: int, bm25_weight: float) -> List[str]:
+        terms = _tokenize(query)
+        if not self.chunks or not terms:
+            return []
+
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        average_length = float(lengths.mean()) or 1.0
+        bm25 = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            positions = np.asarray(postings[0])
+            frequencies = np.asarray(postings[1], dtype=np.float32)
+            idf = math.log(1 + (len(self.chunks) - len(positions) + 0.5) / (len(positions) + 0.5))
+            bm25[positions] += idf * frequencies * (BM25_K1 + 1) / (
+                frequencies + BM25_K1 * (1 - BM25_B + BM25_B * lengths[positions] / average_length)
+            )
+
+        if self._matrix is None:
+            self._matrix = np.vstack(self._rows)
+        cosine = self._matrix @ self._vectorize(Counter(terms))
+
+        top = float(bm25.max())
+        scores = bm25_weight * (bm25 / top if top else bm25) + (1 - bm25_weight) * cosine
+        best = np.argsort(-scores)[:top_k]
+        return [self.chunks[i] for i in best if scores[i] > 0]
+
+
+class RemoteRagBackend:
+    """Retrieval through the Nexus service; ingestion there finishes asynchronously."""
+
+    ingests_synchronously = False
+
+    async def query(self, workflow_id: str, query: str) -> str:
+        url = f"{RAG_BACKEND_CONFIG['base_url']}/query-data"
+        payload = {"workflow_id": workflow_id, "query": query}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=payload) as response:
+                if response.status != 200:
+                    raise RagBackendError(f"HTTP {response.status}")
+                data = await response.json()
+                return data["response"]
+
+    async def add(self, workflow_id: str, data: Any) -> Any:
+        url = f"{RAG_BACKEND_CONFIG['base_url']}/add-data"
+        body = {"workflow_id": workflow_id, "data": data}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=body) as response:
+                # 202 Accepted is expected
+                if response.status not in (200, 202):
+                    raise RagBackendError(f"HTTP {response.status}")
+                content_type = response.headers.get("Content-Type", "")
+                if "application/json" in content_type:
+                    return await response.json()
+                return await response.text()
+
+
+class LocalRagBackend:
+    """
+    Retrieval in-process: chunks are persisted in Redis and indexed in memory per workflow.
+
+    An index is built from Redis on first use in a process and afterwards only loads the
+    chunks other processes appended since, so inserts stay incremental everywhere. When the
+    stored collection expired and was created again (a new generation), the index is rebuilt.
+    """
+
+    ingests_synchronously = True
+
+    def __init__(self):
+        self._indexes: "OrderedDict[str, LocalIndex]" = OrderedDict()
+
+    async def _get_index(self, workflow_id: str) -> LocalIndex:
+        index = self._indexes.get(workflow_id)
+        if index is None:
+            index = self._indexes[workflow_id] = LocalIndex(RAG_BACKEND_CONFIG["vector_dims"])
+            while len(self._indexes) > RAG_BACKEND_CONFIG["max_indexes"]:
+                self._indexes.popitem(last=False)
+        self._indexes.move_to_end(workflow_id)
+
+        start = len(index)
+        generation, chunks = await load_rag_chunks(workflow_id, start, index.generation)
+        if generation != index.generation and (start or generation is not None):
+            # The collection expired (and may have been created again) since the index was built
+            index = self._indexes[workflow_id] = LocalIndex(RAG_BACKEND_CONFIG["vector_dims"], generation)
+            index.add(chunks)
+        # Another task may have caught the index up meanwhile
+        elif chunks and len(index) == start:
+            index.generation = generation
+            index.add(chunks)
+        return index
+
+    async def query(self, workflow_id: str, query: str) -> str:
+        index = await self._get_index(workflow_id)
+        chunks = index.search(query, RAG_BACKEND_CONFIG["top_k"], RAG_BACKEND_CONFIG["bm25_weight"])
+        if not chunks:
+            return "No relevant information found in the knowledge base."
+        return "\n\n---\n\n".join(chunks)
+
+    async def add(self, workflow_id: str, data: Any) -> Any:
+        chunks = chunk_text(_to_text(data), RAG_BACKEND_CONFIG["chunk_chars"], RAG_BACKEND_CONFIG["chunk_overlap_chars"])
+        if not chunks:
+            return {"status": "ok", "chunks_added": 0}
+        total = await append_rag_chunks(workflow_id, chunks)
+        # Indexed on the next query of any process
+        return {"status": "ok", "chunks_added": len(chunks), "chunks_total": total}
+
+
+rag_backend = None
+
+def get_rag_backend():
+    """Get the retrieval backend selected by RAG_BACKEND."""
+    global rag_backend
+    if rag_backend is None:
+        rag_backend = LocalRagBackend() if RAG_BACKEND_CONFIG["backend"] == "local" else RemoteRagBackend()
+    return rag_backend
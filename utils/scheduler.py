@@ -0,0 +1,273 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import logfire
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Work classes
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+def _tenant_weights(value: str) -> Dict[str, float]:
+    """Parse "tenant=weight,..." pairs."""
+    weights = {}
+    for pair in value.split(","):
+        tenant, _, weight = pair.partition("=")
+        if tenant.strip() and weight.strip():
+            weights[tenant.strip()] = float(weight)
+    return weights
+
+# Scheduler configuration
+SCHEDULER_CONFIG = {
+    "enabled": os.environ.get("SCHEDULER", "true").lower() == "true",
+    # Model requests and background calls in flight per process
+    "max_concurrency": int(os.environ.get("SCHEDULER_MAX_CONCURRENCY", "32")),
+    # Share of those slots background work may take; the rest is reserved for interactive work
+    "background_max_concurrency": int(os.environ.get("SCHEDULER_BACKGROUND_MAX_CONCURRENCY", "4")),
+    # Queued background work waiting longer than this is shed (0 waits forever)
+    "background_max_wait_seconds": float(os.environ.get("SCHEDULER_BACKGROUND_MAX_WAIT_SECONDS", "120")),
+    # Fair-share weights of tenants (workflows), default 1
+    "tenant_weights": _tenant_weights(os.environ.get("SCHEDULER_TENANT_WEIGHTS", ""))
+}
+
+# Tenant the work of the current task is accounted to, set per agent run
+current_tenant: ContextVar[Optional[str]] = ContextVar("current_tenant", default=None)
+
+queue_wait_histogram = logfire.metric_histogram(
+    "scheduler.queue_wait", unit="ms", description="Time work waited for a scheduler slot"
+)
+shed_counter = logfire.metric_counter(
+    "scheduler.shed", unit="1", description="Queued background work dropped after waiting too long"
+)
+
+
+class SchedulerBusy(Exception):
+    """Raised when queued background work is shed because interactive work kept the slots busy."""
+
+
+class _Waiter:
+    __slots__ = ("work_class", "tenant", "future", "enqueued_at")
+
+    def __init__(self, work_class: str, tenant: str, future: asyncio.Future):
+        self.work_class = work_class
+        self.tenant = tenant
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class _FairQueue:
+    """
+    Start-time fair queue of one work class: tenants get slots in proportion to their weight.
+
+    Each waiter is tagged with the virtual finish time of its tenant; the smallest tag is
+    served first, so a tenant queueing many calls cannot starve the others.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self.virtual_time = 0.0
+        self._finish: Dict[str, float] = {}
+        self._heap: List = []
+        self._order = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, waiter: _Waiter) -> None:
+        start = max(self.virtual_time, self._finish.get(waiter.tenant, 0.0))
+        finish = start + 1.0 / self.weights.get(waiter.tenant, 1.0)
+        self._finish[waiter.tenant] = finish
+        heapq.heappush(self._heap, (finish, next(self._order), start, waiter))
+
+    def pop(self) -> Optional[_Waiter]:
+        while self._heap:
+            _, _, start, waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                # Cancelled or shed while queued
+                continue
+            self.virtual_time = start
+            if not self._heap:
+                # Idle tenants don't keep credit
+                self._finish.clear()
+            return waiter
+        return None
+
+
+class PriorityScheduler:
+    """
+    Admission control between interactive and background work of this process.
+
+    Interactive work (model requests of agent turns) may use every slot; background work
+    (scheme research and RAG ingestion) at most `background_max_concurrency` of them, so
+    interactive work always finds capacity. A freed slot goes to queued interactive work
+    first, and queued background work waits while interactive work is queued. Within each
+    class, tenants share the slots by weighted fair queuing. Running work is never
+    interrupted; background work queued longer than `background_max_wait_seconds` is shed.
+    """
+
+    def __init__(self, max_concurrency: int, background_max_concurrency: int, tenant_weights: Dict[str, float]):
+        self.max_concurrency = max_concurrency
+        self.background_max_concurrency = min(background_max_concurrency, max_concurrency)
+        self._queues = {INTERACTIVE: _FairQueue(tenant_weights), BACKGROUND: _FairQueue(tenant_weights)}
+        self._active = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.stats = {"requests": 0, "queued": 0, "shed": 0}
+
+    def _can_admit(self, work_class: str) -> bool:
+        if sum(self._active.values()) >= self.max_concurrency:
+            return False
+        if work_class == BACKGROUND:
+            return self._active[BACKGROUND] < self.background_max_concurrency and not len(self._queues[INTERACTIVE])
+        return True
+
+    def _dispatch(self) -> None:
+        for work_class in (INTERACTIVE, BACKGROUND):
+            while len(self._queues[work_class]) and self._can_admit(work_class):
+                waiter = self._queues[work_class].pop()
+                if waiter is None:
+                    break
+                self._active[work_class] += 1
+                waiter.future.set_result(None)
+
+    async def acquire(self, work_class: str, tenant: str) -> None:
+        """
+        Wait for a slot of the given class.
+
+        Args:
+            work_class: INTERACTIVE or BACKGROUND
+            tenant: The tenant (workflow) the work is accounted to
+
+        Raises:
+            SchedulerBusy: If background work waited longer than background_max_wait_seconds
+        """
+        self.stats["requests"] += 1
+        if self._can_admit(work_class) and not len(self._queues[work_class]):
+            self._active[work_class] += 1
+            queue_wait_histogram.record(0, {"work_class": work_class})
+            return
+
+        waiter = _Waiter(work_class, tenant, asyncio.get_running_loop().create_future())
+        self._queues[work_class].push(waiter)
+        self.stats["queued"] += 1
+        max_wait = SCHEDULER_CONFIG["background_max_wait_seconds"] if work_class == BACKGROUND else 0
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=max_wait or None)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted while the wait was timing out
+                self.release(work_class)
+            else:
+                waiter.future.cancel()
+            self.stats["shed"] += 1
+            shed_counter.add(1)
+            raise SchedulerBusy(f"Background work of {tenant} waited more than {max_wait}s for a slot")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just before the caller gave up
+                self.release(work_class)
+            else:
+                waiter.future.cancel()
+            raise
+        finally:
+            queue_wait_histogram.record((time.perf_counter() - waiter.enqueued_at) * 1000, {"work_class": work_class})
+
+    def release(self, work_class: str) -> None:
+        """
+        Free a slot of the given class and hand it to the next queued work.
+
+        Args:
+            work_class: INTERACTIVE or BACKGROUND
+        """
+        self._active[work_class] -= 1
+        self._dispatch()
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "active_interactive": self._active[INTERACTIVE],
+            "active_background": self._active[BACKGROUND],
+            "queued_interactive": len(self._queues[INTERACTIVE]),
+            "queued_background": len(self._queues[BACKGROUND]),
+            **self.stats
+        }
+
+
+# One scheduler per event loop (its futures are bound to the loop)
+schedulers: Dict[asyncio.AbstractEventLoop, PriorityScheduler] = {}
+
+def get_scheduler() -> PriorityScheduler:
+    """Get or create the scheduler of the running event loop."""
+    loop = asyncio.get_running_loop()
+    scheduler = schedulers.get(loop)
+    if scheduler is None:
+        for closed in [loop for loop in schedulers if loop.is_closed()]:
+            del schedulers[closed]
+        scheduler = schedulers[loop] = PriorityScheduler(
+            SCHEDULER_CONFIG["max_concurrency"],
+            SCHEDULER_CONFIG["background_max_concurrency"],
+            SCHEDULER_CONFIG["tenant_weights"]
+        )
+    return scheduler
+
+@asynccontextmanager
+async def scheduled(work_class: str, tenant: Optional[str] = None) -> AsyncIterator[None]:
+    """
+    Hold a scheduler slot for the duration of the block.
+
+    Blocks must not nest: a slot is held only around a single model request or service call.
+
+    Args:
+        work_class: INTERACTIVE or BACKGROUND
+        tenant: The tenant the work is accounted to (default the current agent run's workflow)
+
+    Raises:
+        SchedulerBusy: If background work waited too long for a slot
+    """
+    if not SCHEDULER_CONFIG["enabled"]:
+        yield
+        return
+
+    scheduler = get_scheduler()
+    await scheduler.acquire(work_class, tenant or current_tenant.get() or "")
+    try:
+        yield
+    finally:
+        scheduler.release(work_class)
+
+def get_scheduler_metrics() -> Dict[str, int]:
+    """
+    Snapshot of the slots in use and the work queued per class, summed over event loops.
+
+    Returns:
+        Dict with active / queued work per class and admission counters
+    """
+    metrics: Dict[str, int] = {}
+    for scheduler in list(schedulers.values()):
+        for name, value in scheduler.metrics().items():
+            metrics[name] = metrics.get(name, 0) + value
+    return metrics
+
+
+class ScheduledTransport(httpx.AsyncBaseTransport):
+    """httpx transport that runs every request in an interactive scheduler slot."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async with scheduled(INTERACTIVE):
+            return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
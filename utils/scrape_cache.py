@@ -0,0 +1,237 @@
+import asyncio
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+
+import aiohttp
+import logfire
+from dotenv import load_dotenv
+
+from storage.redis.scrape_cache.scrape_cache import load_scrape, save_scrape
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _domain_ttls(value: str) -> Dict[str, int]:
+    """Parse "domain=seconds,..." pairs."""
+    ttls = {}
+    for pair in value.split(","):
+        domain, _, seconds = pair.partition("=")
+        if domain.strip() and seconds.strip():
+            ttls[domain.strip().lower()] = int(seconds)
+    return ttls
+
+# Scrape cache configuration
+SCRAPE_CACHE_CONFIG = {
+    "enabled": os.environ.get("SCRAPE_CACHE", "true").lower() == "true",
+    # Cached scrapes are served without revalidation for this long
+    "default_ttl_seconds": int(os.environ.get("SCRAPE_CACHE_TTL_SECONDS", str(6 * 3600))),
+    # Freshness per domain (subdomains included), 0 disables caching for the domain
+    "domain_ttls": _domain_ttls(os.environ.get("SCRAPE_CACHE_DOMAIN_TTLS", "")),
+    "revalidate_timeout_seconds": float(os.environ.get("SCRAPE_CACHE_REVALIDATE_TIMEOUT_SECONDS", "10")),
+    # Pages larger than this aren't hashed, they are scraped again instead
+    "revalidate_max_bytes": int(os.environ.get("SCRAPE_CACHE_REVALIDATE_MAX_BYTES", str(5 * 1024 * 1024))),
+    "revalidate_max_redirects": int(os.environ.get("SCRAPE_CACHE_REVALIDATE_MAX_REDIRECTS", "5"))
+}
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+lookup_counter = logfire.metric_counter(
+    "scrape_cache.lookups", unit="1", description="Scrape cache lookups by result (hit / revalidated / changed / miss)"
+)
+
+
+def get_freshness_seconds(url: str) -> int:
+    """
+    Freshness of scrapes of a URL: the TTL of its most specific configured domain, else the default.
+
+    Args:
+        url: The URL to scrape
+
+    Returns:
+        int: Seconds a scrape is served without revalidation
+    """
+    host = (urlparse(url).hostname or "").lower()
+    best = None
+    for domain in SCRAPE_CACHE_CONFIG["domain_ttls"]:
+        if (host == domain or host.endswith(f".{domain}")) and (best is None or len(domain) > len(best)):
+            best = domain
+    return SCRAPE_CACHE_CONFIG["domain_ttls"][best] if best else SCRAPE_CACHE_CONFIG["default_ttl_seconds"]
+
+
+def _digest(value: Any) -> str:
+    data = value if isinstance(value, bytes) else json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def _is_public_address(host: str) -> bool:
+    """Whether an IP address is publicly routable, so not private, loopback, link-local (cloud metadata) or reserved."""
+    address = ipaddress.ip_address(host)
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def _is_public_url(url: str) -> bool:
+    """Whether a URL is http(s) and, if its host is an IP address, a public one."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    try:
+        return _is_public_address(parsed.hostname)
+    except ValueError:
+        # A host name, checked by PublicResolver when it is resolved
+        return True
+
+
+class PublicResolver(aiohttp.ThreadedResolver):
+    """Resolver refusing host names with any non-public address."""
+
+    async def resolve(self, host: str, *args, **kwargs) -> List[Dict[str, Any]]:
+        results = await super().resolve(host, *args, **kwargs)
+        for result in results:
+            if not _is_public_address(result["host"]):
+                raise OSError(f"{host} resolves to the non-public address {result['host']}")
+        return results
+
+
+def _is_error(content: Any) -> bool:
+    if isinstance(content, str):
+        return content.startswith("Error")
+    return isinstance(content, dict) and "error" in content
+
+
+async def fetch_validators(url: str, entry: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the page itself to learn whether it changed since it was scraped.
+
+    Sends If-None-Match / If-Modified-Since with the validators of the cached entry. Only
+    public hosts are fetched, on every redirect too, and at most `revalidate_max_bytes` of
+    the page are read.
+
+    Args:
+        url: The scraped URL
+        entry: The cached entry, if any
+
+    Returns:
+        Optional[Dict[str, Any]]: The status and, for a 200, the page's etag, last_modified and
+            body_hash; None if the page couldn't or mustn't be fetched
+    """
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    max_bytes = SCRAPE_CACHE_CONFIG["revalidate_max_bytes"]
+    try:
+        timeout = aiohttp.ClientTimeout(total=SCRAPE_CACHE_CONFIG["revalidate_timeout_seconds"])
+        connector = aiohttp.TCPConnector(resolver=PublicResolver())
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            for _ in range(SCRAPE_CACHE_CONFIG["revalidate_max_redirects"] + 1):
+                if not _is_public_url(url):
+                    logger.warning(f"Not revalidating {url}, it is not a public http(s) URL")
+                    return None
+                async with session.get(url, headers=headers, allow_redirects=False) as response:
+                    if response.status in REDIRECT_STATUSES and response.headers.get("Location"):
+                        url = urljoin(str(response.url), response.headers["Location"])
+                        continue
+                    if response.status == 304:
+                        return {"status": 304}
+                    if response.status != 200 or (response.content_length or 0) > max_bytes:
+                        return None
+                    body = bytearray()
+                    async for data in response.content.iter_chunked(64 * 1024):
+                        body += data
+                        if len(body) > max_bytes:
+                            return None
+                    return {
+                        "status": 200,
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "body_hash": _digest(bytes(body))
+                    }
+            logger.debug(f"Failed to revalidate {url}: too many redirects")
+            return None
+    except Exception as e:
+        logger.debug(f"Failed to revalidate {url}: {str(e)}")
+        return None
+
+
+async def cached_scrape(url: str, scrape: Callable[[str], Awaitable[Any]]) -> Any:
+    """
+    Scrape a URL through the cache.
+
+    A scrape younger than the domain's freshness is served as-is. An older one is revalidated
+    with a conditional request to the page; when the page answers 304 or its body hash is
+    unchanged, the cached scrape is served and stays fresh for another window. Only changed
+    or uncached pages are scraped again. If scraping a changed page fails, the stale scrape
+    is served.
+
+    The page's validators are fetched on the first revalidation of a scrape, alongside
+    scraping it again, so pages that are scraped only once are never fetched.
+
+    Args:
+        url: The URL to scrape
+        scrape: Scrapes a URL without the cache
+
+    Returns:
+        The scraped content, or the scraper's error
+    """
+    ttl = get_freshness_seconds(url)
+    if not SCRAPE_CACHE_CONFIG["enabled"] or ttl <= 0:
+        return await scrape(url)
+
+    entry = await load_scrape(url)
+    now = time.time()
+    if entry and now < entry["fresh_until"]:
+        lookup_counter.add(1, {"result": "hit"})
+        return entry["content"]
+
+    if entry and (entry.get("etag") or entry.get("last_modified") or entry.get("body_hash")):
+        validation = await fetch_validators(url, entry)
+        unchanged = validation is not None and (
+            validation["status"] == 304 or
+            (validation.get("body_hash") is not None and validation["body_hash"] == entry.get("body_hash"))
+        )
+        if unchanged:
+            if validation["status"] == 200:
+                entry.update(etag=validation["etag"], last_modified=validation["last_modified"])
+            entry.update(fresh_until=now + ttl, validated_at=now)
+            await save_scrape(url, entry)
+            lookup_counter.add(1, {"result": "revalidated"})
+            return entry["content"]
+        content = await scrape(url)
+        lookup_counter.add(1, {"result": "changed"})
+    elif entry:
+        # First revalidation: the page is fetched alongside the scrape for its validators, without adding latency
+        content, validation = await asyncio.gather(scrape(url), fetch_validators(url))
+        lookup_counter.add(1, {"result": "changed"})
+    else:
+        content, validation = await scrape(url), None
+        lookup_counter.add(1, {"result": "miss"})
+
+    if _is_error(content):
+        if entry:
+            logger.warning(f"Serving stale scrape of {url}, scraping failed: {content}")
+            return entry["content"]
+        return content
+
+    validation = validation if validation and validation["status"] == 200 else {}
+    await save_scrape(url, {
+        "content": content,
+        "content_hash": _digest(content),
+        "etag": validation.get("etag"),
+        "last_modified": validation.get("last_modified"),
+        "body_hash": validation.get("body_hash"),
+        "fetched_at": now,
+        "validated_at": now,
+        "fresh_until": now + ttl
+    })
+    return content
@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import logfire
+
+from storage.redis.workflow_lock.workflow_lock import workflow_lease
+from storage.redis.workflow_lock.single_flight_result import load_single_flight_result, save_single_flight_result
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+AgentNode = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+# Leaders of the requests currently running in this process, by (workflow_id, request_hash)
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+coalesced_counter = logfire.metric_counter(
+    "single_flight.requests", unit="1", description="Agent turns by single-flight role"
+)
+
+
+def _request_hash(agent_type: str, user_input: str) -> str:
+    return hashlib.sha256(f"{agent_type}\0{' '.join(user_input.split()).lower()}".encode("utf-8")).hexdigest()[:32]
+
+
+def _mark_retrieved(future: asyncio.Future) -> None:
+    # A leader's failure is re-raised by the leader itself, followers are optional
+    if not future.cancelled():
+        future.exception()
+
+
+def single_flight(agent_type: str) -> Callable[[AgentNode], AgentNode]:
+    """
+    Run an agent node under the workflow lease and coalesce identical concurrent turns.
+
+    The first turn for a workflow and input becomes the leader and runs the node while holding
+    the lease of the workflow's agent. Identical turns arriving meanwhile in this process await
+    the leader's result; on other workers they wait for the lease and then reuse the result the
+    leader stored in Redis, if the leader's lease is the one they waited on or a later one.
+    A turn that found the lease free, e.g. the same question asked again after the previous
+    turn finished, always runs the node. Different inputs for the same workflow run one after
+    the other, so the history read-modify-write never interleaves.
+
+    Args:
+        agent_type: The type of agent the node runs (scopes the lease and the coalescing)
+
+    Returns:
+        Decorator for the agent node
+    """
+    def decorator(node: AgentNode) -> AgentNode:
+        @functools.wraps(node)
+        async def wrapper(state: Dict[str, Any]) -> Dict[str, Any]:
+            workflow_id = state["workflow_id"]
+            user_input = (state.get("agent_input_output") or {}).get("user_input")
+            if not user_input:
+                return await node(state)
+
+            request_hash = _request_hash(agent_type, user_input)
+            key = (workflow_id, request_hash)
+            if key in _in_flight:
+                coalesced_counter.add(1, {"agent_type": agent_type, "role": "follower"})
+                logger.info(f"Coalescing duplicate {agent_type} turn for workflow {workflow_id}")
+                return await asyncio.shield(_in_flight[key])
+
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(_mark_retrieved)
+            _in_flight[key] = future
+            try:
+                async with workflow_lease(workflow_id, agent_type) as lease:
+                    result = None
+                    if lease is not None and lease.waited_on is not None:
+                        # Only a leader that held the lease while this turn waited overlapped it
+                        result = await load_single_flight_result(workflow_id, request_hash, lease.waited_on)
+                    if result is not None:
+                        coalesced_counter.add(1, {"agent_type": agent_type, "role": "reused"})
+                        logger.info(f"Reusing {agent_type} result of a duplicate turn for workflow {workflow_id}")
+                    else:
+                        coalesced_counter.add(1, {"agent_type": agent_type, "role": "leader"})
+                        result = await node(state)
+                        if lease is not None:
+                            await save_single_flight_result(workflow_id, request_hash, result, lease.fencing_token)
+                future.set_result(result)
+                return result
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            finally:
+                _in_flight.pop(key, None)
+
+        return wrapper
+
+    return decorator
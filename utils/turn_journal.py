@@ -0,0 +1,187 @@
+import dataclasses
+import functools
+import hashlib
+import json
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import logfire
+from dotenv import load_dotenv
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter, ModelResponse
+from pydantic_ai.models import ModelRequestParameters
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+from pydantic_ai.usage import Usage
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TURN_JOURNAL_ENABLED = os.environ.get("TURN_JOURNAL", "true").lower() == "true"
+
+replay_counter = logfire.metric_counter(
+    "turn_journal.replays", unit="1", description="Tool results and model responses replayed by agent run retries"
+)
+
+
+class TurnJournal:
+    """
+    Results of the tool calls and model requests of one agent turn, kept across its retry attempts.
+
+    Entries are keyed by the call (tool name and arguments, or the normalised request) and
+    by how many times the attempt made that call before, so a retried attempt that makes the
+    same call again gets the recorded result back instead of repeating the work. Only entries
+    of earlier attempts are replayed: a call repeated within an attempt, e.g. a knowledge base
+    query after new data was added, runs again. Only successful results are recorded.
+    """
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex
+        self.attempt = 0
+        # key -> (attempt that recorded it, value)
+        self._entries: Dict[str, Tuple[int, Any]] = {}
+        self._occurrences: Counter = Counter()
+        self.stats = {"recorded": 0, "replayed": 0}
+
+    def begin_attempt(self) -> None:
+        """Start the next attempt of the turn."""
+        self.attempt += 1
+        self._occurrences.clear()
+
+    def occurrence_key(self, call_key: str) -> str:
+        """Key of this call's next occurrence in the current attempt."""
+        occurrence = self._occurrences[call_key]
+        self._occurrences[call_key] += 1
+        return f"{call_key}#{occurrence}"
+
+    def lookup(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] >= self.attempt:
+            return None
+        self.stats["replayed"] += 1
+        return entry[1]
+
+    def record(self, key: str, value: Any) -> None:
+        self._entries[key] = (self.attempt, value)
+        self.stats["recorded"] += 1
+
+
+# Journal of the agent turn the current task belongs to
+current_journal: ContextVar[Optional[TurnJournal]] = ContextVar("current_journal", default=None)
+
+@contextmanager
+def turn_journal() -> Iterator[Optional[TurnJournal]]:
+    """
+    Open a journal shared by every attempt of an agent turn run inside the block.
+
+    Yields:
+        The journal, or None if TURN_JOURNAL is disabled
+    """
+    if not TURN_JOURNAL_ENABLED:
+        yield None
+        return
+
+    journal = TurnJournal()
+    token = current_journal.set(journal)
+    try:
+        yield journal
+    finally:
+        current_journal.reset(token)
+        if journal.stats["replayed"]:
+            logger.info(f"Turn {journal.run_id} replayed {journal.stats['replayed']} journaled results")
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _is_error(result: Any) -> bool:
+    """Tools report failures as 'Error...' strings or dicts with an 'error' key instead of raising."""
+    if isinstance(result, str):
+        return result.lower().startswith("error")
+    if isinstance(result, dict):
+        return "error" in result
+    return False
+
+def journaled(tool: Callable) -> Callable:
+    """
+    Replay the result of an async tool when a retried attempt of the turn calls it with the same arguments.
+
+    The wrapper keeps the tool's name, signature and docstring, so the agent registers it
+    exactly like the tool itself. Outside of a journaled turn the tool runs as before.
+
+    Args:
+        tool: The tool function
+
+    Returns:
+        The journaled tool function
+    """
+    @functools.wraps(tool)
+    async def wrapper(*args, **kwargs):
+        journal = current_journal.get()
+        if journal is None:
+            return await tool(*args, **kwargs)
+
+        key = journal.occurrence_key(f"tool:{tool.__name__}:{_digest([args, kwargs])}")
+        result = journal.lookup(key)
+        if result is not None:
+            replay_counter.add(1, {"kind": "tool", "name": tool.__name__})
+            logger.debug(f"Replayed {tool.__name__} result of turn {journal.run_id}")
+            return result
+
+        result = await tool(*args, **kwargs)
+        if result is not None and not _is_error(result):
+            journal.record(key, result)
+        return result
+
+    return wrapper
+
+# Message fields that differ between attempts without changing what is sent to the model
+# (replayed responses carry zero usage)
+VOLATILE_FIELDS = ("timestamp", "usage")
+
+def _strip_volatile(value: Any) -> Any:
+    """Drop the per-attempt timestamps and usage from dumped messages."""
+    if isinstance(value, dict):
+        return {name: _strip_volatile(item) for name, item in value.items() if name not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+class JournaledModel(WrapperModel):
+    """
+    Model that replays completed responses when a retried attempt of the turn sends the same request.
+
+    Requests are matched on their messages (without timestamps and usage), settings and tools. Replayed
+    responses carry zero usage, since the attempt that produced them was already accounted.
+    """
+
+    async def request(
+        self,
+        messages: List[ModelMessage],
+        model_settings: Optional[ModelSettings],
+        model_request_parameters: ModelRequestParameters
+    ) -> ModelResponse:
+        journal = current_journal.get()
+        if journal is None:
+            return await self.wrapped.request(messages, model_settings, model_request_parameters)
+
+        key = journal.occurrence_key("model:" + _digest([
+            self.model_name,
+            _strip_volatile(ModelMessagesTypeAdapter.dump_python(messages, mode="json")),
+            model_settings,
+            dataclasses.asdict(model_request_parameters)
+        ]))
+        response = journal.lookup(key)
+        if response is not None:
+            replay_counter.add(1, {"kind": "model", "name": self.model_name})
+            return dataclasses.replace(response, usage=Usage())
+
+        response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+        journal.record(key, response)
+        return response
@@ -0,0 +1,141 @@
+from pydantic_ai import RunContext
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.usage import Usage, UsageLimits
+from storage.redis.usage.usage_history import save_usage, load_usage
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _optional_int(name: str, default: Optional[int] = None) -> Optional[int]:
+    """Read an integer limit from the environment, 0 or empty means unlimited."""
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return int(value) or None
+
+# Budget configuration
+USAGE_CONFIG = {
+    # Per agent run
+    "run_request_limit": _optional_int("USAGE_RUN_REQUEST_LIMIT", 25),
+    "run_total_tokens_limit": _optional_int("USAGE_RUN_TOTAL_TOKENS_LIMIT", 200000),
+    # Per workflow per day
+    "workflow_daily_request_budget": _optional_int("USAGE_WORKFLOW_DAILY_REQUEST_BUDGET", 300),
+    "workflow_daily_token_budget": _optional_int("USAGE_WORKFLOW_DAILY_TOKEN_BUDGET", 2000000),
+    # Requests kept in reserve so the agent can still produce its final answer
+    "tool_call_reserve": int(os.environ.get("USAGE_TOOL_CALL_RESERVE", "1"))
+}
+
+
+# Answer of a turn the usage budget doesn't allow
+BUDGET_EXHAUSTED_MESSAGE = "The usage limit for this conversation has been reached, please try again later."
+
+# Limits of the agent run the current task belongs to, set per attempt
+run_usage_limits: ContextVar[Optional[UsageLimits]] = ContextVar("run_usage_limits", default=None)
+
+
+class UsageBudgetExceeded(Exception):
+    """Raised when a workflow has used up its daily request or token budget."""
+
+
+async def get_usage_limits(workflow_id: Optional[str] = None) -> UsageLimits:
+    """
+    Build the usage limits for a single agent run.
+
+    The per-run limits are tightened to whatever is left of the workflow's daily budget.
+
+    Args:
+        workflow_id: The unique identifier for the workflow, None to only apply per-run limits
+
+    Returns:
+        UsageLimits for the run
+
+    Raises:
+        UsageBudgetExceeded: If the workflow has no budget left for today
+    """
+    request_limit = USAGE_CONFIG["run_request_limit"]
+    total_tokens_limit = USAGE_CONFIG["run_total_tokens_limit"]
+
+    if workflow_id:
+        used = await load_usage(workflow_id)
+
+        request_budget = USAGE_CONFIG["workflow_daily_request_budget"]
+        if request_budget is not None:
+            remaining_requests = request_budget - used["requests"]
+            if remaining_requests <= 0:
+                raise UsageBudgetExceeded(
+                    f"Workflow {workflow_id} used its daily request budget of {request_budget}"
+                )
+            request_limit = min(request_limit or remaining_requests, remaining_requests)
+
+        token_budget = USAGE_CONFIG["workflow_daily_token_budget"]
+        if token_budget is not None:
+            remaining_tokens = token_budget - used["total_tokens"]
+            if remaining_tokens <= 0:
+                raise UsageBudgetExceeded(
+                    f"Workflow {workflow_id} used its daily token budget of {token_budget}"
+                )
+            total_tokens_limit = min(total_tokens_limit or remaining_tokens, remaining_tokens)
+
+    return UsageLimits(request_limit=request_limit, total_tokens_limit=total_tokens_limit)
+
+
+async def record_usage(workflow_id: Optional[str], agent_type: Optional[str], usage: Usage) -> None:
+    """
+    Record the usage of an agent run for accounting.
+
+    Args:
+        workflow_id: The unique identifier for the workflow
+        agent_type: The type of agent that ran
+        usage: The usage collected during the run
+    """
+    logger.info(
+        f"Agent usage - workflow: {workflow_id}, agent: {agent_type}, requests: {usage.requests}, "
+        f"request_tokens: {usage.request_tokens}, response_tokens: {usage.response_tokens}, "
+        f"total_tokens: {usage.total_tokens}"
+    )
+    if workflow_id and agent_type and usage.requests:
+        await save_usage(workflow_id, agent_type, usage)
+
+
+async def refuse_tools_near_limit(ctx: RunContext[Any], tool_defs: List[ToolDefinition]) -> List[ToolDefinition]:
+    """
+    Hide all tools once the run is close to its request limit.
+
+    Used as an agent `prepare_tools` hook so that a looping agent is forced to give its
+    final answer with the remaining requests instead of failing with UsageLimitExceeded.
+    The limit is the one the run was started with, i.e. tightened to the workflow's
+    remaining daily budget.
+
+    Args:
+        ctx: The run context
+        tool_defs: Tool definitions offered for the next step
+
+    Returns:
+        The tool definitions, or an empty list when the request budget is nearly used up
+    """
+    limits = run_usage_limits.get()
+    request_limit = limits.request_limit if limits is not None else USAGE_CONFIG["run_request_limit"]
+    if request_limit is not None and ctx.usage.requests >= request_limit - USAGE_CONFIG["tool_call_reserve"]:
+        logger.warning(f"Run reached {ctx.usage.requests} requests, refusing further tool calls")
+        return []
+    return tool_defs
+
+
+def degraded_response(response_field: str = "response") -> Dict[str, Any]:
+    """
+    Answer a turn the usage budget does not allow a new run for.
+
+    Args:
+        response_field: The field of the agent's output model holding the user facing text
+
+    Returns:
+        Agent output stating that the budget is exhausted
+    """
+    return {response_field: BUDGET_EXHAUSTED_MESSAGE, "budget_exhausted": True}
@@ -0,0 +1,131 @@
+"""
+Worker process running the agent turns queued by the API (AGENT_EXECUTION_MODE=queue).
+
+Every worker joins the same Redis Streams consumer group, so workers are added or removed
+independently of the API servers. A turn is acknowledged once its result is published; a
+worker that dies mid-turn stops extending its claim and the turn is redelivered after
+AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS. Turns failing AGENT_QUEUE_MAX_DELIVERIES times are
+moved to the dead-letter stream and reported to the waiting API process as failed.
+
+Usage:
+    python worker.py [--concurrency N]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import uuid
+
+from dotenv import load_dotenv
+
+from agents.market_price_agent.graph import market_price_graph
+from agents.gov_scheme_agent.graph import gov_scheme_graph
+from storage.mongodb.history_archive import install_history_rehydration
+from storage.redis.agent_history.write_behind import close_history_writer
+from storage.redis.config import close_redis_client, AGENT_QUEUE_MAX_DELIVERIES, AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS
+from storage.redis.work_queue.work_queue import (
+    ack_turn,
+    claim_turns,
+    dead_letter_turn,
+    ensure_consumer_group,
+    extend_turn,
+    publish_turn_result,
+    QueuedTurn
+)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+AGENT_WORKER_CONCURRENCY = int(os.environ.get("AGENT_WORKER_CONCURRENCY", "4"))
+
+# Agent sub-graphs by the node name they have in the main graph
+AGENT_GRAPHS = {
+    "market_price_agent": market_price_graph,
+    "gov_scheme_agent": gov_scheme_graph
+}
+
+
+async def keep_claimed(consumer: str, turn: QueuedTurn) -> None:
+    """Extend the claim of a running turn every third of the visibility timeout."""
+    while True:
+        await asyncio.sleep(AGENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS / 3)
+        try:
+            await extend_turn(consumer, turn)
+        except Exception as e:
+            logger.warning(f"Failed to extend claim of turn {turn.job_id}: {str(e)}")
+
+
+async def process_turn(consumer: str, turn: QueuedTurn) -> None:
+    """
+    Run a claimed turn on its agent graph and publish the result.
+
+    Args:
+        consumer: Unique name of the worker
+        turn: The claimed turn
+    """
+    agent_graph = AGENT_GRAPHS.get(turn.agent_name)
+    if agent_graph is None:
+        await dead_letter_turn(turn, f"Unknown agent {turn.agent_name}")
+        return
+
+    extender = asyncio.create_task(keep_claimed(consumer, turn))
+    try:
+        result = await agent_graph.ainvoke(turn.state)
+    except Exception as e:
+        if turn.deliveries >= AGENT_QUEUE_MAX_DELIVERIES:
+            await dead_letter_turn(turn, f"{type(e).__name__}: {str(e)}")
+        else:
+            # Left pending, another worker picks it up after the visibility timeout
+            logger.warning(f"{turn.agent_name} turn {turn.job_id} failed (delivery {turn.deliveries}): {str(e)}")
+        return
+    finally:
+        extender.cancel()
+
+    # A crash between publishing and acknowledging reruns the turn after the visibility timeout;
+    # the waiting API process already took the first result and ignores the rerun's
+    if await publish_turn_result(turn, result=result):
+        await ack_turn(turn)
+
+
+async def run_consumer(consumer: str, stop: asyncio.Event) -> None:
+    """Claim and process turns one at a time until stopped."""
+    while not stop.is_set():
+        try:
+            for turn in await claim_turns(consumer):
+                await process_turn(consumer, turn)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Agent worker {consumer} error: {str(e)}")
+            await asyncio.sleep(1)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=AGENT_WORKER_CONCURRENCY, help="Turns run in parallel")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await ensure_consumer_group()
+    install_history_rehydration()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    consumers = [f"{worker_id}-{index}" for index in range(args.concurrency)]
+    logger.info(f"Agent worker {worker_id} running {args.concurrency} consumers")
+    try:
+        # Consumers finish their current turn before stopping
+        await asyncio.gather(*(run_consumer(consumer, stop) for consumer in consumers))
+    finally:
+        await close_history_writer()
+        await close_redis_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())